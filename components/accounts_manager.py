@@ -13,7 +13,8 @@ from config.i18n import t
 # ============================================================
 # DB OPS (Cloud-safe imports)
 # ============================================================
-from core.db_operations import load_data_db, add_record_db, execute_query_db
+from core.db_operations import load_data_db, add_record_db, execute_query_db, get_account_balances, get_balance_as_of
+from core.ledger import signed_amounts
 
 # Optional helpers (don’t crash the app if missing in db_operations.py)
 try:
@@ -108,56 +109,26 @@ def _validate_account_data(df: pd.DataFrame) -> tuple[bool, str]:
 # ============================================================
 # 🧮 EXACT MATH SYNC (Updated with CC Settlement Logic)
 # ============================================================
-def _get_signed_amount(row) -> float:
-    """Centralized logic for calculating the actual +/- value of a transaction."""
-    try:
-        amt = float(row.get("amount", 0))
-    except:
-        amt = 0.0
-        
-    t = str(row.get("type", "")).strip().lower()
-    
-    # Positive Types
-    if t in ["income", "opening balance", "deposit", "refund"]:
-        return amt
-    # Negative Types
-    elif t in ["expense", "transfer", "withdrawal", "payment"]:
-        return -abs(amt)
-    
-    return 0.0
-
 def get_statement_balance(card_name: str, billing_month: int, billing_year: int, user_id: str) -> float:
     """Calculates the net debt accumulated during a specific month for ONE user."""
-    tx_df = load_data_db("transactions", user_id=user_id)
-    if tx_df is None or tx_df.empty:
+    last_dom = calendar.monthrange(billing_year, billing_month)[1]
+    statement_period = load_data_db(
+        "transactions",
+        user_id=user_id,
+        columns=["type", "amount"],
+        filters={"account": card_name},
+        date_from=date(billing_year, billing_month, 1),
+        date_to=date(billing_year, billing_month, last_dom),
+    )
+    if statement_period is None or statement_period.empty:
         return 0.0
 
-    tx_df["date_dt"] = pd.to_datetime(tx_df["date"], errors="coerce")
-    card_tx = tx_df[tx_df["account"] == card_name].copy()
-
-    statement_period = card_tx[
-        (card_tx["date_dt"].dt.month == billing_month) &
-        (card_tx["date_dt"].dt.year == billing_year)
-    ]
-
-    net_val = statement_period.apply(_get_signed_amount, axis=1).sum()
+    net_val = signed_amounts(statement_period).sum()
     return abs(net_val) if net_val < 0 else 0.0
 
 def _get_live_balances(user_id: str) -> dict[str, float]:
-    """Calculates the REAL current balance for all accounts up to TODAY for ONE user."""
-    tx_df = load_data_db("transactions", user_id=user_id)
-    if tx_df is None or tx_df.empty:
-        return {}
-
-    tx_df["date_dt"] = pd.to_datetime(tx_df["date"], errors="coerce").dt.date
-    today = date.today()
-    tx_df = tx_df[tx_df["date_dt"] <= today]
-
-    if tx_df.empty:
-        return {}
-
-    tx_df["signed_amount"] = tx_df.apply(_get_signed_amount, axis=1)
-    return tx_df.groupby("account")["signed_amount"].sum().to_dict()
+    """REAL current balance for all accounts up to TODAY for ONE user (materialized table)."""
+    return get_account_balances(user_id)
 
 
 def _get_account_summary(df: pd.DataFrame) -> dict:
@@ -208,22 +179,8 @@ def _render_account_card(account: pd.Series, summary: dict) -> None:
 # ============================================================
 # ⚖️ RECONCILIATION HELPER
 # ============================================================
-def _calculate_system_balance(account_name: str, date_limit: date, user_id: str) -> float:
-    tx_df = load_data_db("transactions", user_id=user_id)
-    if tx_df is None or tx_df.empty:
-        return 0.0
-
-    tx_df = tx_df[tx_df["account"] == account_name].copy()
-    tx_df["date"] = pd.to_datetime(tx_df["date"], errors="coerce")
-
-    end_of_day = datetime.combine(date_limit, datetime.max.time())
-    tx_df = tx_df[tx_df["date"] <= end_of_day]
-
-    if tx_df.empty:
-        return 0.0
-
-    tx_df["signed"] = tx_df.apply(_get_signed_amount, axis=1)
-    return float(tx_df["signed"].sum())
+def _calculate_system_balance(account_name: str, date_limit: date, user_id: str) -> float | None:
+    return get_balance_as_of(user_id, account_name, date_limit)
 
 
 # ============================================================
@@ -438,55 +395,57 @@ def render_accounts_manager():
             
             # 2. Show System Balance vs Input
             system_balance = _calculate_system_balance(rec_account, rec_date, uid)
-            
-            with rec_col2:
-                st.metric("System thinks you have:", f"{system_balance:,.2f} NOK")
-                
-                # The user enters their REAL bank balance here
-                actual_balance = st.number_input(
-                    "Actual Bank Balance (What your bank app says):", 
-                    value=float(system_balance), 
-                    step=100.0,
-                    format="%.2f"
-                )
-            
-            # 3. Calculate Difference
-            diff = actual_balance - system_balance
-            
-            st.divider()
-            
-            if abs(diff) < 0.01:
-                st.success("✅ Perfect Match! No adjustment needed.")
+            if system_balance is None:
+                st.error("Could not calculate the system balance for this account. Try again later.")
             else:
-                st.warning(f"⚠️ Difference Detected: {diff:,.2f} NOK")
-                st.write(f"Clicking the button below will create a transaction of **{abs(diff):,.2f}** to fix this.")
+                with rec_col2:
+                    st.metric("System thinks you have:", f"{system_balance:,.2f} NOK")
+                    
+                    # The user enters their REAL bank balance here
+                    actual_balance = st.number_input(
+                        "Actual Bank Balance (What your bank app says):", 
+                        value=float(system_balance), 
+                        step=100.0,
+                        format="%.2f"
+                    )
                 
-                if st.button(f"🛠️ Fix Balance Now", type="primary", use_container_width=True):
-                    # Create the adjustment transaction
-                    tx_type = "Income" if diff > 0 else "Expense"
-                    amount = abs(diff)
+                # 3. Calculate Difference
+                diff = actual_balance - system_balance
+                
+                st.divider()
+                
+                if abs(diff) < 0.01:
+                    st.success("✅ Perfect Match! No adjustment needed.")
+                else:
+                    st.warning(f"⚠️ Difference Detected: {diff:,.2f} NOK")
+                    st.write(f"Clicking the button below will create a transaction of **{abs(diff):,.2f}** to fix this.")
                     
-                    adjustment_record = {
-                        "date": normalize_date_to_iso(rec_date),
-                        "type": tx_type,
-                        "account": rec_account,
-                        "category": "Balance Adjustment",
-                        "payee": "Manual Correction",
-                        "amount": float(amount),
-                        "description": f"Reconciled to match bank balance of {actual_balance}",
-                        "initials": "SYS"
-                    }
+                    if st.button(f"🛠️ Fix Balance Now", type="primary", use_container_width=True):
+                        # Create the adjustment transaction
+                        tx_type = "Income" if diff > 0 else "Expense"
+                        amount = abs(diff)
+                        
+                        adjustment_record = {
+                            "date": normalize_date_to_iso(rec_date),
+                            "type": tx_type,
+                            "account": rec_account,
+                            "category": "Balance Adjustment",
+                            "payee": "Manual Correction",
+                            "amount": float(amount),
+                            "description": f"Reconciled to match bank balance of {actual_balance}",
+                            "initials": "SYS"
+                        }
   # ... (Lines 1-480 remain the same) ...
 
-                    if add_record_db("transactions", adjustment_record):
-                        st.cache_data.clear() 
-                        st.balloons()
-                        st.success("✅ Balance corrected successfully!")
-                        import time
-                        time.sleep(1.0)
-                        st.rerun()
-                    else:
-                        st.error("Failed to create adjustment transaction.")
+                        if add_record_db("transactions", adjustment_record):
+                            st.cache_data.clear() 
+                            st.balloons()
+                            st.success("✅ Balance corrected successfully!")
+                            import time
+                            time.sleep(1.0)
+                            st.rerun()
+                        else:
+                            st.error("Failed to create adjustment transaction.")
 
         # --- INDENTATION FIXED BELOW ---
         # TAB 5: QUICK ADD
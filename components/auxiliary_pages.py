@@ -2,7 +2,8 @@
 import streamlit as st
 import pandas as pd
 # Removed numpy_financial dependency to prevent errors
-from core.db_operations import load_data_db, execute_query_db, add_record_db
+from core.db_operations import execute_query_db, add_record_db
+from core.repository import get_repository
 from config.i18n import t
 
 # ==========================================
@@ -22,7 +23,7 @@ def render_accounts_page():
                 st.rerun()
     
     # 2. List Accounts
-    df = load_data_db("accounts")
+    df = get_repository().accounts()
     if df is not None and not df.empty:
         st.dataframe(df, use_container_width=True, hide_index=True)
     else:
@@ -45,7 +46,7 @@ def render_categories_page():
                 st.rerun()
 
     # 2. List Categories
-    df = load_data_db("categories")
+    df = get_repository().categories()
     if df is not None and not df.empty:
         st.dataframe(df, use_container_width=True, hide_index=True)
     else:
@@ -61,7 +62,7 @@ def render_data_page():
     
     with tab1:
         st.write("Download your data as CSV.")
-        df = load_data_db("transactions")
+        df = get_repository().transactions()
         if df is not None and not df.empty:
             csv = df.to_csv(index=False).encode('utf-8')
             st.download_button(
@@ -5,6 +5,7 @@ import calendar
 from datetime import date, datetime, timedelta
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 from dateutil.relativedelta import relativedelta
@@ -14,7 +15,16 @@ from config.i18n import t
 # ============================================================
 # DB OPS (Cloud-safe)
 # ============================================================
-from core.db_operations import load_data_db, execute_query_db, add_record_db, get_connection
+from core.db_operations import load_data_db, execute_query_db, add_record_db, get_connection, get_balance_as_of
+from core.forecast import rollup_category_flows, simulate_cash_flow
+from core.repository import current_user_id, get_repository, get_seasonal_model
+
+
+# ============================================================
+# 🔐 USER CONTEXT
+# ============================================================
+def _get_user_id() -> str:
+    return current_user_id()
 
 
 # ============================================================
@@ -44,54 +54,77 @@ def get_active_budget_rules():
         
     return df
 
+# Months between due dates; rules with any other frequency are never due
+FREQUENCY_MONTHS = {"Monthly": 1, "Bi-Monthly": 2, "Quarterly": 3, "Semi-Annually": 6, "Yearly": 12}
+
+def _month_index(d) -> int:
+    return d.year * 12 + d.month - 1
+
+def _expand_rules(rules_df: pd.DataFrame, months: list[date]) -> tuple[pd.DataFrame, np.ndarray, list]:
+    """
+    Resolves which rule sets each category's target in each month, for all
+    months at once. Returns (valid rules, winner matrix (month × category) of
+    row positions into those rules, -1 where nothing is due, categories).
+
+    A rule is due when the month is on or after its start month and the month
+    offset is a multiple of its frequency; among due rules of a category the
+    latest start_date wins (ties: the first rule).
+    """
+    if rules_df is None or rules_df.empty:
+        return pd.DataFrame(columns=["category", "amount", "start_date", "transfer_to_account"]), np.full((len(months), 0), -1), []
+
+    rules = rules_df.copy()
+    if "transfer_to_account" not in rules.columns:
+        rules["transfer_to_account"] = None
+    rules["start_date"] = pd.to_datetime(rules["start_date"], errors="coerce")
+    rules = rules[rules["is_active"].map(bool) & rules["start_date"].notna()].reset_index(drop=True)
+    if rules.empty:
+        return rules, np.full((len(months), 0), -1), []
+
+    start_idx = (rules["start_date"].dt.year * 12 + rules["start_date"].dt.month - 1).to_numpy()
+    period = rules["frequency"].map(FREQUENCY_MONTHS).fillna(0).astype(int).to_numpy()
+    diff = np.array([_month_index(m) for m in months])[:, None] - start_idx[None, :]
+    due = (diff >= 0) & (period > 0) & (diff % np.maximum(period, 1) == 0)
+
+    # Order rules by category, then latest start first; the first due rule of each block wins
+    cat_codes, categories = pd.factorize(rules["category"], sort=True)
+    order = np.lexsort((np.arange(len(rules)), -rules["start_date"].to_numpy().astype("int64"), cat_codes))
+    block_starts = np.flatnonzero(np.r_[True, np.diff(cat_codes[order]) != 0])
+    n = len(rules)
+    first_due = np.minimum.reduceat(np.where(due[:, order], np.arange(n), n), block_starts, axis=1)
+    winner = np.where(first_due < n, order[np.minimum(first_due, n - 1)], -1)
+    return rules, winner, list(categories)
+
 def calculate_monthly_budget_target(month_date: date, rules_df: pd.DataFrame) -> pd.DataFrame:
-    if rules_df.empty:
+    """The rules in force for one month: one row per category (see _expand_rules)."""
+    rules, winner, _ = _expand_rules(rules_df, [month_date])
+    hits = winner[0][winner[0] >= 0]
+    if hits.size == 0:
         return pd.DataFrame(columns=["category", "Target", "transfer_to_account"])
 
-    potential_targets = []
-    
-    for _, row in rules_df.iterrows():
-        if not bool(row["is_active"]): 
-            continue
-            
-        freq = row["frequency"]
-        try:
-            start_val = row["start_date"]
-            start_dt = pd.to_datetime(start_val).date() if isinstance(start_val, str) else start_val.date()
-        except: 
-            continue
-
-        amount = float(row["amount"])
-        cat = row["category"]
-        transfer_to = row.get("transfer_to_account")
-        
-        if month_date < start_dt.replace(day=1): 
-            continue
-
-        is_due = False
-        diff_months = (month_date.year - start_dt.year) * 12 + (month_date.month - start_dt.month)
-        
-        if freq == "Monthly": is_due = True
-        elif freq == "Quarterly": is_due = (diff_months % 3 == 0)
-        elif freq == "Yearly": is_due = (diff_months % 12 == 0)
-        elif freq == "Bi-Monthly": is_due = (diff_months % 2 == 0)
-        elif freq == "Semi-Annually": is_due = (diff_months % 6 == 0)
-
-        if is_due:
-            potential_targets.append({
-                "category": cat, 
-                "Target": amount, 
-                "start_date": start_dt,
-                "transfer_to_account": transfer_to
-            })
-    
-    if not potential_targets:
-        return pd.DataFrame(columns=["category", "Target", "transfer_to_account"])
-    
-    df_hits = pd.DataFrame(potential_targets).sort_values(by="start_date", ascending=False)
-    df_final = df_hits.drop_duplicates(subset="category", keep="first")
-    
-    return df_final
+    df_final = rules.iloc[hits][["category", "amount", "start_date", "transfer_to_account"]]
+    df_final = df_final.rename(columns={"amount": "Target"}).astype({"Target": float})
+    df_final["start_date"] = df_final["start_date"].dt.date
+    return df_final.sort_values(by="start_date", ascending=False, kind="stable").reset_index(drop=True)
+
+BUDGET_EXCLUDED_CATEGORIES = ["Transfer", "Opening Balance", "Unknown", "Balance Adjustment"]
+
+def signed_budget_view(merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds SignedTarget / SignedActual (Income as is, everything else negative),
+    Diff and Status to rows of category, Target, Actual, category_type.
+    """
+    out = merged.drop(columns="category_type")
+    is_income = (merged["category_type"] == "Income").to_numpy()
+    target, actual = out["Target"].to_numpy(dtype=float), out["Actual"].to_numpy(dtype=float)
+    out["SignedTarget"] = np.where(is_income, target, -np.abs(target))
+    out["SignedActual"] = np.where(is_income, actual, -np.abs(actual))
+    out["Diff"] = out["SignedActual"] - out["SignedTarget"]
+    out["Status"] = np.select(
+        [(out["SignedTarget"] == 0) & (out["SignedActual"] == 0), out["SignedActual"] >= out["SignedTarget"]],
+        ["Unbudgeted", "✅ Good"], "⚠️ Attention",
+    )
+    return out.sort_values(by=["SignedTarget", "category"], ascending=[False, True]).reset_index(drop=True)
 
 def get_budget_vs_actual(selected_month_iso: str):
     y, m = map(int, selected_month_iso.split("-"))
@@ -99,148 +132,100 @@ def get_budget_vs_actual(selected_month_iso: str):
     
     rules = get_active_budget_rules()
     df_targets = calculate_monthly_budget_target(month_date, rules)
-    
-    if not df_targets.empty:
-        df_targets_sum = df_targets.groupby("category", as_index=False)["Target"].sum()
-    else:
-        df_targets_sum = pd.DataFrame(columns=["category", "Target"])
+    targets = df_targets.groupby("category", as_index=False)["Target"].sum()
 
-    df_tx = load_data_db("transactions")
-    if not df_tx.empty:
-        df_tx["date"] = pd.to_datetime(df_tx["date"], format='ISO8601', errors="coerce")
-        
-        exclude_cats = ["Transfer", "Opening Balance", "Unknown", "Balance Adjustment"]
-        
-        mask = (
-            (df_tx["date"].dt.strftime("%Y-%m") == selected_month_iso) & 
-            (df_tx["type"].isin(["Expense", "Income"])) &
-            (~df_tx["category"].isin(exclude_cats))
-        )
-        actuals = df_tx[mask].groupby("category")["amount"].sum().reset_index()
-        actuals.rename(columns={"amount": "Actual"}, inplace=True)
-    else:
-        actuals = pd.DataFrame(columns=["category", "Actual"])
-        
-        # Option 1: Explicitly set the option at the top of your file
-    pd.set_option('future.no_silent_downcasting', True)
-    df_merged = pd.merge(df_targets_sum, actuals, on="category", how="outer").fillna(0)
-
-    # OR Option 2: Use infer_objects as recommended by the error
-    # Replace the broken line 126 with this:
-    df_merged = pd.merge(df_targets_sum, actuals, on="category", how="outer").fillna(0).infer_objects(copy=False)  
-    if df_merged.empty:
+    # Actuals per category (plus every budgeted one) with its type, in one query
+    actuals = get_repository().budget_actuals(
+        f"{y:04d}-{m:02d}", categories=targets["category"].tolist(),
+        exclude_categories=BUDGET_EXCLUDED_CATEGORIES,
+    )
+    if actuals.empty:
         return pd.DataFrame(columns=["category", "SignedTarget", "SignedActual", "Diff", "Status"])
 
-    cat_df = load_data_db("categories")
-    cat_type_map = dict(zip(cat_df["name"], cat_df["type"])) if not cat_df.empty else {}
+    merged = targets.merge(actuals, on="category", how="right")
+    merged["Target"] = merged["Target"].fillna(0.0).astype(float)
+    return signed_budget_view(merged[["category", "Target", "Actual", "category_type"]])
 
-    def apply_signed_logic(row):
-        c_type = cat_type_map.get(row["category"], "Expense")
-        raw_target = row["Target"]
-        raw_actual = row["Actual"]
-        
-        if c_type == "Income":
-            return [raw_target, raw_actual]
-        else:
-            return [-abs(raw_target), -abs(raw_actual)]
-
-    df_merged[["SignedTarget", "SignedActual"]] = df_merged.apply(apply_signed_logic, axis=1, result_type="expand")
-
-    def get_status(row):
-        t = row["SignedTarget"]
-        a = row["SignedActual"]
-        if t == 0 and a == 0: return "Unbudgeted"
-        if a >= t: return "✅ Good"
-        else: return "⚠️ Attention"
-
-    df_merged["Diff"] = df_merged["SignedActual"] - df_merged["SignedTarget"]
-    df_merged["Status"] = df_merged.apply(get_status, axis=1)
-    
-    return df_merged.sort_values(by="SignedTarget", ascending=False)
-
-def _get_balance_at_date(account_name: str, target_date: date) -> float:
-    """Calculates account balance including all transactions up to target_date."""
-    df_tx = load_data_db("transactions")
-    if df_tx.empty:
-        return 0.0
-    
-    df_tx["date_dt"] = pd.to_datetime(df_tx["date"], format='ISO8601', errors="coerce").dt.date
-    
-    df_acc = df_tx[
-        (df_tx["account"] == account_name) & 
-        (df_tx["date_dt"] <= target_date)
-    ].copy()
-    
-    if df_acc.empty:
-        return 0.0
-        
-    def sign_amt(row):
-        amt = float(row["amount"])
-        t = str(row["type"]).strip().lower()
-        if t in ["income", "opening balance", "deposit", "refund"]: return amt
-        elif t in ["expense", "transfer", "withdrawal", "payment"]: return -abs(amt)
-        return 0.0
-        
-    return df_acc.apply(sign_amt, axis=1).sum()
+def _get_balance_at_date(account_name: str, target_date: date) -> float | None:
+    """Account balance including all transactions up to target_date (None if it could not be computed)."""
+    return get_balance_as_of(_get_user_id(), account_name, target_date)
 
 # ============================================================
 # 🔮 SHARED INTELLIGENCE: NEW FORECAST ENGINE
 # ============================================================
-def get_projection_data(start_balance: float, months: int, selected_account_view: str, scenario_adjustments: list = None):
-    rules = get_active_budget_rules()
+_NON_CASH_CATEGORIES = ["Opening Balance", "Unknown", "Balance Adjustment"]
+
+def _rule_signs(rules: pd.DataFrame, selected_account_view: str, cat_type_map: dict) -> np.ndarray:
+    """+1 / -1 / 0: how a due rule moves the selected account (transfer routing resolved once)."""
+    dest = rules["transfer_to_account"]
+    is_transfer = dest.notna() & ~dest.astype(str).isin(["", "None"])
+    if "Brukskonto" in selected_account_view or "Debit" in selected_account_view:
+        transfer_sign = np.where(dest == selected_account_view, 1.0, -1.0)
+    else:
+        transfer_sign = np.where(dest == selected_account_view, 1.0, 0.0)
+    if "Saving" in selected_account_view:
+        plain_sign = np.zeros(len(rules))
+    else:
+        plain_sign = np.where(rules["category"].map(cat_type_map).fillna("Expense") == "Income", 1.0, -1.0)
+    sign = np.where(is_transfer, transfer_sign, plain_sign)
+    sign[rules["category"].isin(_NON_CASH_CATEGORIES).to_numpy()] = 0.0
+    return sign
+
+def project_paths(rules_df: pd.DataFrame, month_dates: list[date], start_balance: float,
+                  selected_account_view: str, cat_type_map: dict, scenarios: list[list]) -> np.ndarray:
+    """
+    Balance paths, shape (scenarios × months). Each scenario is a list of
+    {'category', 'adjustment'} dicts added to the due target of that category.
+
+    The rules are expanded and routed once; per scenario only the adjustment
+    vector differs, so all paths come from one cumsum over the months axis.
+    """
+    net = np.zeros((len(scenarios), len(month_dates)))
+    rules, winner, _ = _expand_rules(rules_df, month_dates)
+    if len(rules) and len(scenarios):
+        sign = _rule_signs(rules, selected_account_view, cat_type_map)
+        # (scenarios × rules): the rule amount plus the scenario's adjustment of its category
+        adjustments = np.array([
+            rules["category"].map({item['category']: item['adjustment'] for item in adj}).fillna(0.0).to_numpy(dtype=float)
+            for adj in scenarios
+        ])
+        effect = sign * (rules["amount"].astype(float).to_numpy() + adjustments)
+        # Each month's winning rules: (scenarios × months × categories), summed over categories
+        net = np.where(winner >= 0, effect[:, np.maximum(winner, 0)], 0.0).sum(axis=2)
+
+    # The first month is the starting point; changes apply from the next month on
+    net[:, :1] = 0.0
+    return start_balance + np.cumsum(net, axis=1)
+
+def project_scenarios(start_balance: float, months: int, selected_account_view: str,
+                      scenarios: dict[str, list] | None = None) -> pd.DataFrame:
+    """
+    Balance paths of the current plan plus named scenarios, in long format
+    (Scenario, Month, Predicted Balance), from a single project_paths() call.
+    """
+    scenarios = {"Current Plan": [], **(scenarios or {})}
     today = date.today().replace(day=1)
-    
-    cat_df = load_data_db("categories")
+    month_dates = [today + relativedelta(months=i) for i in range(months)]
+
+    cat_df = get_repository().categories(columns=["name", "type"])
     cat_type_map = dict(zip(cat_df["name"], cat_df["type"])) if not cat_df.empty else {}
-    
-    adj_map = {}
-    if scenario_adjustments:
-        for item in scenario_adjustments:
-            adj_map[item['category']] = item['adjustment']
-    
-    projection = []
-    current_bal = start_balance
-    
-    for i in range(months):
-        future_date = today + relativedelta(months=i)
-        month_iso = future_date.strftime("%Y-%m")
-        
-        df_targets = calculate_monthly_budget_target(future_date, rules)
-        monthly_net_change = 0.0
-        
-        if not df_targets.empty:
-            for _, row in df_targets.iterrows():
-                cat = row["category"]
-                amt = row["Target"]
-                
-                if cat in adj_map:
-                    amt += adj_map[cat]
-
-                transfer_dest = row.get("transfer_to_account")
-                c_type = cat_type_map.get(cat, "Expense")
-                
-                if cat in ["Opening Balance", "Unknown", "Balance Adjustment"]:
-                    continue
-
-                if transfer_dest and pd.notna(transfer_dest) and transfer_dest != "None":
-                    if selected_account_view == transfer_dest:
-                        monthly_net_change += amt
-                    elif "Brukskonto" in selected_account_view or "Debit" in selected_account_view:
-                         monthly_net_change -= amt
-                else:
-                    is_savings_view = "Saving" in selected_account_view
-                    if not is_savings_view:
-                        if c_type == "Income":
-                            monthly_net_change += amt
-                        else:
-                            monthly_net_change -= amt
-        
-        if i > 0:
-            current_bal += monthly_net_change
-            
-        projection.append({"Month": month_iso, "Predicted Balance": current_bal})
-        
-    return pd.DataFrame(projection)
+
+    balances = project_paths(
+        get_active_budget_rules(), month_dates, start_balance, selected_account_view,
+        cat_type_map, list(scenarios.values()),
+    )
+    return pd.DataFrame({
+        "Scenario": np.repeat(list(scenarios), months),
+        "Month": [m.strftime("%Y-%m") for m in month_dates] * len(scenarios),
+        "Predicted Balance": balances.ravel(),
+    })
+
+def get_projection_data(start_balance: float, months: int, selected_account_view: str, scenario_adjustments: list = None):
+    """One balance path: the current plan, or the plan with `scenario_adjustments` applied."""
+    scenarios = {"Scenario": scenario_adjustments} if scenario_adjustments else None
+    df = project_scenarios(start_balance, months, selected_account_view, scenarios)
+    name = "Scenario" if scenario_adjustments else "Current Plan"
+    return df.loc[df["Scenario"] == name, ["Month", "Predicted Balance"]].reset_index(drop=True)
 
 # ============================================================
 # 🖥️ RENDERERS
@@ -258,8 +243,9 @@ def render_budget_planner():
             df["is_active"] = df["is_active"].astype(bool)
         st.session_state["budget_rules_df"] = df
 
-    cat_options = load_data_db("categories")["name"].tolist()
-    acc_options = ["None"] + load_data_db("accounts")["name"].tolist()
+    repo = get_repository()
+    cat_options = repo.categories(columns=["name"])["name"].tolist()
+    acc_options = ["None"] + repo.accounts(columns=["name"])["name"].tolist()
 
     edited_rules = st.data_editor(
         st.session_state["budget_rules_df"], 
@@ -331,7 +317,7 @@ def render_month_view():
 def render_forecast():
     st.markdown("#### 🔮 12-Month Liquidity Forecast")
     
-    acc_df = load_data_db("accounts")
+    acc_df = get_repository().accounts(columns=["name"])
     if acc_df.empty: 
         return
     
@@ -343,28 +329,28 @@ def render_forecast():
     last_day = calendar.monthrange(today.year, today.month)[1]
     end_of_current_month = date(today.year, today.month, last_day)
     current_balance = _get_balance_at_date(selected_acc, end_of_current_month)
+    if current_balance is None:
+        st.error(f"Could not calculate the balance of {selected_acc}; the forecast is unavailable.")
+        return
     
     st.caption(f"Starting Balance (End of {end_of_current_month.strftime('%B')}): **{current_balance:,.0f} kr**")
     
-    df_base = get_projection_data(current_balance, 12, selected_acc)
-    df_base["Scenario"] = "Current Plan"
-
     ai_scenarios = st.session_state.get("ai_scenarios", [])
+    plot_df = project_scenarios(
+        current_balance, 12, selected_acc, {"AI Scenario": ai_scenarios} if ai_scenarios else None
+    )
+    trend_df = _seasonal_trend_path(selected_acc, current_balance, plot_df["Month"].unique().tolist())
+    if trend_df is not None:
+        plot_df = pd.concat([plot_df, trend_df], ignore_index=True)
     if ai_scenarios:
-        df_ai = get_projection_data(current_balance, 12, selected_acc, scenario_adjustments=ai_scenarios)
-        df_ai["Scenario"] = "AI Scenario"
-        plot_df = pd.concat([df_base, df_ai])
-        
         # We create the text string first to avoid backslashes inside the f-string
         adjustment_text = ", ".join([f"{d.get('category')}: {d.get('adjustment')} kr" for d in ai_scenarios])
         st.info(f"💡 Simulating AI adjustments: {adjustment_text}")
-    else:
-        plot_df = df_base
     
     chart = alt.Chart(plot_df).mark_line(point=True, strokeWidth=3).encode(
         x=alt.X('Month', axis=alt.Axis(labelAngle=-45)),
         y=alt.Y('Predicted Balance', title='Est. Balance (kr)', scale=alt.Scale(zero=False)),
-        color=alt.Color('Scenario', scale=alt.Scale(domain=['Current Plan', 'AI Scenario'], range=['#1f77b4', '#ff7f0e'])),
+        color=alt.Color('Scenario', scale=alt.Scale(domain=['Current Plan', 'AI Scenario', 'Seasonal Trend'], range=['#1f77b4', '#ff7f0e', '#2ca02c'])),
         tooltip=['Month', 'Predicted Balance', 'Scenario']
     ).properties(height=350)
     
@@ -376,6 +362,54 @@ def render_forecast():
             st.session_state["ai_scenarios"] = []
             st.rerun()
 
+    if st.toggle("🎲 Stochastic forecast (Monte Carlo from history)", key="forecast_mc"):
+        _render_monte_carlo(selected_acc, current_balance)
+
+def _seasonal_trend_path(account: str, start_balance: float, months: list[str]) -> pd.DataFrame | None:
+    """Balance path from the account's own history: trend + month-of-year per category."""
+    model = get_seasonal_model(
+        f"account:{account}", lambda: rollup_category_flows(get_repository().monthly_rollup(), account=account, months=None)
+    )
+    if model.history.empty or not model.history.to_numpy().any():
+        return None
+    # History ends last month, so the first predicted month is the current one (the starting point)
+    net = model.predict(len(months)).sum(axis=1).to_numpy(copy=True)
+    net[:1] = 0.0
+    return pd.DataFrame({"Scenario": "Seasonal Trend", "Month": months, "Predicted Balance": start_balance + np.cumsum(net)})
+
+def _render_monte_carlo(account: str, start_balance: float):
+    c1, c2, c3 = st.columns(3)
+    horizon = c1.selectbox("Horizon (months)", [12, 24, 36], index=1, key="mc_horizon")
+    n_paths = c2.selectbox("Paths", [1_000, 5_000, 10_000], index=2, key="mc_paths")
+    method = c3.radio("Model", ["bootstrap", "normal"], horizontal=True, key="mc_method",
+                      help="bootstrap: replay past months per category · normal: fitted mean/std per category")
+
+    flows = rollup_category_flows(get_repository().monthly_rollup(), account=account, months=24)
+    if flows.empty or not flows.to_numpy().any():
+        st.info("Not enough history on this account for a stochastic forecast.")
+        return
+    sim = simulate_cash_flow(flows, start_balance, horizon=horizon, n_paths=n_paths, method=method)
+
+    band = alt.Chart(sim).mark_area(opacity=0.25, color="#1f77b4").encode(
+        x=alt.X("month", title="Month", axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y("P10", title="Est. Balance (kr)"), y2="P90",
+        tooltip=["month", alt.Tooltip("P10", format=",.0f"), alt.Tooltip("P50", format=",.0f"), alt.Tooltip("P90", format=",.0f")],
+    )
+    median = alt.Chart(sim).mark_line(point=True, color="#1f77b4").encode(x="month", y="P50")
+    zero_rule = alt.Chart(pd.DataFrame({'y': [0]})).mark_rule(color='red', strokeDash=[5,5]).encode(y='y')
+    st.altair_chart((band + median + zero_rule).properties(height=320), use_container_width=True)
+
+    risk = alt.Chart(sim).mark_bar(color="#d62728").encode(
+        x=alt.X("month", title="Month", axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y("p_overdraft", title="P(overdraft)", axis=alt.Axis(format="%"), scale=alt.Scale(domain=[0, 1])),
+        tooltip=["month", alt.Tooltip("p_overdraft", format=".1%"), alt.Tooltip("p_overdraft_by", format=".1%", title="by then")],
+    ).properties(height=160)
+    st.altair_chart(risk, use_container_width=True)
+    st.caption(
+        f"{n_paths:,} simulated paths from the last 24 months of **{account}** · "
+        f"chance of an overdraft within {horizon} months: **{sim['p_overdraft_by'].iloc[-1]:.0%}**"
+    )
+
 def render_budget():
     check_and_migrate_budget_schema()
     st.markdown("### 📊 Budget & Financial Planning")
@@ -9,7 +9,7 @@ for natural-language insight summaries and suggestions.
 import streamlit as st
 import pandas as pd
 from datetime import date
-from core.db_operations import load_data_db
+from core.repository import get_repository
 from config.config import format_currency
 from services.ai_services import get_ai_chat_response  # your existing AI wrapper
 from config.i18n import t
@@ -22,21 +22,20 @@ def render_budget_insights():
     st.header("🤖 Budget Insights")
 
     # ---- Load data
-    tx = load_data_db("transactions")
-    budgets = load_data_db("budgets")
-    cats = load_data_db("categories")
+    repo = get_repository()
+    tx = repo.monthly_rollup()
+    budgets = repo.load("budgets")
+    cats = repo.categories()
 
     if tx.empty or budgets.empty:
         st.info("Add transactions and budgets to generate insights.")
         return
 
     # ---- Month selector
-    tx["date"] = pd.to_datetime(tx["date"], errors="coerce")
-    tx["month"] = tx["date"].dt.to_period("M").astype(str)
     months = sorted(tx["month"].unique().tolist(), reverse=True)
     selected_month = st.selectbox("Select Month", months, index=0)
 
-    # ---- Build summary table
+    # ---- Build summary table (rollup rows of the month)
     txm = tx[tx["month"] == selected_month]
     if txm.empty:
         st.info("No transactions for this month.")
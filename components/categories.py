@@ -10,7 +10,8 @@ from config.i18n import t
 # ============================================================
 # DB OPS (Cloud-safe imports)
 # ============================================================
-from core.db_operations import load_data_db, add_record_db, execute_query_db
+from core.db_operations import add_record_db, execute_query_db
+from core.repository import get_repository
 
 # Optional helpers (won’t crash if missing)
 try:
@@ -64,7 +65,7 @@ def _dialog_add_category():
         c_type = st.selectbox("Type", ["Expense", "Income"])
         
         # Load potential parents
-        df = load_data_db("categories")
+        df = get_repository().categories()
         parents = sorted(df["name"].unique().tolist()) if not df.empty else []
         parent = st.selectbox("Parent Category (Optional)", [""] + parents)
         
@@ -94,7 +95,7 @@ def render_categories():
     st.header("🗂️ Manage Categories")
     
     # 1. Load Data
-    df = _ensure_schema(load_data_db("categories"))
+    df = _ensure_schema(get_repository().categories())
     
     # 2. Metrics Bar
     if not df.empty:
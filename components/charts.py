@@ -9,7 +9,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
-from core.db_operations import load_data_db
+from core.db_operations import get_transfer_rules
+from core.ledger import internal_transfer_mask
+from core.repository import current_user_id, get_ledger, get_repository
 from config.config import format_currency, get_setting
 from config.i18n import t
 
@@ -38,32 +40,26 @@ def get_theme_palette():
 # ============================================================
 
 def _prepare_transactions_analytics(exclude_categories=None):
-    df = load_data_db("transactions")
+    df = get_ledger()
     if df.empty: return df
     
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df = df.dropna(subset=["date"])
-    df["amount"] = pd.to_numeric(df.get("amount", 0), errors="coerce").fillna(0.0)
     df["type"] = df["type"].astype(str).str.strip().str.title()
     
-    # Filter Balance Adjustments & Transfers
-    exclude_list = ["Transfer", "Overføring", "Overforing", "Adjustment", "Balansejustering", "Balance Adjustment"]
-    pattern = "overføring|transfer|adjustment|balansejustering"
-    
-    mask_exclude = (
-        df["type"].isin(exclude_list) | 
-        df["category"].isin(exclude_list) |
-        df["payee"].astype(str).str.lower().str.contains(pattern, na=False) |
-        df["description"].astype(str).str.lower().str.contains(pattern, na=False)
-    )
-    df = df[~mask_exclude]
+    # Filter Balance Adjustments & Transfers (flagged when written; rows from
+    # before the flag existed are classified here until the backfill has run)
+    flags = df.get("is_internal_transfer", pd.Series(pd.NA, index=df.index, dtype="boolean"))
+    pending = flags.isna()
+    if pending.any():
+        flags = flags.mask(pending, internal_transfer_mask(df[pending], get_transfer_rules(current_user_id())))
+    df = df[~flags.to_numpy(dtype=bool)]
     
     if exclude_categories:
         df = df[~df["category"].isin(exclude_categories)]
     
-    df["category"] = df["category"].fillna("Uncategorized").replace("", "Uncategorized")
-    df["payee"] = df["payee"].fillna("Unknown").replace("", "Unknown")
+    # Ledger labels are categorical; new fill labels need plain object columns
+    df["category"] = df["category"].astype("object").fillna("Uncategorized").replace("", "Uncategorized")
+    df["payee"] = df["payee"].astype("object").fillna("Unknown").replace("", "Unknown")
     return df
 
 # ============================================================
@@ -78,7 +74,8 @@ def render_analytics_dashboard(prefix: str = "analytics"):
     with c1: start_date = st.date_input("From", value=datetime.today().replace(month=1, day=1))
     with c2: end_date = st.date_input("To", value=datetime.today())
     
-    all_cats = sorted(load_data_db("categories")["name"].unique().tolist()) if not load_data_db("categories").empty else []
+    cat_df = get_repository().categories(columns=["name"])
+    all_cats = sorted(cat_df["name"].dropna().unique().tolist()) if not cat_df.empty else []
     with c3:
     # Get the saved defaults from settings
         saved_defaults = get_setting("analytics_excluded_categories", ["Transfer"])
@@ -9,15 +9,14 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 
-from core.db_operations import load_data_db, execute_query_db
+from config.config import format_currency
+from core.db_operations import (
+    apply_transaction_changes, execute_query_db, load_data_db, load_transactions_page, search_transactions,
+    transactions_summary,
+)
+from core.frame_diff import diff_frames
 
 # Optional helper: don't crash if missing
-try:
-    from core.db_operations import save_data_db
-except ImportError:
-    def save_data_db(*args, **kwargs):
-        return False
-
 try:
     from core.db_operations import add_record_db
 except ImportError:
@@ -62,6 +61,9 @@ INTEGER_COLUMNS = [
 
 USER_DATA_TABLES = list(SCHEMA_COLUMNS.keys())
 
+# Transaction editor page sizes; only one page is loaded at a time
+PAGE_SIZES = [25, 50, 100, 250]
+
 
 def _get_user_id() -> str:
     return st.session_state.get("username", "default")
@@ -157,44 +159,69 @@ def render_transaction_editor():
     st.subheader("📝 Edit or Delete Transactions")
 
     user_id = _get_user_id()
-    df = load_data_db("transactions", user_id=user_id)
-
-    if df is None or df.empty:
-        st.warning("No transactions found.")
-        return
 
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-    col1, col2 = st.columns([2, 1])
+    col1, col2, col3 = st.columns([2, 1, 1])
     with col1:
-        search_term = st.text_input("🔍 Search", placeholder="Payee, Category, Amount…")
+        search_term = st.text_input("🔍 Search", placeholder="Payee, Category, Description, Amount…")
     with col2:
         show_all = st.checkbox("Show all history", value=False)
-
-    mask = pd.Series([True] * len(df))
-
-    if not show_all and "date" in df.columns:
-        cutoff = pd.Timestamp.today() - pd.Timedelta(days=60)
-        mask &= (df["date"] >= cutoff)
-
-    if search_term:
-        q = search_term.lower()
-        for c in ("payee", "category", "amount"):
-            if c not in df.columns:
-                df[c] = ""
-        mask &= (
-            df["payee"].astype(str).str.lower().str.contains(q, na=False)
-            | df["category"].astype(str).str.lower().str.contains(q, na=False)
-            | df["amount"].astype(str).str.contains(q, na=False)
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+    # Without "show all", only the last 60 days are fetched from the DB
+    cutoff = None if show_all else (pd.Timestamp.today() - pd.Timedelta(days=60)).date()
+
+    # A search can list the best matches instead of paging through them by date
+    best_match = bool(search_term.strip()) and st.radio(
+        "Order", ["Newest first", "Best match"], horizontal=True, label_visibility="collapsed"
+    ) == "Best match"
+
+    # Keyset pagination: a stack of page-start cursors, reset whenever the filter changes
+    query_key = (search_term.strip().lower(), show_all, page_size, best_match)
+    if st.session_state.get("tx_page_query") != query_key:
+        st.session_state["tx_page_query"] = query_key
+        st.session_state["tx_page_cursors"] = [None]
+        st.session_state["tx_page_epoch"] = st.session_state.get("tx_page_epoch", 0) + 1
+    cursors = st.session_state["tx_page_cursors"]
+
+    if best_match:
+        filtered_df = search_transactions(user_id, search_term, page_size, date_from=cutoff).drop(
+            columns="rank", errors="ignore"
         )
+        next_cursor = None
+    else:
+        filtered_df, next_cursor = load_transactions_page(user_id, page_size, cursors[-1], search_term, cutoff)
+    if filtered_df.empty and len(cursors) == 1:
+        st.warning("No transactions found.")
+        return
 
-    filtered_df = df[mask].sort_values(by="date", ascending=False).reset_index(drop=True)
+    summary = transactions_summary(user_id, search_term, cutoff)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Transactions", f"{summary['count']:,}")
+    m2.metric("Income", format_currency(summary["income"]))
+    m3.metric("Expenses", format_currency(summary["expense"]))
+    m4.metric("Net", format_currency(summary["net"]))
+
+    if "date" in filtered_df.columns:
+        filtered_df["date"] = pd.to_datetime(filtered_df["date"], errors="coerce")
+
+    page_no = len(cursors)
+    n_pages = max(1, -(-summary["count"] // page_size))
+    nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+    if nav_prev.button("◀ Newer", disabled=page_no == 1, use_container_width=True):
+        cursors.pop()
+        st.rerun()
+    nav_info.caption(
+        f"Top {len(filtered_df)} matches" if best_match else f"Page {page_no} of {n_pages}"
+    )
+    if nav_next.button("Older ▶", disabled=next_cursor is None, use_container_width=True):
+        cursors.append(next_cursor)
+        st.rerun()
 
     edited_df = st.data_editor(
         filtered_df,
         num_rows="dynamic",
-        key="tx_editor",
+        key=f"tx_editor_{st.session_state['tx_page_epoch']}_{page_no}",
         use_container_width=True,
         column_config={
             "id": st.column_config.NumberColumn("ID", disabled=True),
@@ -207,47 +234,15 @@ def render_transaction_editor():
 
     if st.button("💾 Save Changes", type="primary", use_container_width=True):
         try:
-            # Detect deletions
-            orig_ids = set(filtered_df.get("id", pd.Series(dtype=float)).dropna().unique())
-            new_ids = set(edited_df.get("id", pd.Series(dtype=float)).dropna().unique())
-            to_delete = orig_ids - new_ids
-
-            for d_id in to_delete:
-                execute_query_db(
-                    "DELETE FROM transactions WHERE id = :id AND user_id = :uid",
-                    {"id": int(d_id), "uid": user_id},
-                )
-
-            # Save updates/inserts
-            saved = 0
-            for rec in edited_df.to_dict(orient="records"):
-                # Normalize NaNs
-                for k, v in list(rec.items()):
-                    if v is pd.NaT or pd.isna(v):
-                        rec[k] = None
-                rec["user_id"] = user_id
-
-                # Use save_data_db if available; else do manual update/insert
-                if save_data_db("transactions", rec):
-                    saved += 1
-                else:
-                    # fallback: if save_data_db missing or failed, do a direct update/insert
-                    if rec.get("id"):
-                        _id = rec.pop("id")
-                        set_clause = ", ".join([f"{k} = :{k}" for k in rec.keys()])
-                        execute_query_db(
-                            f"UPDATE transactions SET {set_clause} WHERE id = :id AND user_id = :uid",
-                            {**rec, "id": _id, "uid": user_id},
-                        )
-                        saved += 1
-                    else:
-                        # insert without id
-                        rec.pop("id", None)
-                        if add_record_db:
-                            add_record_db("transactions", rec)
-                            saved += 1
-
-            st.success(f"✅ Saved {saved} row(s).")
+            # Only changed cells, new rows and removed ids go to the DB, in one transaction
+            changes = diff_frames(filtered_df, edited_df, key="id")
+            if changes.empty:
+                st.info("No changes to save.")
+                return
+            counts = apply_transaction_changes(user_id, changes.inserts, changes.updates, changes.deletes)
+            st.success(
+                f"✅ Saved: {counts['updated']} updated, {counts['inserted']} added, {counts['deleted']} deleted."
+            )
             st.rerun()
         except Exception as e:
             st.error(f"Error saving changes: {e}")
@@ -1,10 +1,9 @@
 ﻿# components/insights_forecast.py
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime
-from core.db_operations import load_data_db
+from core.repository import get_repository, get_seasonal_model
 from config.config import format_currency
 from config.i18n import t
 
@@ -15,22 +14,18 @@ from config.i18n import t
 def render_forecast_and_radar():
     """
     Forecast next months for Income / Expense / Net and show a Financial Health Radar.
-    Works from the `transactions` table only.
+    Works from the monthly rollup of the `transactions` table only.
     """
     st.header("🔮 Forecast & 🎯 Financial Health Radar")
 
-    tx = load_data_db("transactions")
+    tx = get_repository().monthly_rollup()
     if tx.empty:
         st.info("No transactions found. Add transactions to see forecasts and radar.")
         return
 
     # ---------- Prep ----------
     df = tx.copy()
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = df.dropna(subset=["date"])
-    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
     df["type"] = df["type"].where(df["type"].isin(["Income", "Expense"]), "Expense")
-    df["month"] = df["date"].dt.to_period("M").astype(str)
 
     # Min months to forecast reliably
     months_order = sorted(df["month"].unique().tolist())
@@ -59,35 +54,19 @@ def render_forecast_and_radar():
     monthly["Net"] = monthly["Income"] - monthly["Expense"]
     monthly = monthly.sort_values("month")
 
-    # ---------- Simple linear forecast ----------
-    # We avoid extra dependencies; use polyfit on time index
-    def _lin_forecast(series: pd.Series, months: list[str], steps: int, pct_adjust: float = 0.0):
-        # x = 0..n-1; y = series values
-        y = series.values.astype(float)
-        x = np.arange(len(y))
-        # If constant or too short, fall back to simple mean
-        if len(y) < 2 or np.allclose(y, y.mean()):
-            base = float(np.maximum(0.0, y.mean()))
-            fc = np.full(steps, base)
-        else:
-            m, b = np.polyfit(x, y, 1)  # slope, intercept
-            x_future = np.arange(len(y), len(y) + steps)
-            fc = m * x_future + b
-            fc = np.where(fc < 0, 0.0, fc)
+    # ---------- Seasonal forecast ----------
+    # Trend + month-of-year per (type, category), fitted for all series at once
+    def _type_category_flows() -> pd.DataFrame:
+        named = df[df["category"] != ""]
+        flows = named.groupby([pd.PeriodIndex(named["month"], freq="M").rename("month"), "type", "category"])["amount"].sum()
+        flows = flows.unstack(["type", "category"], fill_value=0.0)
+        return flows.reindex(pd.period_range(flows.index.min(), flows.index.max(), freq="M", name="month"), fill_value=0.0)
 
-        if pct_adjust != 0:
-            fc = fc * (1.0 + pct_adjust / 100.0)
-        # Build labels
-        last = pd.Period(months[-1]).asfreq("M")
-        labels = [(last + i + 1).strftime("%Y-%m") for i in range(steps)]
-        return labels, fc
-
-    inc_labels, inc_fc = _lin_forecast(
-        monthly["Income"], monthly["month"].tolist(), horizon, inc_growth
-    )
-    exp_labels, exp_fc = _lin_forecast(
-        monthly["Expense"], monthly["month"].tolist(), horizon, exp_growth
-    )
+    model = get_seasonal_model("radar", _type_category_flows)
+    by_type = model.predict(horizon, clip_at_zero=True).T.groupby(level="type").sum().T
+    inc_labels = by_type.index.strftime("%Y-%m").tolist()
+    inc_fc = by_type.get("Income", pd.Series(0.0, index=by_type.index)).to_numpy() * (1.0 + inc_growth / 100.0)
+    exp_fc = by_type.get("Expense", pd.Series(0.0, index=by_type.index)).to_numpy() * (1.0 + exp_growth / 100.0)
     net_fc = inc_fc - exp_fc
     fc_df = pd.DataFrame({"month": inc_labels, "Income": inc_fc, "Expense": exp_fc, "Net": net_fc})
 
@@ -123,7 +102,7 @@ def render_forecast_and_radar():
         yaxis_title="Amount",
     )
     st.plotly_chart(
-        fig,
+        fig1,
         config={"responsive": True, "displaylogo": False, "scrollZoom": False, "editable": False},
     )
 
@@ -148,7 +127,7 @@ def render_forecast_and_radar():
         hovermode="x unified",
     )
     st.plotly_chart(
-        fig,
+        fig2,
         config={"responsive": True, "displaylogo": False, "scrollZoom": False, "editable": False},
     )
 
@@ -222,7 +201,7 @@ def render_forecast_and_radar():
         title="Financial Health Radar (0–100)",
     )
     st.plotly_chart(
-        fig,
+        figR,
         config={"responsive": True, "displaylogo": False, "scrollZoom": False, "editable": False},
     )
 
@@ -10,7 +10,9 @@ import plotly.graph_objects as go
 import streamlit as st
 from dateutil.relativedelta import relativedelta
 
-from core.db_operations import load_data_db, execute_query_db
+from core.db_operations import add_transactions_batch, load_data_db, execute_query_db
+from core.repository import get_repository
+from core.loan_math import ScheduleCache, generate_schedule as _generate_schedule, sweep_schedules
 
 # Optional helper (won’t crash if missing)
 try:
@@ -103,219 +105,100 @@ def _ensure_loans_schema():
 # ============================================================
 # 🔄 DATA FETCHING
 # ============================================================
-@st.cache_data(ttl=5)
-def _load_loans_cached(user_id: str, version: int) -> pd.DataFrame:
-    df = load_data_db("loans")
+def _load_loans_cached(user_id: str) -> pd.DataFrame:
+    """Version-stamped repository cache; loan writes invalidate it on commit."""
+    df = get_repository(user_id).cached("loans")
     if df is not None and not df.empty:
-        if 'user_id' in df.columns:
-             return df[df['user_id'].astype(str) == str(user_id)]
+        return df.copy()
     return pd.DataFrame()
 
-def _load_adjustments(loan_id: int) -> pd.DataFrame:
-    """Fetch extra payments/adjustments."""
-    df = load_data_db("loan_extra_payments")
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["id", "loan_id", "pay_date", "amount", "note"])
-    
-    if 'loan_id' in df.columns:
-        df_filtered = df[df['loan_id'].astype(str) == str(loan_id)].copy()
-    else:
-        return pd.DataFrame(columns=["id", "loan_id", "pay_date", "amount", "note"])
-        
-    if df_filtered.empty:
-        return pd.DataFrame(columns=["id", "loan_id", "pay_date", "amount", "note"])
+_EXTRAS_COLUMNS = ["id", "loan_id", "pay_date", "amount", "note"]
+_TERMS_COLUMNS = ["id", "loan_id", "change_date", "interest_rate", "admin_fee", "note"]
 
-    if 'pay_date' in df_filtered.columns:
-        df_filtered['pay_date'] = pd.to_datetime(df_filtered['pay_date'])
-        df_filtered = df_filtered.sort_values(by="pay_date")
-        
-    return df_filtered
+def _group_by_loan(df: pd.DataFrame, date_col: str) -> dict[int, pd.DataFrame]:
+    if df is None or df.empty or "loan_id" not in df.columns:
+        return {}
+    df = df.copy()
+    df[date_col] = pd.to_datetime(df[date_col])
+    df = df.sort_values(by=date_col, kind="stable")
+    return {int(k): g.reset_index(drop=True) for k, g in df.groupby("loan_id", sort=False)}
 
-def _load_terms_history(loan_id: int) -> pd.DataFrame:
-    """Fetch interest rate/fee changes."""
-    df = load_data_db("loan_terms_history")
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["id", "loan_id", "change_date", "interest_rate", "admin_fee", "note"])
-    
-    if 'loan_id' in df.columns:
-        df_filtered = df[df['loan_id'].astype(str) == str(loan_id)].copy()
-    else:
-        return pd.DataFrame(columns=["id", "loan_id", "change_date", "interest_rate", "admin_fee", "note"])
-        
-    if df_filtered.empty:
-        return pd.DataFrame(columns=["id", "loan_id", "change_date", "interest_rate", "admin_fee", "note"])
+def _load_loan_side_tables(user_id: str) -> tuple[dict[int, pd.DataFrame], dict[int, pd.DataFrame]]:
+    """
+    All of the user's extra payments and terms changes, grouped by loan_id:
+    two queries per page regardless of the number of loans (served from the
+    version-stamped cache until one of the tables is written).
+    """
+    repo = get_repository(user_id)
+    extras = repo.cached("loan_extra_payments", columns=_EXTRAS_COLUMNS, order_by="id")
+    terms = repo.cached("loan_terms_history", columns=_TERMS_COLUMNS, order_by="id")
+    return _group_by_loan(extras, "pay_date"), _group_by_loan(terms, "change_date")
 
-    if 'change_date' in df_filtered.columns:
-        df_filtered['change_date'] = pd.to_datetime(df_filtered['change_date'])
-        df_filtered = df_filtered.sort_values(by="change_date")
-        
-    return df_filtered
+def _load_adjustments(loan_id: int) -> pd.DataFrame:
+    """Extra payments/adjustments of one loan."""
+    df = _load_loan_side_tables(_get_user_id_loan())[0].get(int(loan_id))
+    return df.copy() if df is not None else pd.DataFrame(columns=_EXTRAS_COLUMNS)
+
+def _load_terms_history(loan_id: int) -> pd.DataFrame:
+    """Interest rate/fee changes of one loan."""
+    df = _load_loan_side_tables(_get_user_id_loan())[1].get(int(loan_id))
+    return df.copy() if df is not None else pd.DataFrame(columns=_TERMS_COLUMNS)
 
 # ============================================================
-# 🧮 MATH HELPERS
+# 🗃️ SCHEDULE CACHE
 # ============================================================
-def _add_months(start_date, months):
-    return start_date + relativedelta(months=+months)
-
-def _count_months(start_date, end_date):
-    diff = relativedelta(end_date, start_date)
-    return diff.years * 12 + diff.months
-
-def _calculate_annuity_payment(principal, annual_rate, months):
-    if months <= 0: return principal
-    if annual_rate <= 0: return principal / months
-    r = (annual_rate / 100.0) / 12.0
-    numerator = r * principal
-    denominator = 1 - (1 + r)**(-months)
-    return numerator / denominator
-
-def _generate_schedule(
-    balance, rate, start_date, payment_day, mode, 
-    loan_type="Annuity", 
-    target_payment=None, target_date=None, admin_fee=0, 
-    extra_payments_df=None, terms_history_df=None,
-    io_from=None, io_to=None
-):
-    schedule = []
-    current_balance = float(balance)
-    
-    current_rate = float(rate)
-    current_fee = float(admin_fee)
-    
-    # Process extras
-    extras = {}
-    if extra_payments_df is not None and not extra_payments_df.empty:
-        if not pd.api.types.is_datetime64_any_dtype(extra_payments_df['pay_date']):
-            extra_payments_df['pay_date'] = pd.to_datetime(extra_payments_df['pay_date'])
-        for _, row in extra_payments_df.iterrows():
-            d = row['pay_date'].date()
-            key = (d.year, d.month)
-            extras[key] = extras.get(key, 0.0) + float(row['amount'])
-
-    # Process terms history
-    terms_changes = []
-    if terms_history_df is not None and not terms_history_df.empty:
-        if not pd.api.types.is_datetime64_any_dtype(terms_history_df['change_date']):
-            terms_history_df['change_date'] = pd.to_datetime(terms_history_df['change_date'])
-        for _, row in terms_history_df.iterrows():
-            terms_changes.append({
-                'date': row['change_date'].date(),
-                'rate': float(row['interest_rate']),
-                'fee': float(row['admin_fee'])
-            })
-        terms_changes.sort(key=lambda x: x['date'])
-
-    current_date = start_date
-    if current_date.day > payment_day:
-         current_date = _add_months(current_date, 1)
-    current_date = current_date.replace(day=payment_day)
-
-    max_months = 720 # 60 years cap
-    
-    fixed_principal_amount = 0.0
-    annuity_payment_amount = 0.0
-    
-    def recalculate_payment(curr_bal, curr_rate, calc_date):
-        if mode == 'date' and target_date:
-            rem_months = max(1, _count_months(calc_date, target_date))
-            if loan_type == "Serial":
-                return curr_bal / rem_months
-            elif loan_type == "Frame":
-                return 0.0
-            else:
-                return _calculate_annuity_payment(curr_bal, curr_rate, rem_months)
-        else:
-             return float(target_payment)
-
-    base_payment_val = recalculate_payment(current_balance, current_rate, start_date)
-    if loan_type == "Serial": fixed_principal_amount = base_payment_val
-    elif loan_type == "Annuity": annuity_payment_amount = base_payment_val
-    elif loan_type == "Frame": fixed_principal_amount = 0.0
+# Process-wide LRU keyed by a fingerprint of all schedule inputs, so an unchanged
+# loan renders without recomputing. Writes to a loan's extras/terms drop its entries.
+_SCHEDULES = ScheduleCache(max_entries=256)
 
-    month_idx = 1
-    
-    while current_balance > 1.0 and month_idx <= max_months:
-        
-        # 1. Update Terms
-        active_terms = None
-        for chg in terms_changes:
-            if chg['date'] <= current_date:
-                active_terms = chg
-            else:
-                break
-        
-        new_rate = active_terms['rate'] if active_terms else float(rate)
-        new_fee = active_terms['fee'] if active_terms else float(admin_fee)
-        
-        terms_changed = (abs(new_rate - current_rate) > 0.001)
-        
-        current_rate = new_rate
-        current_fee = new_fee
-        monthly_rate = (current_rate / 100.0) / 12.0
-        
-        # 2. Recalculate Payment
-        if terms_changed and mode == 'date' and loan_type != "Frame":
-            base_payment_val = recalculate_payment(current_balance, current_rate, current_date)
-            if loan_type == "Serial": fixed_principal_amount = base_payment_val
-            elif loan_type == "Annuity": annuity_payment_amount = base_payment_val
-
-        # 3. Compute Interest
-        interest = current_balance * monthly_rate
-        
-        # 4. Payment
-        is_io = False
-        if io_from and io_to and io_from <= current_date <= io_to: is_io = True
-        if loan_type == "Frame": is_io = True 
-
-        principal_payment = 0.0
-        required_payment = 0.0
-        
-        if is_io:
-            principal_payment = 0.0
-            required_payment = interest
-        else:
-            if loan_type == "Serial":
-                principal_payment = fixed_principal_amount
-                required_payment = principal_payment + interest
-            else:
-                base = annuity_payment_amount
-                if base < interest: base = interest 
-                principal_payment = base - interest
-                required_payment = base
-
-        if principal_payment > current_balance:
-            principal_payment = current_balance
-            required_payment = interest + principal_payment
+def _cached_schedule(loan_id, **kwargs) -> pd.DataFrame:
+    return _SCHEDULES.get(owner=(_get_user_id_loan(), int(loan_id)), **kwargs)
 
-        extra_amt = extras.get((current_date.year, current_date.month), 0.0)
-        real_principal = principal_payment + extra_amt
-        total_deduction = required_payment + current_fee + extra_amt
+def _invalidate_schedules(loan_id) -> None:
+    _SCHEDULES.invalidate((_get_user_id_loan(), int(loan_id)))
 
-        if real_principal > current_balance:
-            excess = real_principal - current_balance
-            real_principal = current_balance
-            total_deduction -= excess 
-
-        end_balance = current_balance - real_principal
-        
-        status_label = "Payment"
-        if is_io: status_label = "Interest Only"
-        if loan_type == "Frame" and extra_amt > 0: status_label = "Extra Payment"
-
-        schedule.append({
-            "Month": month_idx, "Date": current_date,
-            "Start Balance": current_balance, "Interest": interest,
-            "Rate %": current_rate, "Fee": current_fee,
-            "Principal": principal_payment, "Extra / Adj": extra_amt,
-            "Admin Fee": current_fee, "Total Payment": total_deduction,
-            "End Balance": max(0, end_balance),
-            "Status": status_label
-        })
-        current_balance = end_balance
-        current_date = _add_months(current_date, 1)
-        month_idx += 1
-
-    return pd.DataFrame(schedule)
+# ============================================================
+# 🧪 WHAT-IF SWEEP
+# ============================================================
+def _render_what_if(meta: dict, df: pd.DataFrame):
+    """Heatmap of payoff time / total interest over a rate × payment grid around the plan."""
+    if meta['type'] == "Frame":
+        st.info("Frame loans have no scheduled principal; add extra payments to model payoff.")
+        return
+
+    base_pay = float(meta['pay_in']) or float(df["Total Payment"].iloc[0])
+    if meta['mode'] == 'date' and meta['type'] == "Annuity":
+        base_pay -= float(meta['fee'])  # the saved mean includes the admin fee
+    c1, c2, c3 = st.columns(3)
+    rate_span = c1.slider("Rate ± (pp)", 0.5, 5.0, 2.0, 0.5, key="wi_rate_span")
+    pay_span = c2.slider("Payment ± (%)", 10, 80, 40, 5, key="wi_pay_span")
+    monthly_extra = c3.number_input("Extra / month (NOK)", min_value=0.0, value=0.0, step=500.0, key="wi_extra")
+    metric = st.radio("Show", ["Years to payoff", "Total interest"], horizontal=True, key="wi_metric")
+
+    rates = np.round(np.linspace(max(0.0, meta['rate'] - rate_span), meta['rate'] + rate_span, 50), 3)
+    payments = np.round(np.linspace(base_pay * (1 - pay_span / 100), base_pay * (1 + pay_span / 100), 50), 0)
+    res = sweep_schedules(
+        meta['balance'], meta['start'], int(meta['day']), rates, payments,
+        extra_plans=[monthly_extra or None], loan_type=meta['type'],
+    )
+
+    if metric == "Years to payoff":
+        z = np.where(res.paid_off, res.months / 12.0, np.nan)[0]
+        fmt, label = ".1f", "Years"
+    else:
+        z = np.where(res.paid_off, res.total_interest, np.nan)[0]
+        fmt, label = ",.0f", "Interest"
+    pay_lbl = "Fixed Principal" if meta['type'] == "Serial" else "Monthly Payment"
+    fig = go.Figure(go.Heatmap(
+        z=z, x=payments, y=rates, colorscale="RdYlGn_r", colorbar=dict(title=label),
+        hovertemplate=f"Rate %{{y:.2f}}%<br>{pay_lbl} %{{x:,.0f}}<br>{label} %{{z:{fmt}}}<extra></extra>",
+    ))
+    fig.add_trace(go.Scatter(x=[base_pay], y=[meta['rate']], mode="markers",
+                             marker=dict(symbol="x", size=12, color="black"), name="Current plan"))
+    fig.update_layout(xaxis_title=pay_lbl, yaxis_title="Interest Rate (%)", height=450,
+                      margin=dict(l=0, r=0, t=30, b=0), showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("Blank cells never pay off within 60 years. Fixed-payment rules; terms changes and IO periods are not applied.")
 
 # ============================================================
 # 🟢 DIALOGS
@@ -336,7 +219,8 @@ def _dialog_manage_adjustments(loan_id, loan_name):
                 "loan_id": int(loan_id), "pay_date": d_date.isoformat(),
                 "amount": float(d_amt), "note": d_note, "user_id": user_id
             })
-            st.success("Added!"); st.session_state["loan_data_version"] += 1; st.rerun()
+            _invalidate_schedules(loan_id)
+            st.success("Added!"); st.rerun()
 
     df_adj = _load_adjustments(loan_id)
     if not df_adj.empty:
@@ -348,7 +232,8 @@ def _dialog_manage_adjustments(loan_id, loan_name):
             c3.write(row['note'])
             if c4.button("🗑️", key=f"d_adj_{row['id']}"):
                 execute_query_db("DELETE FROM loan_extra_payments WHERE id = :id", {"id": row['id']})
-                st.session_state["loan_data_version"] += 1; st.rerun()
+                _invalidate_schedules(loan_id)
+                st.rerun()
     else: st.caption("No adjustments.")
 
 @st.dialog("📉 Terms & Rates")
@@ -371,7 +256,8 @@ def _dialog_manage_terms(loan_id, loan_name, current_rate, current_fee):
                 "interest_rate": float(t_rate), "admin_fee": float(t_fee),
                 "note": t_note, "user_id": user_id
             })
-            st.success("Terms Updated!"); st.session_state["loan_data_version"] += 1; st.rerun()
+            _invalidate_schedules(loan_id)
+            st.success("Terms Updated!"); st.rerun()
 
     df_terms = _load_terms_history(loan_id)
     if not df_terms.empty:
@@ -383,9 +269,49 @@ def _dialog_manage_terms(loan_id, loan_name, current_rate, current_fee):
             c3.write(row['note'])
             if c4.button("🗑️", key=f"d_term_{row['id']}"):
                 execute_query_db("DELETE FROM loan_terms_history WHERE id = :id", {"id": row['id']})
-                st.session_state["loan_data_version"] += 1; st.rerun()
+                _invalidate_schedules(loan_id)
+                st.rerun()
     else: st.caption("No historical changes logged.")
 
+def _loan_payment_rows(loan_data, df_sched: pd.DataFrame, user_id: str, opening_date=None) -> list[dict]:
+    """
+    Transactions for the given schedule rows. Each row carries an import_key
+    of (loan, month, component), so generating the same month again is a no-op.
+    """
+    loan_id = int(loan_data['id'])
+    pay_from = loan_data['pay_from_account']
+    rows = []
+
+    def _row(key, date_iso, amount, tx_type, account, category, payee, description):
+        rows.append(_sanitize_record({
+            "user_id": user_id, "date": date_iso, "amount": amount, "type": tx_type,
+            "account": account, "category": category, "payee": payee, "description": description,
+            "import_key": f"loan:{loan_id}:{key}",
+        }))
+
+    if opening_date is not None:
+        _row("opening", opening_date.strftime("%Y-%m-%d"), -float(loan_data['balance']), "opening balance",
+             loan_data['name'], "Opening Balance", "System", "Initial Loan Balance")
+
+    for _, row in df_sched.iterrows():
+        pay_date = row['Date'].isoformat()
+        month = pay_date[:7]
+        interest = float(row['Interest'])
+        fee = float(row['Admin Fee'])
+        if interest > 0:
+            _row(f"{month}:interest", pay_date, -interest, "expense", pay_from, "Loan Interest",
+                 loan_data['name'], f"Loan Interest ({row['Rate %']}%)")
+        if fee > 0:
+            _row(f"{month}:fee", pay_date, -fee, "expense", pay_from, "Loan Fees", loan_data['name'], "Loan Fee")
+
+        reduction_amt = float(row['Principal']) + float(row['Extra / Adj'])
+        if reduction_amt > 0:
+            _row(f"{month}:principal_out", pay_date, -reduction_amt, "expense", pay_from, "Loan Repayment",
+                 f"To {loan_data['name']}", "Principal Payment")
+            _row(f"{month}:principal_in", pay_date, reduction_amt, "income", loan_data['name'], "Principal Reduction",
+                 f"From {pay_from}", "Principal Payment")
+    return rows
+
 @st.dialog("📝 Generate Loan Transactions")
 def _dialog_generate_transactions(loan_data):
     st.write(f"Generate payments for **{loan_data['name']}**")
@@ -400,7 +326,8 @@ def _dialog_generate_transactions(loan_data):
         extras_df = _load_adjustments(loan_data['id'])
         terms_df = _load_terms_history(loan_data['id'])
 
-        df_sched = _generate_schedule(
+        df_sched = _cached_schedule(
+            loan_data['id'],
             balance=loan_data['balance'], rate=loan_data['interest_rate'],
             start_date=start_date_gen, payment_day=int(loan_data.get('payment_day', 1)),
             mode=loan_data['calculation_mode'], loan_type=loan_data.get('loan_type', 'Annuity'),
@@ -414,53 +341,15 @@ def _dialog_generate_transactions(loan_data):
         
         if df_sched.empty: st.error("Calc error."); return
 
-        df_to_process = df_sched.head(months_to_gen)
-        count = 0
-        
-        if init_balance:
-            add_record_db("transactions", _sanitize_record({
-                "user_id": user_id, "date": start_date_gen.strftime("%Y-%m-%d"),
-                "amount": -float(loan_data['balance']), "type": "opening balance",
-                "account": loan_data['name'], "category": "Opening Balance",
-                "payee": "System", "description": "Initial Loan Balance"
-            }))
-
-        for _, row in df_to_process.iterrows():
-            pay_date = row['Date'].isoformat()
-            total_pay = float(row['Total Payment'])
-            principal = float(row['Principal'])
-            interest = float(row['Interest'])
-            fee = float(row['Admin Fee'])
-            
-            if interest > 0:
-                add_record_db("transactions", _sanitize_record({
-                    "user_id": user_id, "date": pay_date, "amount": -interest, "type": "expense",
-                    "account": loan_data['pay_from_account'], "category": "Loan Interest",
-                    "payee": loan_data['name'], "description": f"Loan Interest ({row['Rate %']}%)"
-                }))
-            
-            if fee > 0:
-                 add_record_db("transactions", _sanitize_record({
-                    "user_id": user_id, "date": pay_date, "amount": -fee, "type": "expense",
-                    "account": loan_data['pay_from_account'], "category": "Loan Fees",
-                    "payee": loan_data['name'], "description": "Loan Fee"
-                }))
-
-            reduction_amt = principal + float(row['Extra / Adj'])
-            if reduction_amt > 0:
-                add_record_db("transactions", _sanitize_record({
-                    "user_id": user_id, "date": pay_date, "amount": -reduction_amt, "type": "expense",
-                    "account": loan_data['pay_from_account'], "category": "Loan Repayment",
-                    "payee": f"To {loan_data['name']}", "description": "Principal Payment"
-                }))
-                add_record_db("transactions", _sanitize_record({
-                    "user_id": user_id, "date": pay_date, "amount": reduction_amt, "type": "income", 
-                    "account": loan_data['name'], "category": "Principal Reduction",
-                    "payee": f"From {loan_data['pay_from_account']}", "description": "Principal Payment"
-                }))
-            count += 1
-            
-        st.success(f"✅ Created {count} month(s) of transactions!"); st.rerun()
+        rows = _loan_payment_rows(loan_data, df_sched.head(months_to_gen), user_id,
+                                  opening_date=start_date_gen if init_balance else None)
+        try:
+            inserted = add_transactions_batch(rows)
+        except Exception as e:
+            st.error(f"Could not save transactions: {e}"); return
+        skipped = len(rows) - inserted
+        note = f" ({skipped} already existed, skipped)" if skipped else ""
+        st.success(f"✅ Created {inserted} transaction(s){note}!"); st.rerun()
 
 # ============================================================
 # 🎨 UI COMPONENT
@@ -471,20 +360,21 @@ def render_loan_calculator():
     
     st.markdown("## 🏦 Advanced Loan Planner")
     
-    st.session_state.setdefault("loan_data_version", 0)
-    my_loans = _load_loans_cached(user_id, st.session_state["loan_data_version"])
+    my_loans = _load_loans_cached(user_id)
     
     tab_saved, tab_calc = st.tabs(["📂 Your Saved Loans", "➕ Create New Plan"])
     
     with tab_saved:
         if my_loans.empty: st.info("No saved loans yet.")
         else:
+            extras_by_loan, terms_by_loan = _load_loan_side_tables(user_id)
             for _, loan in my_loans.iterrows():
-                extras_df = _load_adjustments(loan['id'])
-                terms_df = _load_terms_history(loan['id'])
+                extras_df = extras_by_loan.get(int(loan['id']))
+                terms_df = terms_by_loan.get(int(loan['id']))
                 l_type = loan.get('loan_type', 'Annuity')
                 
-                df_preview = _generate_schedule(
+                df_preview = _cached_schedule(
+                    loan['id'],
                     balance=loan['balance'], rate=loan['interest_rate'],
                     start_date=pd.to_datetime(loan['start_date']).date(),
                     payment_day=int(loan['payment_day']),
@@ -526,7 +416,8 @@ def render_loan_calculator():
                             execute_query_db(f"DELETE FROM loans WHERE id={loan['id']}")
                             execute_query_db(f"DELETE FROM loan_extra_payments WHERE loan_id={loan['id']}")
                             execute_query_db(f"DELETE FROM loan_terms_history WHERE loan_id={loan['id']}")
-                            st.session_state["loan_data_version"] += 1; st.rerun()
+                            _invalidate_schedules(loan['id'])
+                            st.rerun()
                     
                     if not df_preview.empty:
                         has_rate_changes = len(df_preview['Rate %'].unique()) > 1
@@ -626,7 +517,7 @@ def render_loan_calculator():
             m3.metric("Type", meta['type'])
             m4.metric("Total Cost", f"{(total_interest + total_fees + meta['balance']):,.0f} kr")
 
-            tab_chart, tab_data, tab_save = st.tabs(["📈 Chart", "📋 Table", "💾 Save"])
+            tab_chart, tab_data, tab_what_if, tab_save = st.tabs(["📈 Chart", "📋 Table", "🧪 What-if", "💾 Save"])
             with tab_chart:
                 fig = px.area(df, x="Date", y="End Balance", title="Projected Balance")
                 st.plotly_chart(fig, use_container_width=True)
@@ -636,6 +527,8 @@ def render_loan_calculator():
                     df.style.format({c: "{:,.2f}" for c in ["Start Balance", "Interest", "Principal", "Total Payment", "End Balance"]}),
                     width="stretch"
                 )
+            with tab_what_if:
+                _render_what_if(meta, df)
             with tab_save:
                 if st.button("💾 Save to Database", key="btn_save_final"):
                     clean_record = _sanitize_record({
@@ -649,7 +542,6 @@ def render_loan_calculator():
                         "user_id": str(user_id)
                     })
                     add_record_db("loans", clean_record)
-                    st.session_state["loan_data_version"] += 1 
                     st.success(f"Loan '{meta['name']}' saved!")
                     del st.session_state["last_loan_calc"]
                     st.rerun()
\ No newline at end of file
@@ -16,6 +16,7 @@ from core.db_operations import (
     get_unique_values_db,  
 )
 from core.calculations import calculate_monthly_payment
+from core.repository import get_repository
 from config.i18n import t
 
 def render_management_dashboard():
@@ -54,7 +55,7 @@ def render_accounts_management():
     """Manage accounts using data from the database."""
     st.subheader(t("manage_accounts"))
 
-    account_df = load_data_db("accounts")
+    account_df = get_repository().accounts()
 
     st.write("**Current Accounts:**")
     edited_account_df = st.data_editor(
@@ -87,7 +88,7 @@ def render_categories_management():
     """Manage categories using data from the database."""
     st.subheader(t("manage_categories"))
 
-    categories_df = load_data_db("categories")
+    categories_df = get_repository().categories()
 
     st.write("**Current Categories:**")
     edited_categories_df = st.data_editor(
@@ -115,7 +116,7 @@ def render_payees_management():
     """Manage payees using data from the database."""
     st.subheader(t("manage_payees"))
 
-    payees_df = load_data_db("payees")
+    payees_df = get_repository().load("payees")
 
     st.write("**Current Payees:**")
     edited_payees_df = st.data_editor(
@@ -138,7 +139,7 @@ def render_recurring_management():
     """Manage recurring transactions from the database."""
     st.subheader(t("manage_recurring"))
 
-    recurring_df = load_data_db("recurring")
+    recurring_df = get_repository().load("recurring")
 
     st.write("**Current Recurring Rules:**")
     edited_recurring_df = st.data_editor(
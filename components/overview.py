@@ -9,7 +9,7 @@ import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-from core.db_operations import load_data_db
+from core.repository import get_ledger, get_repository
 
 # Logic imports from our Budget Engine (safe import)
 try:
@@ -69,7 +69,8 @@ def _kpi_card_html(label, value, delta=None, color="#333"):
 # ============================================================
 def _get_financial_snapshot():
     """Calculates Net Worth, Flow, Trends, and integrates Budget/Forecast logic."""
-    acc_df = load_data_db("accounts")
+    repo = get_repository()
+    acc_df = repo.accounts()
     net_worth = cash_assets = credit_debt = 0.0
     
     if not acc_df.empty:
@@ -79,36 +80,35 @@ def _get_financial_snapshot():
             cash_assets = acc_df[~acc_df["account_type"].isin(["Credit Card", "Loan"])]["balance"].sum()
             credit_debt = acc_df[acc_df["account_type"].isin(["Credit Card", "Loan"])]["balance"].sum()
 
-    tx_df = load_data_db("transactions")
+    today = datetime.today()
+    prev_month_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    # Month totals of the two compared months come from the rollup table
+    curr_month_str = today.strftime("%Y-%m")
+    prev_month_str = prev_month_start.strftime("%Y-%m")
+    tx_df = repo.monthly_rollup(prev_month_str, curr_month_str, types=["Income", "Expense"])
     income_mo = expense_mo = savings_rate = savings_delta = savings_amount = 0.0
     recent_tx = pd.DataFrame()
     trend_data = pd.DataFrame() 
 
     if not tx_df.empty:
-        tx_df["date"] = pd.to_datetime(tx_df["date"], errors="coerce")
-        tx_df["amount"] = pd.to_numeric(tx_df["amount"], errors="coerce").fillna(0.0)
-        
-        today = datetime.today()
-        curr_month_str = today.strftime("%Y-%m")
-        prev_month_str = (today.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
-        tx_df["period"] = tx_df["date"].dt.to_period("M").astype(str)
-        
         salary_accounts = ["Brukskonto", "Salary", "Lønnskonto"]
-        income_mo = tx_df[(tx_df["period"] == curr_month_str) & (tx_df["type"] == "Income") & (tx_df["account"].isin(salary_accounts))]["amount"].sum()
+        income_mo = tx_df[(tx_df["month"] == curr_month_str) & (tx_df["type"] == "Income") & (tx_df["account"].isin(salary_accounts))]["amount"].sum()
 
         exclude = ["Transfer", "Overføring", "Adjustment", "Balansejustering"]
-        expense_mo = tx_df[(tx_df["period"] == curr_month_str) & (tx_df["type"] == "Expense") & (~tx_df["category"].isin(exclude))]["amount"].sum()
+        expense_mo = tx_df[(tx_df["month"] == curr_month_str) & (tx_df["type"] == "Expense") & (~tx_df["category"].isin(exclude))]["amount"].sum()
         
         savings_amount = income_mo - expense_mo
         if income_mo > 0:
             savings_rate = (savings_amount / income_mo) * 100
             
-        prev_income = tx_df[(tx_df["period"] == prev_month_str) & (tx_df["type"] == "Income") & (tx_df["account"].isin(salary_accounts))]["amount"].sum()
-        prev_expense = tx_df[(tx_df["period"] == prev_month_str) & (tx_df["type"] == "Expense") & (~tx_df["category"].isin(exclude))]["amount"].sum()
+        prev_income = tx_df[(tx_df["month"] == prev_month_str) & (tx_df["type"] == "Income") & (tx_df["account"].isin(salary_accounts))]["amount"].sum()
+        prev_expense = tx_df[(tx_df["month"] == prev_month_str) & (tx_df["type"] == "Expense") & (~tx_df["category"].isin(exclude))]["amount"].sum()
         prev_savings_rate = ((prev_income - prev_expense) / prev_income * 100) if prev_income > 0 else 0
         savings_delta = savings_rate - prev_savings_rate
 
-        recent_tx = tx_df.sort_values("date", ascending=False).head(6)
+    ledger = get_ledger(repo.user_id)
+    recent_tx = ledger.dropna(subset=["date"]).nlargest(6, "date")[["date", "type", "category", "payee", "amount"]]
 
     curr_iso = datetime.now().strftime("%Y-%m")
     budget_view = get_budget_vs_actual(curr_iso)
@@ -119,7 +119,7 @@ def _get_financial_snapshot():
     main_acc = "Brukskonto"
     last_day = calendar.monthrange(date.today().year, date.today().month)[1]
     curr_bal = _get_balance_at_date(main_acc, date.today().replace(day=last_day))
-    forecast_df = get_projection_data(curr_bal, 6, main_acc)
+    forecast_df = get_projection_data(curr_bal, 6, main_acc) if curr_bal is not None else pd.DataFrame()
 
     return {
         "net_worth": net_worth, "cash_assets": cash_assets, "credit_debt": credit_debt,
@@ -10,7 +10,9 @@ from core.default_translations import translate_defaults_for_user
 
 from core.db_operations import (
     execute_query_db,
+    get_transfer_rules,
     load_data_db,
+    set_transfer_rules,
     get_all_users_admin,
     get_connection,
     hash_password,
@@ -302,6 +304,37 @@ def settings():
             else:
                 st.info(tr("settings_no_categories_found", "No categories found."))
 
+            with st.expander(tr("settings_transfer_rules_expand", "🔁 Transfer & adjustment detection"), expanded=False):
+                st.caption(tr(
+                    "settings_transfer_rules_caption",
+                    "Transactions matching these rules are left out of analytics. "
+                    "Labels match the type or category exactly; text matches payee or description.",
+                ))
+                rules = get_transfer_rules(user_id)
+                labels_txt = st.text_area(
+                    tr("settings_transfer_labels", "Labels (one per line)"),
+                    value="\n".join(rules["labels"]), key="settings_transfer_labels",
+                )
+                patterns_txt = st.text_area(
+                    tr("settings_transfer_patterns", "Text contains (one per line)"),
+                    value="\n".join(rules["patterns"]), key="settings_transfer_patterns",
+                )
+                b1, b2 = st.columns(2)
+                new_rules = None
+                if b1.button(tr("settings_transfer_save", "Save & re-classify"), key="settings_transfer_save", use_container_width=True):
+                    new_rules = {"labels": labels_txt.splitlines(), "patterns": patterns_txt.splitlines()}
+                if b2.button(tr("settings_transfer_reset", "Reset to defaults"), key="settings_transfer_reset", use_container_width=True):
+                    new_rules = "defaults"
+                if new_rules is not None:
+                    changed = set_transfer_rules(user_id, None if new_rules == "defaults" else new_rules)
+                    if changed is None:
+                        st.error(tr("settings_transfer_failed", "Could not save the rules."))
+                    else:
+                        st.toast(f"{tr('settings_transfer_saved', 'Rules saved; transactions re-classified')}: {changed}")
+                        for k in ("settings_transfer_labels", "settings_transfer_patterns"):
+                            st.session_state.pop(k, None)
+                        st.rerun()
+
         st.markdown("---")
 
         st.subheader(f"🔔 {tr('settings_alerts_defaults', 'Alerts & Defaults')}")
@@ -486,6 +519,7 @@ def settings():
                         except Exception:
                             pass
 
+                    execute_query_db("DELETE FROM transfer_rules WHERE user_id = :uid", {"uid": user_id})
                     execute_query_db("DELETE FROM users WHERE username = :u", {"u": user_id})
 
                     for k in list(st.session_state.keys()):
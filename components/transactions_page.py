@@ -29,7 +29,11 @@ from core.ai_parser import parse_transaction_with_gemini
 # ============================================================
 # DB OPS (Cloud-safe imports)
 # ============================================================
-from core.db_operations import load_data_db, add_record_db, execute_query_db
+from core.db_operations import (
+    load_data_db, add_record_db, apply_transaction_changes, execute_query_db, get_account_balances,
+)
+from core.ledger import signed_amounts
+from core.repository import get_ledger, get_repository
 
 # Optional helpers: keep app running even if db_operations changes
 try:
@@ -129,47 +133,12 @@ def transcribe_mic_audio(audio: dict) -> str:
 # ============================================================
 # 🧮 SHARED MATH LOGIC
 # ============================================================
-def _get_signed_amount(row) -> float:
-    try:
-        amt = float(row.get("amount", 0) or 0)
-    except Exception:
-        amt = 0.0
-    t = str(row.get("type", "")).strip().lower()
-    
-    if t in ["income", "deposit", "refund"]:
-        return amt
-    if t in ["expense", "transfer", "withdrawal", "payment"]:
-        return -abs(amt)
-    # Important: Opening Balance is returned AS IS. 
-    # For a loan, the user should enter a negative number, or we handle the sign at entry.
-    if t == "opening balance":
-        return amt
-        
-    return 0.0
-
-def _compute_account_balances(df_all: pd.DataFrame) -> dict[str, float]:
+def _compute_account_balances(user_id: str) -> dict[str, float]:
     """
-    Calculates the current balance for every account based on the ledger.
-    IMPORTANT: Filters out future transactions to show 'Balance As Of Today'.
+    Current balance for every account, read from the materialized balance table.
+    IMPORTANT: Future transactions are excluded to show 'Balance As Of Today'.
     """
-    if df_all is None or df_all.empty:
-        return {}
-    
-    df = df_all.copy()
-    
-    # 1. Robust Date Parsing
-    df["date_dt"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-    today = date.today()
-    
-    # 2. Filter: Only sum transactions up to today.
-    # Fill NaT with today to be safe so we don't lose data
-    df["date_dt"] = df["date_dt"].fillna(today)
-    
-    df_current = df[df["date_dt"] <= today].copy()
-    
-    # 3. Compute
-    df_current["signed"] = df_current.apply(_get_signed_amount, axis=1)
-    return df_current.groupby("account")["signed"].sum().to_dict()
+    return get_account_balances(user_id)
 
 def _upsert_settlement_transfer(selected_account: str, amount_val: float, date_val: str | date):
     user_id = _get_user_id()
@@ -184,28 +153,35 @@ def _upsert_settlement_transfer(selected_account: str, amount_val: float, date_v
     due_day = int(this_acc.get("credit_due_day", 20) or 20)
     settlement_date = (trans_date + relativedelta(months=1)).replace(day=due_day).strftime("%Y-%m-%d")
     source_account = this_acc.get("credit_source_account") or "Brukskonto"
-    tx_df = load_data_db("transactions", user_id=user_id)
-    if tx_df is None or tx_df.empty: return
-    tx_df = tx_df.copy()
-    tx_df["date_dt"] = pd.to_datetime(tx_df.get("date"), errors="coerce")
+    # Only this card, from the statement month start up to the settlement date
+    ledger = get_ledger(user_id)
+    tx_df = ledger[
+        (ledger["account"].astype(str) == str(selected_account))
+        & (ledger["date"] >= trans_date.replace(day=1).normalize())
+        & (ledger["date"] <= pd.Timestamp(settlement_date))
+    ]
+    if tx_df.empty: return
     month_mask = (
         (tx_df.get("account").astype(str) == str(selected_account))
-        & (tx_df["date_dt"].dt.month == trans_date.month)
-        & (tx_df["date_dt"].dt.year == trans_date.year)
+        & (tx_df["date"].dt.month == trans_date.month)
+        & (tx_df["date"].dt.year == trans_date.year)
         & (~tx_df.get("description", "").astype(str).str.contains("Auto-settle", na=False))
     )
-    monthly_net_total = tx_df.loc[month_mask].apply(_get_signed_amount, axis=1).sum()
+    monthly_net_total = signed_amounts(tx_df.loc[month_mask]).sum()
     target_transfer_amount = abs(monthly_net_total) if monthly_net_total < 0 else 0.0
     existing_mask = (
         (tx_df.get("user_id", "").astype(str) == str(user_id))
-        & (tx_df.get("date").astype(str) == str(settlement_date))
+        & (tx_df["date"].dt.strftime("%Y-%m-%d") == str(settlement_date))
         & (tx_df.get("account").astype(str) == str(selected_account))
         & (tx_df.get("category", "").astype(str) == "Transfer")
         & (tx_df.get("description", "").astype(str).str.contains("Auto-settle", na=False))
     )
-    if not tx_df.loc[existing_mask].empty:
-        update_sql = "UPDATE transactions SET amount = :amt WHERE user_id = :uid AND date = :dt AND account = :acc AND description LIKE '%Auto-settle%'"
-        execute_query_db(update_sql, {"amt": float(target_transfer_amount), "uid": user_id, "dt": settlement_date, "acc": selected_account})
+    if existing_mask.any():
+        # By id, so only the settlement rows' balances and rollup buckets are resynced
+        apply_transaction_changes(user_id, updates=[
+            {"id": int(row_id), "amount": float(target_transfer_amount)}
+            for row_id in tx_df.loc[existing_mask, "id"]
+        ])
         return
     out_transfer = {
         "user_id": user_id, "date": settlement_date, "amount": float(target_transfer_amount),
@@ -263,81 +239,51 @@ def render_ai_smart_entry(selected_account: str):
             add_record_db("transactions", record)
             _upsert_settlement_transfer(selected_account, record["amount"], record["date"])
             st.success(f"✅ Saved: {record['payee']} - {record['amount']}")
-            _invalidate_cache()
             time.sleep(0.2)
             st.rerun()
 
 # ============================================================
 # CACHING & DATA LOADERS
 # ============================================================
-@st.cache_data(ttl=30)
-def _load_transactions(version: int) -> pd.DataFrame:
-    user_id = _get_user_id()
-    df = load_data_db("transactions", user_id=user_id)
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["id", "date", "type", "account", "category", "payee", "amount", "description", "user_id"])
-    return df.copy()
+# Served from the repository cache / shared ledger, keyed by (user, table, data version):
+# the write helpers bump the version on commit, so no TTL or manual clearing.
+def _load_transactions() -> pd.DataFrame:
+    return get_ledger(_get_user_id())
 
-@st.cache_data(ttl=30)
 def _load_accounts() -> list[str]:
-    user_id = _get_user_id()
-    acc = load_data_db("accounts", user_id=user_id)
+    acc = get_repository().cached("accounts", columns=["name"])
     return sorted(acc["name"].dropna().astype(str).unique().tolist()) if acc is not None and not acc.empty else []
 
-@st.cache_data(ttl=30)
 def _load_loans_as_accounts() -> list[str]:
-    user_id = _get_user_id()
-    loans = load_data_db("loans")
+    loans = get_repository().cached("loans", columns=["name"])
     if loans is not None and not loans.empty:
-        if 'user_id' in loans.columns:
-            loans = loans[loans['user_id'].astype(str) == str(user_id)]
         return sorted(loans["name"].dropna().astype(str).unique().tolist())
     return []
 
-@st.cache_data(ttl=30)
 def _load_categories() -> list[str]:
-    user_id = _get_user_id()
+    repo = get_repository()
     official_cats = set()
-    cat_df = load_data_db("categories", user_id=user_id)
+    cat_df = repo.cached("categories", columns=["name"])
     if cat_df is not None and not cat_df.empty:
         official_cats = set(cat_df["name"].dropna().astype(str).unique())
-    used_cats = set()
-    tx_df = load_data_db("transactions", user_id=user_id)
-    if tx_df is not None and not tx_df.empty:
-        used_cats = set(tx_df["category"].dropna().astype(str).unique())
+    used_cats = set(get_ledger(repo.user_id)["category"].dropna().astype(str).unique())
     return sorted(list(official_cats.union(used_cats)))
 
-@st.cache_data(ttl=30)
 def _load_payees() -> list[str]:
-    user_id = _get_user_id()
-    official_payees = set()
-    pay_df = load_data_db("payees", user_id=user_id)
-    if pay_df is not None and not pay_df.empty:
-        official_payees = set(pay_df["name"].dropna().astype(str).unique())
-    used_payees = set()
-    tx_df = load_data_db("transactions", user_id=user_id)
-    if tx_df is not None and not tx_df.empty:
-        used_payees = set(tx_df["payee"].dropna().astype(str).unique())
-    return sorted(list(official_payees.union(used_payees)))
-
-def _invalidate_cache():
-    st.session_state["tx_data_version"] = int(st.session_state.get("tx_data_version", 0)) + 1
-    _load_transactions.clear()
-    _load_accounts.clear()
-    _load_loans_as_accounts.clear()
-    _load_categories.clear()
-    _load_payees.clear()
+    # Used payees are registered in `payees` on write, so the table alone is complete
+    return sorted(get_repository().payee_index().names)
 
 def _with_money_columns(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
     out["date"] = pd.to_datetime(out["date"], errors="coerce")
-    out["signed_amount"] = out.apply(_get_signed_amount, axis=1)
+    if "signed_amount" not in out.columns:
+        out["signed_amount"] = signed_amounts(out)
     
     out = out.sort_values(by="date", ascending=True)
     out["Balance"] = out["signed_amount"].cumsum()
     
-    out["Out"] = out["signed_amount"].apply(lambda x: x if x < 0 else 0.0)
-    out["In"] = out["signed_amount"].apply(lambda x: x if x > 0 else 0.0)
+    out["Out"] = out["signed_amount"].clip(upper=0.0)
+    out["In"] = out["signed_amount"].clip(lower=0.0)
     
     return out.sort_values(by="date", ascending=False)
 
@@ -350,7 +296,7 @@ def _dialog_add_transaction(selected_account: str):
     st.caption(f"Account: **{selected_account}**")
     tab_one, tab_rec = st.tabs(["One-Time", "Recurring / Bulk"])
     cat_list = ["➕ Add New..."] + _load_categories()
-    all_payees = _load_payees()
+    payee_index = get_repository().payee_index()
     with tab_one:
         c1, c2 = st.columns([1, 1])
         amount_val = c1.number_input("Amount", min_value=0.0, step=10.0, format="%.2f", value=None, placeholder="0.00")
@@ -360,7 +306,7 @@ def _dialog_add_transaction(selected_account: str):
         payee_val = st.text_input("Payee", value=st.session_state["tx_payee_smart"], key="payee_input_widget", placeholder="e.g. Kiwi").strip()
         if payee_val != st.session_state["tx_payee_smart"]: st.session_state["tx_payee_smart"] = payee_val
         if payee_val:
-            matches = [p for p in all_payees if payee_val.lower() in p.lower() and p.lower() != payee_val.lower()]
+            matches = payee_index.suggest(payee_val, limit=4)
             if matches:
                 cols = st.columns(min(len(matches), 4))
                 for i, match in enumerate(matches[:4]):
@@ -388,7 +334,7 @@ def _dialog_add_transaction(selected_account: str):
             }
             add_record_db("transactions", new_record)
             _upsert_settlement_transfer(selected_account, float(amount_val), date_val)
-            st.success("Saved!"); st.session_state["tx_payee_smart"] = ""; _invalidate_cache(); time.sleep(0.2); st.rerun()
+            st.success("Saved!"); st.session_state["tx_payee_smart"] = ""; time.sleep(0.2); st.rerun()
 
     with tab_rec:
         with st.form("tx_add_recurring", clear_on_submit=True):
@@ -414,7 +360,7 @@ def _dialog_add_transaction(selected_account: str):
                         "type": rec_type, "payee": r_payee, "category": r_cat, "description": f"Rec ({i+1}/{r_count})", "account": selected_account
                     })
                     _upsert_settlement_transfer(selected_account, float(r_amt), current_d)
-                _invalidate_cache(); st.success("Done!"); st.rerun()
+                st.success("Done!"); st.rerun()
 
 @st.dialog("New Transfer", width="large")
 def _dialog_add_transfer(selected_account: str):
@@ -435,7 +381,7 @@ def _dialog_add_transfer(selected_account: str):
             base = { "user_id": user_id, "date": normalize_date_to_iso(t_date), "amount": float(t_amt), "category": "Transfer", "description": t_desc }
             add_record_db("transactions", {**base, "type": "expense", "payee": f"To {t_to}", "account": t_from})
             add_record_db("transactions", {**base, "type": "income", "payee": f"From {t_from}", "account": t_to})
-            _invalidate_cache(); st.rerun()
+            st.rerun()
 
 @st.dialog("Delete Future Transactions", width="medium")
 def _dialog_cleanup_future(selected_account: str):
@@ -470,7 +416,6 @@ def _dialog_cleanup_future(selected_account: str):
             params["payee"] = sel_payee
             
         execute_query_db(sql, params)
-        _invalidate_cache()
         st.success("Selected future transactions cleared.")
         time.sleep(1)
         st.rerun()
@@ -482,12 +427,10 @@ def _dialog_cleanup_future(selected_account: str):
 # MAIN PAGE (Updated Sidebar Section)
 # ============================================================
 def render_transactions_page():
-    st.session_state.setdefault("tx_data_version", 0)
-    df_all = _load_transactions(st.session_state["tx_data_version"])
-
-    acc_balances = _compute_account_balances(df_all)
+    df_all = _load_transactions()
 
     user_id = _get_user_id()
+    acc_balances = _compute_account_balances(user_id)
     accounts_df = load_data_db("accounts", user_id=user_id)
     
     accounts = sorted(accounts_df["name"].dropna().astype(str).tolist()) if accounts_df is not None and not accounts_df.empty else []
@@ -586,7 +529,6 @@ def render_transactions_page():
                         "description": "Initial Loan Balance"
                     }
                     add_record_db("transactions", opening_tx)
-                    _invalidate_cache()
                     st.success("Balance updated!")
                     time.sleep(1)
                     st.rerun()
@@ -2,15 +2,20 @@
 from __future__ import annotations
 
 import os  # <--- Added for Schema switching
+import re
+import json
 import datetime
 from pathlib import Path
 import pandas as pd
 import streamlit as st
 import secrets
 import hashlib
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
 from config.i18n import t
+from core.ledger import (
+    internal_transfer_mask, is_internal_transfer, normalize_transfer_rules, signed_amount, signed_amount_sql,
+)
 from passlib.context import CryptContext
 
 # ============================================================
@@ -66,10 +71,17 @@ def _get_db_url() -> tuple[str, bool]:
 
 DB_URL, IS_POSTGRES = _get_db_url()
 
+def _register_sqlite_functions(dbapi_conn, _record) -> None:
+    # SQLite's LOWER() and LIKE only fold ASCII; search compares ulower() of both sides
+    dbapi_conn.create_function("ulower", 1, lambda v: v.lower() if isinstance(v, str) else v, deterministic=True)
+
 @st.cache_resource
 def get_engine() -> Engine | None:
     try:
-        return create_engine(DB_URL, pool_pre_ping=True)
+        engine = create_engine(DB_URL, pool_pre_ping=True)
+        if not IS_POSTGRES:
+            event.listen(engine, "connect", _register_sqlite_functions)
+        return engine
     except Exception as e:
         print(f"DB Connection Error: {e}")
         return None
@@ -125,7 +137,9 @@ def init_db() -> None:
             payee VARCHAR(100),
             amount DECIMAL(15, 2),
             description TEXT,
-            user_id VARCHAR(50)
+            user_id VARCHAR(50),
+            import_key VARCHAR(100),
+            is_internal_transfer BOOLEAN
         """,
         "accounts": f"""
             id {pk},
@@ -155,7 +169,9 @@ def init_db() -> None:
         "payees": f"""
             id {pk},
             name VARCHAR(100),
-            user_id VARCHAR(50)
+            user_id VARCHAR(50),
+            use_count INTEGER,
+            last_used DATE
         """,
         "recurring": f"""
             id {pk},
@@ -205,7 +221,12 @@ def init_db() -> None:
             note VARCHAR(255),
             user_id VARCHAR(50),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        """
+        """,
+        # MATERIALIZED LEDGER VIEWS (maintained by the write helpers below)
+        "account_balances": ACCOUNT_BALANCES_COLUMNS,
+        "balance_checkpoints": BALANCE_CHECKPOINTS_COLUMNS,
+        "monthly_rollup": MONTHLY_ROLLUP_COLUMNS,
+        "transfer_rules": TRANSFER_RULES_COLUMNS,
     }
 
     # PASTE THIS NEW BLOCK:
@@ -213,9 +234,105 @@ def init_db() -> None:
         with get_connection() as conn:
             for table_name, columns in tables.items():
                 conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns});")
+            for line in _create_indexes(conn):
+                print(f"⚠️ {line}")
+            _setup_search(conn)
     except Exception as e:
         print(f"❌ Init DB Error: {e}")
 
+# Secondary indexes for the per-user hot paths: (name, table, columns, unique).
+# Every query is scoped by user_id, so it always leads.
+INDEXES: list[tuple[str, str, tuple[str, ...], bool]] = [
+    ("ix_transactions_user_date", "transactions", ("user_id", "date"), False),
+    ("ix_transactions_user_account_date", "transactions", ("user_id", "account", "date"), False),
+    ("ix_transactions_user_category", "transactions", ("user_id", "category"), False),
+    ("ux_categories_user_name", "categories", ("user_id", "name"), True),
+    ("ux_payees_user_name", "payees", ("user_id", "name"), True),
+    ("ux_transactions_user_import_key", "transactions", ("user_id", "import_key"), True),
+]
+
+# Columns added after the first release: (table, column, type)
+ADDED_COLUMNS: list[tuple[str, str, str]] = [
+    ("transactions", "import_key", "VARCHAR(100)"),
+    ("transactions", "is_internal_transfer", "BOOLEAN"),
+    ("payees", "use_count", "INTEGER"),
+    ("payees", "last_used", "DATE"),
+]
+
+def _add_missing_columns(conn: "DBConnectionWrapper") -> None:
+    for table, col, dtype in ADDED_COLUMNS:
+        if IS_POSTGRES:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {dtype};")
+        elif col not in {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {dtype};")
+
+_columns_added = False
+
+def _ensure_columns(conn: "DBConnectionWrapper") -> None:
+    """ADDED_COLUMNS only, once per process: what write paths need before the index migration has run."""
+    global _columns_added
+    if not _columns_added:
+        _add_missing_columns(conn)
+        _columns_added = True
+
+def _index_exists(conn: "DBConnectionWrapper", name: str) -> bool:
+    if IS_POSTGRES:
+        sql = "SELECT 1 FROM pg_indexes WHERE indexname = :name"
+    else:
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"
+    return conn.execute(sql, {"name": name}).fetchone() is not None
+
+def _duplicate_keys(conn: "DBConnectionWrapper", table: str, cols: tuple[str, ...], limit: int = 10) -> list[tuple]:
+    """Key values held by more than one row, with their row count and ids (rows with a NULL key never conflict)."""
+    not_null = " AND ".join(f"{c} IS NOT NULL" for c in cols)
+    key = ", ".join(cols)
+    ids = "string_agg(CAST(id AS TEXT), ',')" if IS_POSTGRES else "group_concat(id)"
+    return conn.execute(
+        f"""
+        SELECT {key}, COUNT(*), {ids} FROM {table}
+        WHERE {not_null}
+        GROUP BY {key} HAVING COUNT(*) > 1
+        ORDER BY COUNT(*) DESC LIMIT {int(limit)}
+        """
+    ).fetchall()
+
+def _create_indexes(conn: "DBConnectionWrapper") -> list[str]:
+    """
+    Idempotent and non-destructive: a unique index is only created on a table
+    without duplicate keys. Returns one report line per index left out; the
+    duplicates have to be merged or removed by hand before re-running.
+    """
+    _add_missing_columns(conn)
+    report = []
+    for name, table, cols, unique in INDEXES:
+        if unique and not _index_exists(conn, name):
+            dups = _duplicate_keys(conn, table, cols)
+            if dups:
+                report.append(f"{name} not created: {table} has duplicate ({', '.join(cols)}) rows")
+                report.extend(f"    {r[:len(cols)]}: {r[-2]} rows, ids {r[-1]}" for r in dups)
+                continue
+        conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)});")
+    global _payee_names_unique
+    _payee_names_unique = None  # re-checked on the next payee write
+    return report
+
+def ensure_indexes() -> bool:
+    """
+    Migration entry point for databases where init_db() is not run (e.g. Streamlit Cloud),
+    including the search index. Returns False (after printing the report) when an
+    index could not be created.
+    """
+    try:
+        with get_connection() as conn:
+            report = _create_indexes(conn)
+            _setup_search(conn)
+    except Exception as e:
+        print(f"❌ Index Migration Error: {e}")
+        return False
+    for line in report:
+        print(f"❌ {line}")
+    return not report
+
 # ============================================================
 # 3) TRANSACTION-SAFE CONNECTION WRAPPER
 # ============================================================
@@ -238,6 +355,7 @@ class DBConnectionWrapper:
         # 2. If nesting_level is 0, we are the 'Master' caller.
         if _db_context.nesting_level == 0:
             _db_context.conn = self.engine.connect()
+            _db_context.dirty = set()
             
             # --- FIXED ORDER OF OPERATIONS ---
             # 1. Start the transaction explicitely FIRST
@@ -270,6 +388,8 @@ class DBConnectionWrapper:
                     # Success; commit the transaction
                     if _db_context.tx:
                         _db_context.tx.commit()
+                    # Only committed writes move cache versions forward
+                    _publish_data_versions(_db_context.dirty)
             finally:
                 if _db_context.conn:
                     _db_context.conn.close()
@@ -277,10 +397,50 @@ class DBConnectionWrapper:
                 # Clean up thread storage
                 _db_context.conn = None
                 _db_context.tx = None
+                _db_context.dirty = set()
 
-    def execute(self, query: str, params: dict | list | None = None):
+    def execute(self, query: str, params: dict | list | None = None, owners: set | None = None):
+        """`owners`: user_ids touched by a write whose params do not name them (e.g. UPDATE ... WHERE id)."""
         stmt = text(query) if isinstance(query, str) else query
-        return self.conn.execute(stmt, params or {})
+        result = self.conn.execute(stmt, params or {})
+        if isinstance(query, str):
+            m = _WRITE_RE.match(query)
+            if m:
+                _db_context.dirty.update(_dirty_keys(m.group(1).lower(), params, owners))
+        return result
+
+# ------------------------------------------------------------
+# Data versions: per (user_id, table) counters for cache keys.
+# Bumped on commit by every write that goes through the wrapper; a write
+# whose user cannot be determined bumps the table-wide epoch instead.
+# ------------------------------------------------------------
+_WRITE_RE = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+_versions_lock = threading.Lock()
+_table_epochs: dict[str, int] = {}
+_user_versions: dict[tuple[str, str], int] = {}
+
+def _dirty_keys(table: str, params, owners: set | None) -> set[tuple[str, str | None]]:
+    if owners is None:
+        rows = params if isinstance(params, list) else [params or {}]
+        owners = {r.get("user_id", r.get("uid")) for r in rows if isinstance(r, dict)} or {None}
+    if None in owners:
+        return {(table, None)}
+    return {(table, str(uid)) for uid in owners}
+
+def _publish_data_versions(dirty: set[tuple[str, str | None]]) -> None:
+    if not dirty:
+        return
+    with _versions_lock:
+        for table, uid in dirty:
+            if uid is None:
+                _table_epochs[table] = _table_epochs.get(table, 0) + 1
+            else:
+                _user_versions[(uid, table)] = _user_versions.get((uid, table), 0) + 1
+
+def data_version(user_id: str | None, table: str) -> tuple[int, int]:
+    """(table epoch, user counter); changes whenever a committed write may affect this user's rows."""
+    with _versions_lock:
+        return _table_epochs.get(table, 0), _user_versions.get((str(user_id), table), 0)
 
 def get_connection() -> DBConnectionWrapper:
     engine = get_engine()
@@ -291,11 +451,18 @@ def get_connection() -> DBConnectionWrapper:
 def execute_query_db(query: str, params: dict | None = None, fetch_result: bool = False) -> bool | list:
     """
     Executes a query. If fetch_result=True, returns list of dicts.
-    Safe to use inside nested transactions.
+    Safe to use inside nested transactions. Writes to transactions must bind
+    :uid or :user_id (the owner whose aggregates are resynced afterwards).
     """
+    if _TX_WRITE_RE.match(str(query)) and _raw_write_owners(params) is None:
+        raise UnscopedQueryError(
+            "Raw transactions write without :uid / :user_id; balances, rollup and payee usage could not be resynced."
+        )
     try:
         with get_connection() as conn:
             result = conn.execute(query, params)
+            if _TX_WRITE_RE.match(str(query)):
+                _resync_after_raw_write(conn, params, query)
             if fetch_result:
                 return result.mappings().all()
         return True
@@ -340,28 +507,159 @@ def add_record_db(table: str, data: dict | list[dict]):
     if not cleaned_records:
         return True
 
+    if table == "transactions":
+        with get_connection() as conn:
+            _ensure_schema(conn)
+            _classify_transfers(conn, cleaned_records)
+
     # 2. Prepare Query based on first record keys
     first_record = cleaned_records[0]
     columns = ", ".join(first_record.keys())
     placeholders = ", ".join([f":{k}" for k in first_record.keys()])
     query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
 
-    try:
+    def _insert():
         with get_connection() as conn:
             # SQLAlchemy handles list of dicts automatically for bulk inserts
-            return conn.execute(query, cleaned_records)
+            result = conn.execute(query, cleaned_records)
+            if table == "transactions":
+                _sync_ledger_views(conn, removed=[], added=cleaned_records)
+            return result
+
+    try:
+        return _insert()
 
     except Exception as e:
         msg = str(e).lower()
         if IS_POSTGRES and ("duplicate key value violates unique constraint" in msg) and (f"{table}_pkey" in msg):
             try:
                 _fix_sequence_if_needed(table)
-                with get_connection() as conn:
-                    return conn.execute(query, cleaned_records)
+                return _insert()
             except Exception:
                 pass
         raise
 
+def _ensure_schema(conn: "DBConnectionWrapper") -> None:
+    """
+    Added columns and the transfer_rules table, applied lazily once per process.
+    Indexes are left to init_db() / ensure_indexes(): their duplicate checks
+    and DDL do not belong on the request path.
+    """
+    _ensure_columns(conn)
+    _ensure_transfer_rules(conn)
+
+def add_transactions_batch(records: list[dict]) -> int:
+    """
+    Inserts transactions with one executemany inside a single DB transaction.
+    Rows carrying an `import_key` that already exists for their user (or
+    earlier in the batch) are skipped, so re-running a generator does not
+    duplicate. Returns the number of rows inserted.
+    """
+    if not records:
+        return 0
+    columns = list(dict.fromkeys(k for r in records for k in r if k != "id"))
+    with get_connection() as conn:
+        _ensure_schema(conn)
+        keys_by_user: dict[str, set] = {}
+        for r in records:
+            if r.get("import_key"):
+                keys_by_user.setdefault(str(r.get("user_id")), set()).add(str(r["import_key"]))
+
+        seen: set[tuple[str, str]] = set()
+        for uid, keys in keys_by_user.items():
+            keys = sorted(keys)
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                params = {"uid": uid, **{f"k{j}": k for j, k in enumerate(chunk)}}
+                marks = ", ".join(f":k{j}" for j in range(len(chunk)))
+                rows = conn.execute(
+                    f"SELECT import_key FROM transactions WHERE user_id = :uid AND import_key IN ({marks})", params
+                ).fetchall()
+                seen.update((uid, r[0]) for r in rows)
+
+        new_rows = []
+        for r in records:
+            key = (str(r.get("user_id")), str(r["import_key"])) if r.get("import_key") else None
+            if key in seen:
+                continue
+            if key:
+                seen.add(key)
+            new_rows.append({c: r.get(c) for c in columns})
+        if new_rows:
+            add_record_db("transactions", new_rows)
+        return len(new_rows)
+
+def apply_transaction_changes(user_id: str, inserts: list[dict] | None = None,
+                              updates: list[dict] | None = None, deletes: list | None = None) -> dict:
+    """
+    Writes an editor diff (see core.frame_diff) in one DB transaction:
+    one executemany UPDATE per set of changed columns, one DELETE ... IN for
+    removed ids and one INSERT batch. `updates` carry `id` plus only the
+    changed cells. Every statement is scoped to `user_id`; ids of other users
+    are ignored. Returns {"inserted", "updated", "deleted"} row counts.
+    """
+    uid = str(user_id)
+    updates, deletes = list(updates or []), [int(i) for i in deletes or []]
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+    with get_connection() as conn:
+        _ensure_schema(conn)
+        # Before-images for the views, fetched once for updated and deleted ids
+        ids = sorted({int(u["id"]) for u in updates} | set(deletes))
+        before: dict[int, dict] = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ", ".join(f":i{j}" for j in range(len(chunk)))
+            rows = conn.execute(
+                f"SELECT * FROM transactions WHERE user_id = :uid AND id IN ({marks})",
+                {"uid": uid, **{f"i{j}": v for j, v in enumerate(chunk)}},
+            ).mappings().all()
+            before.update((int(r["id"]), dict(r)) for r in rows)
+
+        removed = [before[i] for i in deletes if i in before]
+        for i in range(0, len(removed), 500):
+            chunk = [r["id"] for r in removed[i:i + 500]]
+            marks = ", ".join(f":i{j}" for j in range(len(chunk)))
+            conn.execute(
+                f"DELETE FROM transactions WHERE user_id = :uid AND id IN ({marks})",
+                {"uid": uid, **{f"i{j}": v for j, v in enumerate(chunk)}}, owners={uid},
+            )
+        counts["deleted"] = len(removed)
+
+        groups: dict[tuple, list[dict]] = {}
+        changed_before, after = [], []
+        rules = None
+        for u in updates:
+            row = before.get(int(u["id"]))
+            changes = {c: v for c, v in u.items() if c not in ("id", "user_id")}
+            if row is None or int(u["id"]) in deletes or not changes:
+                continue
+            if "date" in changes:
+                changes["date"] = normalize_date_to_iso(changes["date"])
+            new_row = {**row, **changes}
+            if TRANSFER_RULE_FIELDS & changes.keys():
+                rules = rules or _load_transfer_rules(conn, uid)
+                changes["is_internal_transfer"] = new_row["is_internal_transfer"] = is_internal_transfer(new_row, rules)
+            changed_before.append(row)
+            after.append(new_row)
+            groups.setdefault(tuple(sorted(changes)), []).append({**changes, "id": row["id"], "uid": uid})
+        for cols, rows in groups.items():
+            set_clause = ", ".join(f"{_ident(c)} = :{c}" for c in cols)
+            conn.execute(f"UPDATE transactions SET {set_clause} WHERE id = :id AND user_id = :uid", rows, owners={uid})
+        counts["updated"] = len(after)
+
+        if removed or after:
+            _sync_ledger_views(conn, removed=removed + changed_before, added=after)
+
+        if inserts:
+            records = [
+                {**r, "user_id": uid, "date": normalize_date_to_iso(r.get("date"))}
+                for r in inserts if any(v is not None for k, v in r.items() if k != "user_id")
+            ]
+            if records:
+                add_record_db("transactions", records)
+            counts["inserted"] = len(records)
+    return counts
+
 def get_records_db(table: str, filters: dict | None = None):
     query = f"SELECT * FROM {table}"
     params: dict = {}
@@ -386,20 +684,129 @@ def update_record_db(table: str, data: dict, identifier_col: str, identifier_val
     query = f"UPDATE {table} SET {set_clause} WHERE {identifier_col} = :id_val"
     params = {**data, "id_val": identifier_val}
     with get_connection() as conn:
-        return conn.execute(query, params)
+        if table != "transactions":
+            owners = _row_owners(conn, table, identifier_col, identifier_val)
+            if owners is not None and "user_id" in data:
+                owners.add(data["user_id"])
+            return conn.execute(query, params, owners=owners)
+        before = _fetch_rows(conn, table, identifier_col, identifier_val)
+        owners = {r.get("user_id") for r in before} | ({data["user_id"]} if "user_id" in data else set())
+        result = conn.execute(query, params, owners=owners)
+        new_id = data.get(identifier_col, identifier_val)
+        after = _fetch_rows(conn, table, identifier_col, new_id)
+        if TRANSFER_RULE_FIELDS & data.keys():
+            _ensure_schema(conn)
+            _reflag_rows(conn, after)
+        _sync_ledger_views(conn, removed=before, added=after)
+        return result
 
 def delete_record_db(table: str, identifier_col: str, identifier_val):
     query = f"DELETE FROM {table} WHERE {identifier_col} = :id_val"
     with get_connection() as conn:
-        return conn.execute(query, {"id_val": identifier_val})
+        if table != "transactions":
+            owners = _row_owners(conn, table, identifier_col, identifier_val)
+            return conn.execute(query, {"id_val": identifier_val}, owners=owners)
+        before = _fetch_rows(conn, table, identifier_col, identifier_val)
+        result = conn.execute(query, {"id_val": identifier_val}, owners={r.get("user_id") for r in before})
+        _sync_ledger_views(conn, removed=before, added=[])
+        return result
+
+def _fetch_rows(conn: "DBConnectionWrapper", table: str, identifier_col: str, identifier_val) -> list[dict]:
+    query = f"SELECT * FROM {table} WHERE {identifier_col} = :id_val"
+    return [dict(r) for r in conn.execute(query, {"id_val": identifier_val}).mappings().all()]
+
+def _row_owners(conn: "DBConnectionWrapper", table: str, identifier_col: str, identifier_val) -> set | None:
+    """user_ids of the rows a by-key write will touch; None for tables without a user column."""
+    if table not in USER_SCOPED_TABLES:
+        return None
+    query = f"SELECT DISTINCT user_id FROM {table} WHERE {identifier_col} = :id_val"
+    return {r[0] for r in conn.execute(query, {"id_val": identifier_val}).fetchall()}
 
 # ============================================================
 # 5) APP-SPECIFIC HELPERS
 # ============================================================
 
-def load_data_db(table_name: str, **kwargs) -> pd.DataFrame:
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _ident(name: str) -> str:
+    """Column names are interpolated into SQL, so only plain identifiers are accepted."""
+    name = str(name).strip()
+    if not _IDENT_RE.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return name
+
+def _order_clause(order_by: str | list[str]) -> str:
+    parts = [order_by] if isinstance(order_by, str) else list(order_by)
+    clauses = []
+    for part in ",".join(parts).split(","):
+        tokens = part.split()
+        if not tokens:
+            continue
+        direction = tokens[1].upper() if len(tokens) > 1 else "ASC"
+        if len(tokens) > 2 or direction not in ("ASC", "DESC"):
+            raise ValueError(f"Invalid ORDER BY term: {part!r}")
+        clauses.append(f"{_ident(tokens[0])} {direction}")
+    return ", ".join(clauses)
+
+# Tables holding per-user rows. Reads of these must be bound to a user (see core.repository);
+# admin code opts out explicitly with user_id="bypass".
+USER_SCOPED_TABLES = frozenset({
+    "transactions",
+    "accounts",
+    "categories",
+    "payees",
+    "recurring",
+    "budgets",
+    "loans",
+    "loan_extra_payments",
+    "loan_terms_history",
+    "monthly_rollup",
+    "transfer_rules",
+})
+
+class UnscopedQueryError(RuntimeError):
+    """Raised when a per-user table is read, or transactions are raw-written, without a user_id."""
+
+def _filter_conditions(filters: dict | None) -> tuple[list[str], dict] | None:
+    """
+    WHERE conditions and params for {column: value} (equality, None: IS NULL) and
+    {column: [values]} (IN). None when an empty IN list means nothing can match.
+    """
+    conditions, params = [], {}
+    for i, (col, val) in enumerate((filters or {}).items()):
+        col = _ident(col)
+        if isinstance(val, (list, tuple, set)):
+            values = list(val)
+            if not values:
+                return None
+            names = [f"f{i}_{j}" for j in range(len(values))]
+            conditions.append(f"{col} IN ({', '.join(':' + n for n in names)})")
+            params.update(zip(names, values))
+        elif val is None:
+            conditions.append(f"{col} IS NULL")
+        else:
+            conditions.append(f"{col} = :f{i}")
+            params[f"f{i}"] = val
+    return conditions, params
+
+def load_data_db(
+    table_name: str,
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+    date_from=None,
+    date_to=None,
+    date_column: str = "date",
+    order_by: str | list[str] | None = None,
+    limit: int | None = None,
+    distinct: bool = False,
+    **kwargs,
+) -> pd.DataFrame:
     """
     Loads data from a table into a DataFrame with a security whitelist.
+    Projection, predicates and ORDER/LIMIT are pushed into SQL as bound parameters:
+    - filters: {column: value} for equality, {column: [values]} for IN.
+    - date_from / date_to: inclusive day range on `date_column`.
+    Tables in USER_SCOPED_TABLES require user_id=<user> (or "bypass" in admin code).
     """
     allowed = [
         "users",
@@ -423,19 +830,128 @@ def load_data_db(table_name: str, **kwargs) -> pd.DataFrame:
         print(f"⚠️ Access Denied: Table '{table_name}' is not in the whitelist.")
         return pd.DataFrame()
 
-    query = f"SELECT * FROM {table_name}"
-    params: dict = {}
-
-    if "user_id" in kwargs and kwargs["user_id"] != "bypass":
-        query += " WHERE user_id = :user_id"
-        params["user_id"] = kwargs["user_id"]
+    if table_name in USER_SCOPED_TABLES and not kwargs.get("user_id"):
+        raise UnscopedQueryError(
+            f"Unscoped read of '{table_name}': pass user_id (or use core.repository.get_repository())."
+        )
 
     try:
+        select_cols = ", ".join(_ident(c) for c in columns) if columns else "*"
+        conditions: list[str] = []
+        params: dict = {}
+
+        if "user_id" in kwargs and kwargs["user_id"] != "bypass":
+            conditions.append("user_id = :user_id")
+            params["user_id"] = kwargs["user_id"]
+
+        filtered = _filter_conditions(filters)
+        if filtered is None:
+            return pd.DataFrame(columns=columns or [])
+        conditions += filtered[0]
+        params.update(filtered[1])
+
+        if date_from is not None:
+            conditions.append(f"{_ident(date_column)} >= :date_from")
+            params["date_from"] = normalize_date_to_iso(date_from)
+        if date_to is not None:
+            # Exclusive next-day bound also covers text dates stored with a time part
+            day_after = pd.Timestamp(normalize_date_to_iso(date_to)) + pd.Timedelta(days=1)
+            conditions.append(f"{_ident(date_column)} < :date_before")
+            params["date_before"] = day_after.strftime("%Y-%m-%d")
+
+        query = f"SELECT {'DISTINCT ' if distinct else ''}{select_cols} FROM {table_name}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if order_by:
+            query += f" ORDER BY {_order_clause(order_by)}"
+        if limit is not None:
+            query += " LIMIT :limit"
+            params["limit"] = int(limit)
+
         return get_dataframe_db(query, params)
     except Exception as e:
         print(f"❌ Load Data Error ({table_name}): {e}")
         return pd.DataFrame()
 
+# ------------------------------------------------------------
+# Transaction pages (keyset): newest first by (date, id), then undated rows by id.
+# A cursor is the (date, id) of the last row shown, date as stored (None if undated).
+# ------------------------------------------------------------
+def _transaction_filters(user_id: str, search: str | None, date_from,
+                         ranked: bool = False) -> tuple[str, list[str], dict, str]:
+    """(join, conditions, params, rank) for `FROM transactions {join} WHERE ...`; see _search_clauses()."""
+    conditions, params = ["user_id = :uid"], {"uid": str(user_id)}
+    if date_from is not None:
+        conditions.append("date >= :date_from")
+        params["date_from"] = normalize_date_to_iso(date_from)
+    join, rank = "", "0"
+    term = _search_term(search)
+    if term:
+        join, condition, search_params, rank = _search_clauses(term, str(user_id), ranked)
+        if condition:
+            conditions.append(condition)
+        params.update(search_params)
+    return join, conditions, params, rank
+
+def load_transactions_page(user_id: str, limit: int = 50, cursor: tuple | None = None,
+                           search: str | None = None, date_from=None) -> tuple[pd.DataFrame, tuple | None]:
+    """
+    One page of the user's transactions after `cursor` (None: first page),
+    filtered in SQL by `search` (payee / category / description / amount) and `date_from`.
+    Returns (rows, cursor of the next page or None on the last page).
+    """
+    join, conditions, params, _ = _transaction_filters(user_id, search, date_from)
+    source = f"SELECT transactions.* FROM transactions {join}"
+    params["limit"] = int(limit) + 1  # one extra row tells whether a next page exists
+    after_date, after_id = cursor if cursor else (None, None)
+
+    frames = []
+    if cursor is None or after_date is not None:
+        dated = conditions + ["date IS NOT NULL"]
+        if cursor is not None:
+            dated.append("(date < :after_date OR (date = :after_date AND id < :after_id))")
+            params.update(after_date=after_date, after_id=after_id)
+        frames.append(get_dataframe_db(
+            f"{source} WHERE {' AND '.join(dated)} ORDER BY date DESC, id DESC LIMIT :limit", params
+        ))
+    fetched = sum(len(f) for f in frames)
+    if fetched <= limit and date_from is None:
+        undated = conditions + ["date IS NULL"]
+        if after_date is None and after_id is not None:
+            undated.append("id < :after_id")
+            params["after_id"] = after_id
+        params["limit"] = int(limit) + 1 - fetched
+        frames.append(get_dataframe_db(
+            f"{source} WHERE {' AND '.join(undated)} ORDER BY id DESC LIMIT :limit", params
+        ))
+
+    frames = [f for f in frames if not f.empty]
+    page = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if len(page) <= limit:
+        return page, None
+    page = page.iloc[:limit]
+    last = page.iloc[-1]
+    return page, (None if pd.isna(last["date"]) else last["date"], int(last["id"]))
+
+def transactions_summary(user_id: str, search: str | None = None, date_from=None) -> dict:
+    """Row count, income, expense and net (signed) over the same filter as load_transactions_page()."""
+    join, conditions, params, _ = _transaction_filters(user_id, search, date_from)
+    query = f"""
+        SELECT COUNT(*),
+               SUM(CASE WHEN LOWER(TRIM(type)) = 'income' THEN COALESCE(amount, 0) ELSE 0 END),
+               SUM(CASE WHEN LOWER(TRIM(type)) = 'expense' THEN COALESCE(amount, 0) ELSE 0 END),
+               SUM({signed_amount_sql()})
+        FROM transactions {join} WHERE {' AND '.join(conditions)}
+    """
+    try:
+        with get_connection() as conn:
+            count, income, expense, net = conn.execute(query, params).fetchone()
+        return {"count": int(count or 0), "income": float(income or 0), "expense": float(expense or 0),
+                "net": float(net or 0)}
+    except Exception as e:
+        print(f"❌ Transaction summary failed ({user_id}): {e}")
+        return {"count": 0, "income": 0.0, "expense": 0.0, "net": 0.0}
+
 def admin_reset_password(username: str, new_password_hash: str) -> bool:
     return execute_query_db(
         "UPDATE users SET password_hash = :p WHERE username = :u",
@@ -538,6 +1054,1061 @@ def seed_user_categories(user_id: str) -> None:
     for name, ctype, parent in defaults:
         ensure_category_exists(name, ctype, user_id=user_id, parent=parent)
 
+# ============================================================
+# 6) MATERIALIZED ACCOUNT BALANCES
+# ============================================================
+# One row per (user, account): `cleared` = everything dated on/before `as_of`,
+# `pending` = future-dated. All rows of one user share the same `as_of`; reads
+# roll it forward to today by summing only the transactions that matured since.
+ACCOUNT_BALANCES_COLUMNS = """
+    user_id VARCHAR(50) NOT NULL,
+    account VARCHAR(50) NOT NULL,
+    cleared DECIMAL(15, 2) DEFAULT 0,
+    pending DECIMAL(15, 2) DEFAULT 0,
+    as_of DATE,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (user_id, account)
+"""
+
+# Raw SQL that writes to `transactions` without going through the CRUD helpers
+_TX_WRITE_RE = re.compile(r"^\s*(INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+transactions\b", re.IGNORECASE)
+
+_ledger_views_ready = False
+
+def _ensure_ledger_views(conn: "DBConnectionWrapper") -> None:
+    """init_db() is not run automatically in production, so create lazily once per process."""
+    global _ledger_views_ready
+    if _ledger_views_ready:
+        return
+    conn.execute(f"CREATE TABLE IF NOT EXISTS account_balances ({ACCOUNT_BALANCES_COLUMNS});")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS balance_checkpoints ({BALANCE_CHECKPOINTS_COLUMNS});")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS monthly_rollup ({MONTHLY_ROLLUP_COLUMNS});")
+    _ledger_views_ready = True
+
+def _today_iso() -> str:
+    return datetime.date.today().isoformat()
+
+def _sync_ledger_views(conn: "DBConnectionWrapper", removed: list[dict], added: list[dict]) -> None:
+    """
+    Applies the balance delta of a transactions write, inside the caller's DB transaction.
+    Users without materialized rows yet are rebuilt from scratch instead.
+    """
+    _ensure_ledger_views(conn)
+    today = _today_iso()
+    deltas: dict[tuple[str, str], list[float]] = {}
+    month_deltas: dict[tuple[str, str, str], float] = {}
+    rollup_deltas: dict[tuple[str, str, str, str, str], list[float]] = {}
+    payee_deltas: dict[tuple[str, str], list] = {}
+
+    for rows, direction in ((removed, -1.0), (added, 1.0)):
+        for r in rows:
+            _add_rollup_delta(rollup_deltas, r, direction)
+            _add_payee_delta(payee_deltas, r, int(direction))
+            uid, acc = r.get("user_id"), r.get("account")
+            if uid is None or acc is None:
+                continue
+            amt = direction * signed_amount(r.get("type"), r.get("amount"))
+            if amt == 0:
+                continue
+            raw_date = normalize_date_to_iso(r.get("date"))
+            tx_date = raw_date or today
+            bucket = deltas.setdefault((str(uid), str(acc)), [0.0, 0.0])
+            bucket[0 if tx_date <= today else 1] += amt
+            if raw_date:
+                key = (str(uid), str(acc), raw_date[:7])
+                month_deltas[key] = month_deltas.get(key, 0.0) + amt
+
+    _shift_checkpoints(conn, month_deltas)
+    _apply_rollup_deltas(conn, rollup_deltas)
+    _apply_payee_deltas(conn, payee_deltas)
+
+    for uid in {uid for uid, _ in deltas}:
+        if not _balances_materialized(conn, uid):
+            _rebuild_balances(conn, uid)
+            continue
+        _roll_balances_forward(conn, uid)
+        conn.execute(
+            """
+            INSERT INTO account_balances (user_id, account, cleared, pending, as_of, updated_at)
+            VALUES (:uid, :acc, :cleared, :pending, :as_of, :now)
+            ON CONFLICT (user_id, account) DO UPDATE SET
+                cleared = account_balances.cleared + excluded.cleared,
+                pending = account_balances.pending + excluded.pending,
+                updated_at = excluded.updated_at
+            """,
+            [
+                {"uid": u, "acc": acc, "cleared": c, "pending": p, "as_of": today, "now": datetime.datetime.now()}
+                for (u, acc), (c, p) in deltas.items() if u == uid
+            ],
+        )
+
+def _raw_write_owners(params) -> set[str] | None:
+    """user_ids bound as :uid / :user_id by a raw write (None if any parameter set lacks one)."""
+    rows = params if isinstance(params, list) else [params]
+    owners = set()
+    for r in rows:
+        uid = r.get("uid", r.get("user_id")) if isinstance(r, dict) else None
+        if uid is None:
+            return None
+        owners.add(str(uid))
+    return owners
+
+def _resync_after_raw_write(conn: "DBConnectionWrapper", params, query: str = "") -> None:
+    """Raw UPDATE/DELETE statements carry no before-image, so rebuild the affected users."""
+    _ensure_ledger_views(conn)
+    _ensure_columns(conn)
+    for uid in _raw_write_owners(params) or ():
+        _rebuild_balances(conn, uid)
+        _drop_checkpoints(conn, uid)
+        _rebuild_rollup(conn, uid)
+        _rebuild_payee_usage(conn, uid)
+        if _touches_transfer_fields(query):
+            _reclassify_transfers(conn, uid)
+
+def _balances_materialized(conn: "DBConnectionWrapper", user_id: str) -> bool:
+    row = conn.execute("SELECT 1 FROM account_balances WHERE user_id = :uid LIMIT 1", {"uid": user_id}).fetchone()
+    return row is not None
+
+def _day_after(iso_day: str) -> str:
+    """Exclusive upper bound for a day: also covers text dates stored with a time part."""
+    return (datetime.date.fromisoformat(iso_day[:10]) + datetime.timedelta(days=1)).isoformat()
+
+def _ledger_balances_sql() -> str:
+    """(user_id, account, cleared, pending) per account of :uid, cleared meaning dated before :tomorrow."""
+    return f"""
+        SELECT user_id, account,
+               SUM(CASE WHEN date IS NULL OR date < :tomorrow THEN signed ELSE 0 END) AS cleared,
+               SUM(CASE WHEN date >= :tomorrow THEN signed ELSE 0 END) AS pending
+        FROM (
+            SELECT user_id, account, date, {signed_amount_sql()} AS signed
+            FROM transactions
+            WHERE user_id = :uid AND account IS NOT NULL
+        ) tx
+        GROUP BY user_id, account
+    """
+
+def _rebuild_balances(conn: "DBConnectionWrapper", user_id: str) -> None:
+    today = _today_iso()
+    conn.execute("DELETE FROM account_balances WHERE user_id = :uid", {"uid": user_id})
+    conn.execute(
+        f"""
+        INSERT INTO account_balances (user_id, account, cleared, pending, as_of, updated_at)
+        SELECT user_id, account, cleared, pending, :today, :now FROM ({_ledger_balances_sql()}) b
+        """,
+        {"uid": user_id, "today": today, "tomorrow": _day_after(today), "now": datetime.datetime.now()},
+    )
+
+def _matured_since(conn: "DBConnectionWrapper", user_id: str, since: str, today: str) -> list[tuple[str, float]]:
+    """Signed sum per account of transactions dated after `since`, up to and including `today`."""
+    rows = conn.execute(
+        f"""
+        SELECT account, SUM({signed_amount_sql()}) FROM transactions
+        WHERE user_id = :uid AND account IS NOT NULL AND date >= :after AND date < :tomorrow
+        GROUP BY account
+        """,
+        {"uid": user_id, "after": _day_after(since), "tomorrow": _day_after(today)},
+    ).fetchall()
+    return [(acc, float(amt or 0)) for acc, amt in rows]
+
+def _roll_balances_forward(conn: "DBConnectionWrapper", user_id: str) -> None:
+    """Moves transactions that matured since the stored `as_of` from pending to cleared."""
+    today = _today_iso()
+    row = conn.execute("SELECT MIN(as_of) FROM account_balances WHERE user_id = :uid", {"uid": user_id}).fetchone()
+    since = normalize_date_to_iso(row[0]) if row and row[0] is not None else None
+    if since is None or since >= today:
+        return
+    matured = _matured_since(conn, user_id, since, today)
+    if matured:
+        conn.execute(
+            """
+            UPDATE account_balances SET cleared = cleared + :amt, pending = pending - :amt
+            WHERE user_id = :uid AND account = :acc
+            """,
+            [{"uid": user_id, "acc": acc, "amt": amt} for acc, amt in matured],
+        )
+    conn.execute("UPDATE account_balances SET as_of = :today WHERE user_id = :uid", {"uid": user_id, "today": today})
+
+def rebuild_balances(user_id: str) -> bool:
+    """
+    Recomputes the materialized balances of one user from the ledger (drift recovery).
+    Checkpoints are dropped too; they are rebuilt lazily or by backfill_checkpoints().
+    """
+    try:
+        with get_connection() as conn:
+            _ensure_ledger_views(conn)
+            _rebuild_balances(conn, str(user_id))
+            _drop_checkpoints(conn, str(user_id))
+        return True
+    except Exception as e:
+        print(f"❌ Rebuild balances failed ({user_id}): {e}")
+        return False
+
+def get_account_balances(user_id: str, include_pending: bool = False) -> dict[str, float]:
+    """
+    Current balance per account from the materialized table: O(accounts), no ledger scan.
+    With include_pending, future-dated transactions are added on top. Read-only:
+    transactions that matured since the rows were written are added here, and
+    users not materialized yet are summed from the ledger (writes materialize them).
+    """
+    uid, today = str(user_id), _today_iso()
+    try:
+        with get_connection() as conn:
+            _ensure_ledger_views(conn)
+            rows = conn.execute(
+                "SELECT account, cleared, pending, as_of FROM account_balances WHERE user_id = :uid", {"uid": uid}
+            ).fetchall()
+            if not rows:
+                rows = conn.execute(
+                    f"SELECT account, cleared, pending FROM ({_ledger_balances_sql()}) b",
+                    {"uid": uid, "tomorrow": _day_after(today)},
+                ).fetchall()
+                balances = {acc: [float(c or 0), float(p or 0)] for acc, c, p in rows}
+            else:
+                balances = {acc: [float(c or 0), float(p or 0)] for acc, c, p, _ in rows}
+                since = min(normalize_date_to_iso(r[3]) or today for r in rows)
+                if since < today:
+                    for acc, amt in _matured_since(conn, uid, since, today):
+                        if acc in balances:
+                            balances[acc][0] += amt
+                            balances[acc][1] -= amt
+        return {
+            acc: cleared + (pending if include_pending else 0.0) for acc, (cleared, pending) in balances.items()
+        }
+    except Exception as e:
+        print(f"❌ Load balances failed ({user_id}): {e}")
+        return {}
+
+# ============================================================
+# 7) MONTHLY BALANCE CHECKPOINTS
+# ============================================================
+# Closing balance per (user, account, 'YYYY-MM'), i.e. the sum of every dated
+# transaction on or before the last day of that month. A write dated in month M
+# shifts every existing checkpoint >= M, so rows are correct whenever present.
+BALANCE_CHECKPOINTS_COLUMNS = """
+    user_id VARCHAR(50) NOT NULL,
+    account VARCHAR(50) NOT NULL,
+    month VARCHAR(7) NOT NULL,
+    balance DECIMAL(15, 2) DEFAULT 0,
+    PRIMARY KEY (user_id, account, month)
+"""
+
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+def _month_sql(col: str) -> str:
+    return f"to_char({col}, 'YYYY-MM')" if IS_POSTGRES else f"substr({col}, 1, 7)"
+
+def _valid_month_sql(col: str) -> str:
+    """Condition keeping rows whose _month_sql() is 'YYYY-MM' (SQLite stores dates as free text)."""
+    return "TRUE" if IS_POSTGRES else f"substr({col}, 1, 7) GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]'"
+
+def _month_iso(d: datetime.date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+def _months_between(first: str, last: str) -> list[str]:
+    """Inclusive list of 'YYYY-MM' labels."""
+    y, m = map(int, first.split("-"))
+    ly, lm = map(int, last.split("-"))
+    out = []
+    while (y, m) <= (ly, lm):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+def _shift_checkpoints(conn: "DBConnectionWrapper", month_deltas: dict[tuple[str, str, str], float]) -> None:
+    rows = [{"uid": u, "acc": a, "month": m, "amt": amt} for (u, a, m), amt in month_deltas.items() if amt]
+    if not rows:
+        return
+    conn.execute(
+        """
+        UPDATE balance_checkpoints SET balance = balance + :amt
+        WHERE user_id = :uid AND account = :acc AND month >= :month
+        """,
+        rows,
+    )
+
+def _drop_checkpoints(conn: "DBConnectionWrapper", user_id: str) -> None:
+    conn.execute("DELETE FROM balance_checkpoints WHERE user_id = :uid", {"uid": user_id})
+
+def _ensure_checkpoints(conn: "DBConnectionWrapper", user_id: str, account: str, through_month: str) -> float:
+    """
+    Makes sure a checkpoint exists for `through_month`, filling every month since the
+    latest earlier checkpoint (or since the account's first transaction). Returns its balance.
+    """
+    latest = conn.execute(
+        """
+        SELECT month, balance FROM balance_checkpoints
+        WHERE user_id = :uid AND account = :acc AND month <= :through
+        ORDER BY month DESC LIMIT 1
+        """,
+        {"uid": user_id, "acc": account, "through": through_month},
+    ).fetchone()
+    if latest and latest[0] == through_month:
+        return float(latest[1] or 0)
+
+    month_col = _month_sql("date")
+    params = {"uid": user_id, "acc": account, "through": through_month}
+    where = f"user_id = :uid AND account = :acc AND date IS NOT NULL AND {month_col} <= :through"
+    if latest:
+        where += f" AND {month_col} > :since"
+        params["since"] = latest[0]
+
+    sums = dict(conn.execute(
+        f"""
+        SELECT {month_col} AS month, SUM({signed_amount_sql()}) FROM transactions
+        WHERE {where}
+        GROUP BY {month_col}
+        """,
+        params,
+    ).fetchall())
+
+    if latest:
+        months = _months_between(latest[0], through_month)[1:]
+        running = float(latest[1] or 0)
+    else:
+        months = _months_between(min(sums) if sums else through_month, through_month)
+        running = 0.0
+
+    rows = []
+    for month in months:
+        running += float(sums.get(month) or 0)
+        rows.append({"uid": user_id, "acc": account, "month": month, "bal": running})
+    if rows:
+        conn.execute(
+            "INSERT INTO balance_checkpoints (user_id, account, month, balance) VALUES (:uid, :acc, :month, :bal)",
+            rows,
+        )
+    return running
+
+def get_balance_as_of(user_id: str, account: str, as_of: datetime.date) -> float | None:
+    """
+    Balance of one account including every transaction dated on or before `as_of`:
+    previous month's checkpoint plus the current month's delta, never a full scan.
+    Returns None when the balance could not be computed.
+    """
+    user_id, account = str(user_id), str(account)
+    month_start = as_of.replace(day=1)
+    prev_month = _month_iso(month_start - datetime.timedelta(days=1))
+    try:
+        with get_connection() as conn:
+            _ensure_ledger_views(conn)
+            next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
+            if as_of == next_month - datetime.timedelta(days=1):
+                return _ensure_checkpoints(conn, user_id, account, _month_iso(as_of))
+
+            base = _ensure_checkpoints(conn, user_id, account, prev_month)
+            row = conn.execute(
+                f"""
+                SELECT SUM({signed_amount_sql()}) FROM transactions
+                WHERE user_id = :uid AND account = :acc AND date >= :start AND date < :day_after
+                """,
+                {"uid": user_id, "acc": account, "start": month_start.isoformat(),
+                 "day_after": _day_after(as_of.isoformat())},
+            ).fetchone()
+        return base + float((row[0] if row else 0) or 0)
+    except Exception as e:
+        print(f"❌ Balance as-of failed ({account} @ {as_of}): {e}")
+        return None
+
+def backfill_checkpoints(user_id: str, through: datetime.date | None = None) -> int:
+    """Builds checkpoints for every account of a user up to `through` (default: this month)."""
+    through_month = _month_iso(through or datetime.date.today())
+    with get_connection() as conn:
+        _ensure_ledger_views(conn)
+        accounts = [r[0] for r in conn.execute(
+            "SELECT DISTINCT account FROM transactions WHERE user_id = :uid AND account IS NOT NULL",
+            {"uid": str(user_id)},
+        ).fetchall()]
+        for acc in accounts:
+            _ensure_checkpoints(conn, str(user_id), str(acc), through_month)
+    return len(accounts)
+
+# ============================================================
+# 8) MONTHLY ROLLUP
+# ============================================================
+# Sum of raw and of signed `amount`, and row count, per (user, month, account,
+# type, category), kept in step with every transactions write like the balances
+# above. Missing labels are stored as '' (key columns cannot be NULL); undated
+# rows are not rolled up.
+MONTHLY_ROLLUP_COLUMNS = """
+    user_id VARCHAR(50) NOT NULL,
+    month VARCHAR(7) NOT NULL,
+    account VARCHAR(50) NOT NULL DEFAULT '',
+    type VARCHAR(20) NOT NULL DEFAULT '',
+    category VARCHAR(50) NOT NULL DEFAULT '',
+    amount DECIMAL(15, 2) DEFAULT 0,
+    signed_amount DECIMAL(15, 2) DEFAULT 0,
+    tx_count INTEGER DEFAULT 0,
+    PRIMARY KEY (user_id, month, account, type, category)
+"""
+ROLLUP_FIELDS = ["month", "account", "type", "category", "amount", "signed_amount", "tx_count"]
+
+def _add_rollup_delta(rollup_deltas: dict, r: dict, direction: float) -> None:
+    uid, raw_date = r.get("user_id"), normalize_date_to_iso(r.get("date"))
+    if uid is None or not raw_date or not _MONTH_RE.match(raw_date[:7]):
+        return
+    try:
+        amt = float(r.get("amount") or 0)
+    except (TypeError, ValueError):
+        amt = 0.0
+    if amt != amt:  # NaN
+        amt = 0.0
+    key = (str(uid), raw_date[:7], str(r.get("account") or ""), str(r.get("type") or ""), str(r.get("category") or ""))
+    bucket = rollup_deltas.setdefault(key, [0.0, 0.0, 0])
+    bucket[0] += direction * amt
+    bucket[1] += direction * signed_amount(r.get("type"), amt)
+    bucket[2] += int(direction)
+
+def _rollup_materialized(conn: "DBConnectionWrapper", user_id: str) -> bool:
+    row = conn.execute("SELECT 1 FROM monthly_rollup WHERE user_id = :uid LIMIT 1", {"uid": user_id}).fetchone()
+    return row is not None
+
+def _apply_rollup_deltas(conn: "DBConnectionWrapper", rollup_deltas: dict) -> None:
+    rollup_deltas = {k: v for k, v in rollup_deltas.items() if any(v)}
+    for uid in {k[0] for k in rollup_deltas}:
+        if not _rollup_materialized(conn, uid):
+            # First write for this user: the rebuild already sees the rows written in this transaction
+            _rebuild_rollup(conn, uid)
+            continue
+        rows = [
+            {"uid": u, "month": m, "acc": a, "typ": t, "cat": c, "amt": amt, "signed": signed, "n": n}
+            for (u, m, a, t, c), (amt, signed, n) in rollup_deltas.items() if u == uid
+        ]
+        conn.execute(
+            """
+            INSERT INTO monthly_rollup (user_id, month, account, type, category, amount, signed_amount, tx_count)
+            VALUES (:uid, :month, :acc, :typ, :cat, :amt, :signed, :n)
+            ON CONFLICT (user_id, month, account, type, category) DO UPDATE SET
+                amount = monthly_rollup.amount + excluded.amount,
+                signed_amount = monthly_rollup.signed_amount + excluded.signed_amount,
+                tx_count = monthly_rollup.tx_count + excluded.tx_count
+            """,
+            rows,
+        )
+        if any(r["n"] < 0 for r in rows):  # only a bucket that lost rows can have emptied
+            conn.execute("DELETE FROM monthly_rollup WHERE user_id = :uid AND tx_count <= 0", {"uid": uid})
+
+def _rebuild_rollup(conn: "DBConnectionWrapper", user_id: str) -> None:
+    month_col = _month_sql("date")
+    conn.execute("DELETE FROM monthly_rollup WHERE user_id = :uid", {"uid": user_id})
+    conn.execute(
+        f"""
+        INSERT INTO monthly_rollup (user_id, month, account, type, category, amount, signed_amount, tx_count)
+        SELECT user_id, month, account, type, category, SUM(amount), SUM(signed_amount), COUNT(*)
+        FROM (
+            SELECT user_id, {month_col} AS month, COALESCE(account, '') AS account,
+                   COALESCE(type, '') AS type, COALESCE(category, '') AS category,
+                   COALESCE(amount, 0) AS amount, {signed_amount_sql()} AS signed_amount
+            FROM transactions
+            WHERE user_id = :uid AND date IS NOT NULL AND {_valid_month_sql("date")}
+        ) t
+        GROUP BY user_id, month, account, type, category
+        """,
+        {"uid": user_id},
+    )
+
+def _ensure_rollup(conn: "DBConnectionWrapper", user_id: str) -> None:
+    _ensure_ledger_views(conn)
+    if not _rollup_materialized(conn, user_id):
+        _rebuild_rollup(conn, user_id)
+
+def rebuild_monthly_rollup(user_id: str) -> bool:
+    """Recomputes a user's rollup from the transactions table (repair / backfill)."""
+    try:
+        with get_connection() as conn:
+            _ensure_ledger_views(conn)
+            _rebuild_rollup(conn, str(user_id))
+        return True
+    except Exception as e:
+        print(f"❌ Rollup rebuild failed ({user_id}): {e}")
+        return False
+
+def get_monthly_rollup(user_id: str, month_from: str | None = None, month_to: str | None = None,
+                       types: list[str] | None = None) -> pd.DataFrame:
+    """
+    Rollup rows of one user: month, account, type, category, amount,
+    signed_amount, tx_count.
+    Months are 'YYYY-MM' and inclusive; built on first use for users without one.
+    """
+    user_id = str(user_id)
+    where, params = ["user_id = :uid"], {"uid": user_id}
+    if month_from:
+        where.append("month >= :m0"); params["m0"] = month_from
+    if month_to:
+        where.append("month <= :m1"); params["m1"] = month_to
+    if types:
+        marks = ", ".join(f":t{i}" for i in range(len(types)))
+        where.append(f"type IN ({marks})"); params.update({f"t{i}": t for i, t in enumerate(types)})
+    try:
+        with get_connection() as conn:
+            _ensure_rollup(conn, user_id)
+            rows = conn.execute(
+                f"""
+                SELECT month, account, type, category, amount, signed_amount, tx_count FROM monthly_rollup
+                WHERE {" AND ".join(where)} ORDER BY month
+                """,
+                params,
+            ).fetchall()
+        df = pd.DataFrame(rows, columns=ROLLUP_FIELDS)
+        # Rollups built before months were validated may hold rows of unparseable dates
+        df = df[df["month"].astype(str).str.match(_MONTH_RE)].reset_index(drop=True)
+        for col in ("amount", "signed_amount"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0).astype("float64")
+        return df
+    except Exception as e:
+        print(f"❌ Load rollup failed ({user_id}): {e}")
+        return pd.DataFrame(columns=ROLLUP_FIELDS)
+
+def get_budget_actuals(user_id: str, month_from: str, month_to: str | None = None,
+                       categories: list[str] | None = None,
+                       exclude_categories: list[str] | None = None) -> pd.DataFrame:
+    """
+    Income + Expense per category over months 'YYYY-MM' (inclusive), with the
+    category's type from `categories`, in one grouped query on the rollup.
+    `categories` (e.g. the budgeted ones) are included even without activity.
+    Returns columns: category, category_type (None if unknown), Actual.
+    """
+    user_id = str(user_id)
+    params = {"uid": user_id, "m0": month_from, "m1": month_to or month_from}
+    excluded = [""] + list(exclude_categories or [])
+    params.update({f"x{i}": c for i, c in enumerate(excluded)})
+    wanted = [c for c in dict.fromkeys(categories or []) if c]
+    params.update({f"k{i}": c for i, c in enumerate(wanted)})
+    extra_keys = "".join(f" UNION SELECT CAST(:k{i} AS VARCHAR(50))" for i in range(len(wanted)))
+    query = f"""
+        WITH actual AS (
+            SELECT category, SUM(amount) AS actual FROM monthly_rollup
+            WHERE user_id = :uid AND month >= :m0 AND month <= :m1
+              AND type IN ('Expense', 'Income')
+              AND category NOT IN ({", ".join(f":x{i}" for i in range(len(excluded)))})
+            GROUP BY category
+        ), keys AS (
+            SELECT category FROM actual{extra_keys}
+        )
+        SELECT k.category, c.type, COALESCE(a.actual, 0)
+        FROM keys k
+        LEFT JOIN actual a ON a.category = k.category
+        LEFT JOIN (
+            -- One row per name even where duplicates block ux_categories_user_name: the
+            -- newest one, as the original name -> type dict (last row wins) resolved it
+            SELECT name, type FROM categories
+            WHERE id IN (SELECT MAX(id) FROM categories WHERE user_id = :uid GROUP BY name)
+        ) c ON c.name = k.category
+    """
+    columns = ["category", "category_type", "Actual"]
+    try:
+        with get_connection() as conn:
+            _ensure_rollup(conn, user_id)
+            rows = conn.execute(query, params).fetchall()
+        df = pd.DataFrame(rows, columns=columns)
+        df["Actual"] = pd.to_numeric(df["Actual"], errors="coerce").fillna(0.0).astype("float64")
+        return df
+    except Exception as e:
+        print(f"❌ Budget actuals failed ({user_id}): {e}")
+        return pd.DataFrame(columns=columns)
+
+# ============================================================
+# 9) INTERNAL TRANSFER FLAG
+# ============================================================
+# transactions.is_internal_transfer is set when a row is written, using the
+# owner's rules (core.ledger.DEFAULT_TRANSFER_RULES unless overridden here), so
+# analytics can drop transfers and adjustments with a boolean index.
+TRANSFER_RULES_COLUMNS = """
+    user_id VARCHAR(50) PRIMARY KEY,
+    labels TEXT,
+    patterns TEXT
+"""
+TRANSFER_RULE_FIELDS = frozenset({"type", "category", "payee", "description", "user_id"})
+
+_transfer_rules_ready = False
+
+def _touches_transfer_fields(query: str) -> bool:
+    """INSERTs, and UPDATEs whose SET clause assigns a field the rules look at."""
+    query = str(query)
+    if re.match(r"\s*DELETE", query, re.IGNORECASE):
+        return False
+    m = re.search(r"\bSET\b(.*?)(?:\bWHERE\b|$)", query, re.IGNORECASE | re.DOTALL)
+    if m is None:
+        return True
+    return any(re.search(rf"\b{f}\s*=", m.group(1), re.IGNORECASE) for f in TRANSFER_RULE_FIELDS)
+
+def _ensure_transfer_rules(conn: "DBConnectionWrapper") -> None:
+    global _transfer_rules_ready
+    if _transfer_rules_ready:
+        return
+    conn.execute(f"CREATE TABLE IF NOT EXISTS transfer_rules ({TRANSFER_RULES_COLUMNS});")
+    _transfer_rules_ready = True
+
+def _load_transfer_rules(conn: "DBConnectionWrapper", user_id) -> dict:
+    _ensure_transfer_rules(conn)
+    row = conn.execute(
+        "SELECT labels, patterns FROM transfer_rules WHERE user_id = :uid", {"uid": str(user_id)}
+    ).fetchone()
+    if row is None:
+        return normalize_transfer_rules(None)
+    return normalize_transfer_rules({"labels": json.loads(row[0] or "[]"), "patterns": json.loads(row[1] or "[]")})
+
+def _classify_transfers(conn: "DBConnectionWrapper", records: list[dict]) -> None:
+    """Sets `is_internal_transfer` on records about to be inserted."""
+    rules: dict = {}
+    for r in records:
+        uid = r.get("user_id")
+        if uid not in rules:
+            rules[uid] = _load_transfer_rules(conn, uid)
+        r["is_internal_transfer"] = is_internal_transfer(r, rules[uid])
+
+def _reflag_rows(conn: "DBConnectionWrapper", rows: list[dict]) -> None:
+    """Re-classifies rows after an update; writes only flags that changed."""
+    current = [r.get("is_internal_transfer") for r in rows]
+    _classify_transfers(conn, rows)
+    changed = [
+        {"id": r["id"], "flag": r["is_internal_transfer"]}
+        for r, old in zip(rows, current) if old is None or bool(old) != r["is_internal_transfer"]
+    ]
+    if changed:
+        owners = {r.get("user_id") for r in rows}
+        conn.execute("UPDATE transactions SET is_internal_transfer = :flag WHERE id = :id", changed, owners=owners)
+
+def _reclassify_transfers(conn: "DBConnectionWrapper", user_id: str | None, only_missing: bool = False) -> int:
+    where, params = [], {}
+    if user_id is not None:
+        where.append("user_id = :uid"); params["uid"] = str(user_id)
+    if only_missing:
+        where.append("is_internal_transfer IS NULL")
+    query = "SELECT id, user_id, type, category, payee, description, is_internal_transfer FROM transactions"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    df = pd.DataFrame(conn.execute(query, params).mappings().all())
+    if df.empty:
+        return 0
+
+    changed = 0
+    for uid, rows in df.groupby(df["user_id"].astype("object").fillna(""), sort=False):
+        flags = internal_transfer_mask(rows, _load_transfer_rules(conn, uid))
+        old = rows["is_internal_transfer"].astype("boolean")
+        stale = old.isna().to_numpy() | (old.fillna(False).to_numpy(dtype=bool) != flags.to_numpy())
+        updates = [{"id": int(i), "flag": bool(f)} for i, f in zip(rows["id"][stale], flags[stale])]
+        if updates:
+            conn.execute(
+                "UPDATE transactions SET is_internal_transfer = :flag WHERE id = :id", updates, owners={uid or None}
+            )
+            changed += len(updates)
+    return changed
+
+def get_transfer_rules(user_id: str) -> dict:
+    """The user's transfer rules: {"labels": [...], "patterns": [...]} (defaults if never saved)."""
+    try:
+        with get_connection() as conn:
+            return _load_transfer_rules(conn, user_id)
+    except Exception as e:
+        print(f"❌ Load transfer rules failed ({user_id}): {e}")
+        return normalize_transfer_rules(None)
+
+def set_transfer_rules(user_id: str, rules: dict | None) -> int | None:
+    """
+    Saves the user's rules (None restores the defaults) and re-classifies all of
+    their transactions. Returns the number of rows whose flag changed, None on error.
+    """
+    rules = normalize_transfer_rules(rules)
+    try:
+        with get_connection() as conn:
+            _ensure_schema(conn)
+            _ensure_transfer_rules(conn)
+            conn.execute(
+                """
+                INSERT INTO transfer_rules (user_id, labels, patterns) VALUES (:uid, :labels, :patterns)
+                ON CONFLICT (user_id) DO UPDATE SET labels = excluded.labels, patterns = excluded.patterns
+                """,
+                {"uid": str(user_id), "labels": json.dumps(rules["labels"]), "patterns": json.dumps(rules["patterns"])},
+            )
+            return _reclassify_transfers(conn, str(user_id))
+    except Exception as e:
+        print(f"❌ Save transfer rules failed ({user_id}): {e}")
+        return None
+
+def reclassify_transfers(user_id: str | None = None, only_missing: bool = False) -> int | None:
+    """
+    Bulk (re)computes is_internal_transfer for one user, or for everyone when
+    user_id is None; only_missing limits it to unflagged rows (the backfill run
+    by tools/backfill_transfer_flags.py). Returns the number of rows updated, None on error.
+    """
+    try:
+        with get_connection() as conn:
+            _ensure_schema(conn)
+            return _reclassify_transfers(conn, user_id, only_missing)
+    except Exception as e:
+        print(f"❌ Transfer re-classification failed: {e}")
+        return None
+
+# ============================================================
+# 10) TRANSACTION SEARCH
+# ============================================================
+# Substring search over payee, category and description, served by an index
+# that is scoped to the owner, so candidates of other tenants are never collected:
+# - Postgres: pg_trgm GIN index on (user_id, lower-cased text) through btree_gin
+#   (answers user_id = ... AND LIKE '%term%'), ranked by word_similarity().
+#   Without btree_gin the index holds the text only.
+# - SQLite: FTS5 table with the trigram tokenizer over user_id, the text columns
+#   and amount, kept in sync by triggers; the MATCH names the owner. Ranked by bm25().
+# The index is created by init_db() / ensure_indexes() (python -m tools.check_indexes
+# --apply); requests only detect it. Without one (not migrated yet, no CREATE
+# EXTENSION privilege, SQLite < 3.34) search falls back to LIKE scans of the
+# user's rows. Terms shorter than a trigram, and on SQLite terms common in the
+# user's newest rows, also use the LIKE scan: it stops after a page of hits
+# while the index has to collect them all. Every term also matches the amount's
+# text, as the editor's original pandas filter did.
+SEARCH_COLUMNS = ("payee", "category", "description")
+SEARCH_DOC_SQL = "LOWER(" + " || ' ' || ".join(f"COALESCE({c}, '')" for c in SEARCH_COLUMNS) + ")"
+SEARCH_MIN_TRIGRAM = 3  # shorter terms have no trigram to look up
+SEARCH_LOWER = "LOWER" if IS_POSTGRES else "ulower"  # Unicode-aware on both (see get_engine())
+SEARCH_PROBE_ROWS = 500  # newest rows of the user sampled to tell a common term from a rare one
+SEARCH_COMMON_HITS = 5  # sample hits from which the LIKE scan is used on SQLite
+
+# amount is indexed as SQLite renders it to text, i.e. as CAST(amount AS VARCHAR)
+FTS_COLUMNS = ("user_id", *SEARCH_COLUMNS, "amount")
+TRANSACTIONS_FTS_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        {", ".join(FTS_COLUMNS)}, content='transactions', content_rowid='id', tokenize='trigram'
+    )
+"""
+_FTS_NEW = f"new.id, {', '.join('new.' + c for c in FTS_COLUMNS)}"
+_FTS_OLD = f"'delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)}"
+_FTS_INSERT = f"INSERT INTO transactions_fts (rowid, {', '.join(FTS_COLUMNS)}) VALUES ({_FTS_NEW});"
+_FTS_DELETE = f"INSERT INTO transactions_fts (transactions_fts, rowid, {', '.join(FTS_COLUMNS)}) VALUES ({_FTS_OLD});"
+TRANSACTIONS_FTS_TRIGGERS = {
+    "transactions_fts_ai": f"AFTER INSERT ON transactions BEGIN {_FTS_INSERT} END",
+    "transactions_fts_ad": f"AFTER DELETE ON transactions BEGIN {_FTS_DELETE} END",
+    "transactions_fts_au": f"AFTER UPDATE OF id, {', '.join(FTS_COLUMNS)} ON transactions "
+                           f"BEGIN {_FTS_DELETE} {_FTS_INSERT} END",
+}
+# bm25() weights in FTS_COLUMNS order: the owner phrase matches every candidate alike,
+# payee hits rank first as in the LIKE ranking
+_FTS_WEIGHTS = {"user_id": 0.0, "payee": 2.0}
+_FTS_RANK = f"-bm25(transactions_fts, {', '.join(str(_FTS_WEIGHTS.get(c, 1.0)) for c in FTS_COLUMNS)})"
+
+_search_backend: str | None = None  # "trgm" | "fts5" | "like", decided once per process
+_trgm_schema = "public"
+
+def _setup_search(conn: "DBConnectionWrapper") -> str:
+    """
+    Creates the search index if the database supports one (migration only: the
+    first build reads every transaction). Returns the backend in use.
+    """
+    global _search_backend
+    try:
+        # A savepoint keeps a failed CREATE from aborting the caller's transaction
+        with conn.conn.begin_nested():
+            if IS_POSTGRES:
+                conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                schema = conn.execute(
+                    "SELECT extnamespace::regnamespace::text FROM pg_extension WHERE extname = 'pg_trgm'"
+                ).scalar()
+                columns = f"({SEARCH_DOC_SQL}) {schema}.gin_trgm_ops"
+                try:
+                    with conn.conn.begin_nested():
+                        conn.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+                    columns = f"user_id, {columns}"
+                except Exception as e:
+                    print(f"⚠️ btree_gin unavailable, search index is not scoped to the user: {e}")
+                indexdef = conn.execute(
+                    "SELECT indexdef FROM pg_indexes WHERE indexname = 'ix_transactions_search_trgm'"
+                ).scalar()
+                if indexdef and columns.startswith("user_id") and "gin (user_id" not in indexdef:
+                    conn.execute("DROP INDEX ix_transactions_search_trgm")  # text-only index from before
+                conn.execute(f"CREATE INDEX IF NOT EXISTS ix_transactions_search_trgm ON transactions USING gin ({columns})")
+            else:
+                columns = _fts_columns(conn)
+                exists = bool(columns)
+                if exists and columns != FTS_COLUMNS:
+                    # Table from before user_id / amount were indexed: rebuilt below
+                    for name in TRANSACTIONS_FTS_TRIGGERS:
+                        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                    conn.execute("DROP TABLE transactions_fts")
+                    exists = False
+                conn.execute(TRANSACTIONS_FTS_SQL)
+                for name, body in TRANSACTIONS_FTS_TRIGGERS.items():
+                    conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+                if not exists:
+                    conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    except Exception as e:
+        print(f"⚠️ Search index unavailable, searching with LIKE scans: {e}")
+    _search_backend = None
+    return _detect_search(conn)
+
+def _fts_columns(conn: "DBConnectionWrapper") -> tuple[str, ...]:
+    """Columns of transactions_fts, () if it does not exist."""
+    return tuple(r[1] for r in conn.execute("PRAGMA table_info(transactions_fts)").fetchall())
+
+def _detect_search(conn: "DBConnectionWrapper") -> str:
+    """The backend the existing schema supports; read-only, decided once per process."""
+    global _search_backend, _trgm_schema
+    if _search_backend is not None:
+        return _search_backend
+    backend = "like"
+    if IS_POSTGRES:
+        schema = conn.execute(
+            """
+            SELECT extnamespace::regnamespace::text FROM pg_extension
+            WHERE extname = 'pg_trgm'
+              AND EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'ix_transactions_search_trgm')
+            """
+        ).scalar()
+        if schema:
+            _trgm_schema, backend = schema, "trgm"
+    else:
+        # Without all three triggers the FTS table may be stale, so it is not used
+        found = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'transactions_fts' OR type = 'trigger'"
+        ).fetchall()}
+        if found >= {"transactions_fts", *TRANSACTIONS_FTS_TRIGGERS} and _fts_columns(conn) == FTS_COLUMNS:
+            backend = "fts5"
+    _search_backend = backend
+    return backend
+
+def _search_term(search: str | None) -> str:
+    return (search or "").strip().lower()
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def _is_common_term(user_id: str, condition: str, params: dict) -> bool:
+    """Whether `condition` holds for SEARCH_COMMON_HITS of the user's SEARCH_PROBE_ROWS newest rows."""
+    with get_connection() as conn:
+        hits = conn.execute(
+            f"""
+            SELECT COUNT(*) FROM (
+                SELECT {", ".join(SEARCH_COLUMNS)}, amount FROM transactions
+                WHERE user_id = :uid ORDER BY date DESC LIMIT {SEARCH_PROBE_ROWS}
+            ) sample WHERE {condition}
+            """,
+            {**params, "uid": str(user_id)},
+        ).scalar()
+    return hits >= SEARCH_COMMON_HITS
+
+def _search_clauses(term: str, user_id: str, ranked: bool = False) -> tuple[str, str, dict, str]:
+    """
+    (join, condition, params, rank) matching the lower-cased, non-empty `term` in
+    `user_id`'s rows: `join` goes after FROM transactions, `condition` may be
+    empty, `rank` is higher for better matches (with the FTS5 index, only when `ranked`).
+    """
+    if _search_backend is None:
+        with get_connection() as conn:
+            _detect_search(conn)
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params = {"q": f"%{escaped}%"}
+    esc = "" if IS_POSTGRES else " ESCAPE '\\'"  # backslash is Postgres' default escape
+    like = f"LIKE :q{esc}"
+    amount = f"CAST(amount AS VARCHAR(30)) {like}"
+    if _search_backend == "trgm":
+        params["term"] = term
+        rank = f"{_trgm_schema}.word_similarity(:term, {SEARCH_DOC_SQL})"
+        return "", f"({SEARCH_DOC_SQL} {like} OR {amount})", params, rank
+
+    lower = SEARCH_LOWER
+    condition = "(" + " OR ".join([*(f"{lower}({c}) {like}" for c in SEARCH_COLUMNS), amount]) + ")"
+    if (_search_backend == "fts5" and len(term) >= SEARCH_MIN_TRIGRAM
+            and not _is_common_term(user_id, condition, params)):
+        fts = f"{{{' '.join(FTS_COLUMNS[1:])}}} : {_fts_phrase(term)}"
+        if len(str(user_id)) >= SEARCH_MIN_TRIGRAM:  # shorter ids have no trigram; user_id = :uid still applies
+            fts = f"user_id : {_fts_phrase(str(user_id))} AND {fts}"
+        params = {"fts": fts}
+        if not ranked:
+            return "", "transactions.id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH :fts)", params, "0"
+        join = (
+            f"JOIN (SELECT rowid AS hit_id, {_FTS_RANK} AS hit_rank FROM transactions_fts "
+            "WHERE transactions_fts MATCH :fts) hits ON hits.hit_id = transactions.id"
+        )
+        return join, "", params, "hits.hit_rank"
+
+    rank = (
+        f"CASE WHEN {lower}(payee) LIKE :prefix{esc} THEN 3 "
+        f"WHEN {lower}(payee) {like} THEN 2 WHEN {lower}(category) {like} THEN 1 ELSE 0 END"
+    )
+    params["prefix"] = f"{escaped}%"
+    return "", condition, params, rank
+
+def search_transactions(user_id: str, query: str, limit: int = 50, filters: dict | None = None,
+                        date_from=None, date_to=None) -> pd.DataFrame:
+    """
+    The user's transactions whose payee, category, description or amount contains
+    `query` (case-insensitive), best match first, then newest.
+    filters: {column: value} / {column: [values]} as in load_data_db(); date_from /
+    date_to: inclusive day range. Rows carry a `rank` column (higher is better).
+    """
+    if not _search_term(query):
+        return pd.DataFrame()
+    filtered = _filter_conditions(filters)
+    if filtered is None:
+        return pd.DataFrame()
+    try:
+        join, conditions, params, rank = _transaction_filters(user_id, query, date_from, ranked=True)
+        conditions += filtered[0]
+        params.update(filtered[1])
+        if date_to is not None:
+            day_after = pd.Timestamp(normalize_date_to_iso(date_to)) + pd.Timedelta(days=1)
+            conditions.append("date < :date_before")
+            params["date_before"] = day_after.strftime("%Y-%m-%d")
+        params["limit"] = int(limit)
+        return get_dataframe_db(
+            f"""
+            SELECT transactions.*, {rank} AS rank FROM transactions {join}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY rank DESC, date DESC, id DESC
+            LIMIT :limit
+            """,
+            params,
+        )
+    except Exception as e:
+        print(f"❌ Transaction search failed ({user_id}): {e}")
+        return pd.DataFrame()
+
+# ============================================================
+# 11) PAYEE USAGE
+# ============================================================
+# payees.use_count / last_used: how often and how recently each payee occurs in
+# the owner's transactions, kept up to date by _sync_ledger_views() so payee
+# suggestions (core.payee_index) need no scan of the ledger. Payees that are
+# used but were never registered get a row on their first use.
+# The upsert uses ON CONFLICT when ux_payees_user_name exists; databases whose
+# duplicate payees keep it from being created get an UPDATE-then-INSERT instead.
+_payee_names_unique: bool | None = None  # ux_payees_user_name exists; checked once per migration
+
+def _add_payee_delta(payee_deltas: dict, r: dict, direction: int) -> None:
+    uid, name = r.get("user_id"), r.get("payee")
+    if uid is None or name is None or not str(name).strip():
+        return
+    # [count delta, newest date added, newest date removed]
+    bucket = payee_deltas.setdefault((str(uid), str(name)), [0, None, None])
+    bucket[0] += direction
+    day = normalize_date_to_iso(r.get("date"))
+    slot = 1 if direction > 0 else 2
+    if day and (bucket[slot] is None or day > bucket[slot]):
+        bucket[slot] = day
+
+def _payees_unique(conn: "DBConnectionWrapper") -> bool:
+    global _payee_names_unique
+    if _payee_names_unique is None:
+        _payee_names_unique = _index_exists(conn, "ux_payees_user_name")
+    return _payee_names_unique
+
+def _upsert_payees(conn: "DBConnectionWrapper", user_id: str, rows: list[dict], update_sql: str) -> None:
+    """
+    Inserts rows (:uid, :name, :first_n, :used) for new payees; for existing ones
+    runs `update_sql` (a SET list over :n / :used, reading the current row's columns).
+    """
+    if _payees_unique(conn):
+        conn.execute(
+            f"""
+            INSERT INTO payees (user_id, name, use_count, last_used) VALUES (:uid, :name, :first_n, :used)
+            ON CONFLICT (user_id, name) DO UPDATE SET {update_sql}
+            """,
+            rows,
+        )
+        return
+    conn.execute(f"UPDATE payees SET {update_sql} WHERE user_id = :uid AND name = :name", rows)
+    existing = {r[0] for r in conn.execute(
+        "SELECT DISTINCT name FROM payees WHERE user_id = :uid AND name IS NOT NULL", {"uid": user_id}
+    ).fetchall()}
+    missing = [r for r in rows if r["name"] not in existing]
+    if missing:
+        conn.execute(
+            "INSERT INTO payees (user_id, name, use_count, last_used) VALUES (:uid, :name, :first_n, :used)", missing
+        )
+
+def _payee_usage_materialized(conn: "DBConnectionWrapper", user_id: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM payees WHERE user_id = :uid AND use_count IS NOT NULL LIMIT 1", {"uid": user_id}
+    ).fetchone()
+    return row is not None
+
+def _apply_payee_deltas(conn: "DBConnectionWrapper", payee_deltas: dict) -> None:
+    # An edit that keeps a row's payee and date removes and adds the same use: nothing to write
+    payee_deltas = {k: v for k, v in payee_deltas.items() if v[0] or v[1] != v[2]}
+    if not payee_deltas:
+        return
+    _ensure_columns(conn)
+    greatest = "GREATEST" if IS_POSTGRES else "MAX"  # two-argument MAX() is SQLite's scalar max
+    for uid in {k[0] for k in payee_deltas}:
+        if not _payee_usage_materialized(conn, uid):
+            _rebuild_payee_usage(conn, uid)
+            continue
+        rows = [
+            {"uid": u, "name": name, "n": n, "first_n": max(n, 0), "used": used,
+             "removed_before": _day_after(removed) if removed else None}
+            for (u, name), (n, used, removed) in payee_deltas.items() if u == uid
+        ]
+        _upsert_payees(
+            conn, uid, rows,
+            f"""
+            use_count = {greatest}(COALESCE(payees.use_count, 0) + :n, 0),
+            last_used = CASE WHEN payees.last_used IS NULL OR :used > payees.last_used
+                             THEN COALESCE(:used, payees.last_used) ELSE payees.last_used END
+            """,
+        )
+        # A removed row may have been the newest use: recount those payees' last_used
+        removed = [r for r in rows if r["removed_before"]]
+        if removed:
+            conn.execute(
+                """
+                UPDATE payees SET last_used = (
+                    SELECT MAX(date) FROM transactions WHERE user_id = :uid AND payee = :name
+                )
+                WHERE user_id = :uid AND name = :name AND last_used < :removed_before
+                """,
+                removed,
+            )
+
+def _rebuild_payee_usage(conn: "DBConnectionWrapper", user_id: str) -> None:
+    _ensure_columns(conn)
+    conn.execute("UPDATE payees SET use_count = 0, last_used = NULL WHERE user_id = :uid", {"uid": user_id})
+    usage = """
+        SELECT user_id, payee, COUNT(*), MAX(date) FROM transactions
+        WHERE user_id = :uid AND payee IS NOT NULL AND TRIM(payee) <> ''
+        GROUP BY user_id, payee
+    """
+    if _payees_unique(conn):
+        conn.execute(
+            f"""
+            INSERT INTO payees (user_id, name, use_count, last_used) {usage}
+            ON CONFLICT (user_id, name) DO UPDATE SET
+                use_count = excluded.use_count, last_used = excluded.last_used
+            """,
+            {"uid": user_id},
+        )
+        return
+    rows = [
+        {"uid": user_id, "name": name, "n": n, "first_n": n, "used": used}
+        for _, name, n, used in conn.execute(usage, {"uid": user_id}).fetchall()
+    ]
+    if rows:
+        _upsert_payees(conn, user_id, rows, "use_count = :n, last_used = :used")
+
+def rebuild_payee_usage(user_id: str) -> bool:
+    """Recounts a user's payee use_count / last_used from the transactions table (repair / backfill)."""
+    try:
+        with get_connection() as conn:
+            _rebuild_payee_usage(conn, str(user_id))
+        return True
+    except Exception as e:
+        print(f"❌ Payee usage rebuild failed ({user_id}): {e}")
+        return False
+
+def get_payee_usage(user_id: str) -> pd.DataFrame:
+    """The user's payees with use_count and last_used (counted on first call if never materialized)."""
+    try:
+        with get_connection() as conn:
+            _ensure_columns(conn)
+            if not _payee_usage_materialized(conn, str(user_id)):
+                _rebuild_payee_usage(conn, str(user_id))
+            rows = conn.execute(
+                "SELECT name, COALESCE(use_count, 0) AS use_count, last_used FROM payees "
+                "WHERE user_id = :uid AND name IS NOT NULL",
+                {"uid": str(user_id)},
+            ).mappings().all()
+        return pd.DataFrame(rows, columns=["name", "use_count", "last_used"])
+    except Exception as e:
+        print(f"❌ Load payee usage failed ({user_id}): {e}")
+        return pd.DataFrame(columns=["name", "use_count", "last_used"])
+
 # ============================================================
 # PASSWORD RESET (FORGOT PASSWORD)
 # ============================================================
@@ -585,14 +2156,35 @@ def reset_password_with_token(raw_token: str, new_password: str) -> bool:
 
 __all__ = [
     "load_data_db",
+    "load_transactions_page",
+    "apply_transaction_changes",
+    "transactions_summary",
+    "search_transactions",
+    "USER_SCOPED_TABLES",
+    "UnscopedQueryError",
     "execute_query_db",
+    "data_version",
     "get_connection",
     "normalize_date_to_iso",
     "normalize_type",
     "save_data_db",
     "add_record_db",
+    "add_transactions_batch",
     "update_record_db",
     "delete_record_db",
+    "ensure_indexes",
+    "get_account_balances",
+    "rebuild_balances",
+    "get_balance_as_of",
+    "backfill_checkpoints",
+    "rebuild_monthly_rollup",
+    "get_monthly_rollup",
+    "get_budget_actuals",
+    "get_transfer_rules",
+    "set_transfer_rules",
+    "reclassify_transfers",
+    "rebuild_payee_usage",
+    "get_payee_usage",
     "send_approval_email",
     "send_license_request_email",
     "send_password_reset_email",
@@ -309,7 +309,9 @@ def translate_defaults_for_user(user_id: str, target_lang: str) -> Tuple[int, in
                                     {"new": target_acc_name, "uid": user_id, "old": current_name},
                                 )
 
-                                conn.execute(
+                                # Through execute_query_db so balances, checkpoints and the
+                                # monthly rollup are rebuilt under the new name
+                                if not execute_query_db(
                                     """
                                     UPDATE transactions
                                        SET account = :new
@@ -317,7 +319,8 @@ def translate_defaults_for_user(user_id: str, target_lang: str) -> Tuple[int, in
                                        AND account = :old
                                     """,
                                     {"new": target_acc_name, "uid": user_id, "old": current_name},
-                                )
+                                ):
+                                    raise RuntimeError("Renaming the account in transactions failed")
 
                                 conn.execute(
                                     """
@@ -328,8 +331,6 @@ def translate_defaults_for_user(user_id: str, target_lang: str) -> Tuple[int, in
                                     """,
                                     {"new": target_acc_name, "uid": user_id, "old": current_name},
                                 )
-
-                                conn.conn.commit()
                             accounts_changed = 1
                         except Exception:
                             pass
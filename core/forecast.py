@@ -0,0 +1,196 @@
+# core/forecast.py
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# One-off bookkeeping rows, not cash flow
+NON_CASH_CATEGORIES = ["Opening Balance", "Balance Adjustment"]
+
+
+# ============================================================
+# 📊 HISTORY
+# ============================================================
+def _flow_index(first: pd.Period | None, months: int | None, through: pd.Period) -> pd.PeriodIndex:
+    if months is None:
+        return pd.period_range(start=min(first or through, through), end=through, freq="M", name="month")
+    return pd.period_range(end=through, periods=months, freq="M", name="month")
+
+
+def _pivot_flows(month: pd.Series, category: pd.Series, signed: pd.Series, index: pd.PeriodIndex) -> pd.DataFrame:
+    keep = (month >= index[0]) & (month <= index[-1])
+    flows = signed[keep].groupby([month[keep], category[keep]]).sum().unstack(fill_value=0.0)
+    return flows.reindex(index, fill_value=0.0)
+
+
+def monthly_category_flows(ledger: pd.DataFrame, account: str | None = None,
+                           months: int | None = 24, through: pd.Period | None = None) -> pd.DataFrame:
+    """
+    Net signed flow per (month × category) over the last `months` complete
+    months (ending with `through`, default: last month), zero-filled;
+    months=None starts at the first transaction.
+    `ledger` is a prepare_ledger() frame; with `account`, only that account.
+    """
+    through = through or (pd.Timestamp.today().to_period("M") - 1)
+    if ledger is None or ledger.empty:
+        return pd.DataFrame(index=pd.period_range(end=through, periods=months or 0, freq="M", name="month"))
+
+    df = ledger.dropna(subset=["date"])
+    first = df["date"].min().to_period("M") if not df.empty else None
+    index = _flow_index(first, months, through)
+    if account is not None:
+        df = df[df["account"] == account]
+    df = df[~df["category"].isin(NON_CASH_CATEGORIES)]
+    month = df["date"].dt.to_period("M").rename("month")
+    category = df["category"].astype("object").fillna("Unknown").rename("category")
+    return _pivot_flows(month, category, df["signed_amount"], index)
+
+
+def rollup_category_flows(rollup: pd.DataFrame, account: str | None = None,
+                          months: int | None = 24, through: pd.Period | None = None) -> pd.DataFrame:
+    """monthly_category_flows() from monthly_rollup rows instead of the raw ledger."""
+    through = through or (pd.Timestamp.today().to_period("M") - 1)
+    if rollup is None or rollup.empty:
+        return pd.DataFrame(index=pd.period_range(end=through, periods=months or 0, freq="M", name="month"))
+
+    month = pd.PeriodIndex(rollup["month"], freq="M").to_series(index=rollup.index, name="month")
+    index = _flow_index(month.min(), months, through)
+    df = rollup
+    if account is not None:
+        df = df[df["account"] == account]
+    df = df[~df["category"].isin(NON_CASH_CATEGORIES)]
+    category = df["category"].replace("", "Unknown").rename("category")
+    return _pivot_flows(month[df.index], category, df["signed_amount"], index)
+
+
+# ============================================================
+# 🎲 MONTE CARLO
+# ============================================================
+def simulate_cash_flow(flows: pd.DataFrame, start_balance: float, horizon: int = 12,
+                       n_paths: int = 10_000, method: str = "bootstrap", seed: int | None = 0,
+                       start: pd.Period | None = None) -> pd.DataFrame:
+    """
+    Simulates `n_paths` balance paths over `horizon` months from the
+    historical (month × category) `flows`:
+      - "bootstrap": each category draws a historical month independently
+      - "normal": each category ~ N(mean, std) of its history (summed in closed form)
+
+    Returns one row per future month: P10 / P50 / P90 balance, the
+    probability of being overdrawn in that month (p_overdraft) and of having
+    been overdrawn at any point so far (p_overdraft_by).
+    """
+    rng = np.random.default_rng(seed)
+    history = flows.to_numpy(dtype=float)
+    n_hist = history.shape[0]
+    totals = np.zeros((n_paths, horizon))
+    if n_hist and history.shape[1]:
+        if method == "normal":
+            mean = history.mean(axis=0).sum()
+            std = np.sqrt(history.var(axis=0).sum())
+            totals = rng.normal(mean, std, size=(n_paths, horizon))
+        elif method == "bootstrap":
+            # One category at a time keeps memory at (paths × months)
+            for column in history.T:
+                totals += column[rng.integers(0, n_hist, size=(n_paths, horizon))]
+        else:
+            raise ValueError(f"Unknown method: {method!r}")
+
+    balances = float(start_balance) + np.cumsum(totals, axis=1)
+    p10, p50, p90 = np.percentile(balances, [10, 50, 90], axis=0)
+    start = start or (pd.Timestamp.today().to_period("M") + 1)
+    return pd.DataFrame({
+        "month": pd.period_range(start=start, periods=horizon, freq="M").strftime("%Y-%m"),
+        "P10": p10,
+        "P50": p50,
+        "P90": p90,
+        "p_overdraft": (balances < 0).mean(axis=0),
+        "p_overdraft_by": (np.minimum.accumulate(balances, axis=1) < 0).mean(axis=0),
+    })
+
+
+# ============================================================
+# 📈 SEASONAL TREND MODEL
+# ============================================================
+class SeasonalModel:
+    """
+    Linear trend plus month-of-year effects, fitted to every column of a
+    (month × series) frame at once: one ridge-regularized least-squares
+    system shared by all series.
+
+    Only the normal equations (XᵀX, XᵀY) are kept, so appending a month is a
+    rank-one update and predict() solves a single 13 × 13 system. The ridge
+    acts like `ridge` pseudo-observations of "no slope, no seasonality",
+    which keeps short histories (< 13 months) solvable and damped.
+    """
+
+    N_PARAMS = 13  # intercept, trend (per year), Feb..Dec offsets vs January
+
+    def __init__(self, ridge: float = 1.0):
+        self.ridge = ridge
+        self.origin: pd.Period | None = None
+        self.history = pd.DataFrame()
+        self._xtx = np.zeros((self.N_PARAMS, self.N_PARAMS))
+        self._xty = np.zeros((self.N_PARAMS, 0))
+
+    def _design(self, periods) -> np.ndarray:
+        periods = pd.PeriodIndex(periods, freq="M")
+        x = np.zeros((len(periods), self.N_PARAMS))
+        x[:, 0] = 1.0
+        x[:, 1] = np.asarray([(p - self.origin).n for p in periods], dtype=float) / 12.0
+        moy = periods.month.to_numpy()
+        rows = np.flatnonzero(moy > 1)
+        x[rows, moy[rows]] = 1.0  # columns 2..12 = Feb..Dec
+        return x
+
+    def fit(self, flows: pd.DataFrame) -> "SeasonalModel":
+        self.origin = flows.index[0] if len(flows) else pd.Timestamp.today().to_period("M")
+        self.history = flows.iloc[:0].copy()
+        self._xtx = np.zeros((self.N_PARAMS, self.N_PARAMS))
+        self._xty = np.zeros((self.N_PARAMS, flows.shape[1]))
+        return self.update(flows)
+
+    def update(self, new_rows: pd.DataFrame) -> "SeasonalModel":
+        """Adds months after the current history; new series start with zero history."""
+        if new_rows.empty:
+            return self
+        if self.origin is None:
+            return self.fit(new_rows)
+        added = [c for c in new_rows.columns if c not in self.history.columns]
+        if added:
+            self._xty = np.hstack([self._xty, np.zeros((self.N_PARAMS, len(added)))])
+        self.history = pd.concat([self.history, new_rows]).fillna(0.0)
+        x = self._design(new_rows.index)
+        y = new_rows.reindex(columns=self.history.columns, fill_value=0.0).to_numpy(dtype=float)
+        self._xtx += x.T @ x
+        self._xty += x.T @ y
+        return self
+
+    @classmethod
+    def refresh(cls, model: "SeasonalModel | None", flows: pd.DataFrame, ridge: float = 1.0) -> "SeasonalModel":
+        """`model` updated with the months `flows` adds, or a fresh fit if earlier months changed."""
+        if model is not None and len(model.history) and len(flows) >= len(model.history):
+            old = flows.iloc[: len(model.history)]
+            same_months = old.index.equals(model.history.index)
+            prior = old.reindex(columns=model.history.columns, fill_value=0.0)
+            new_cols = old.drop(columns=list(model.history.columns), errors="ignore")
+            if (same_months and np.allclose(prior.to_numpy(dtype=float), model.history.to_numpy(dtype=float))
+                    and not new_cols.to_numpy().any()):
+                return model.update(flows.iloc[len(model.history):])
+        return cls(ridge).fit(flows)
+
+    def coefficients(self) -> pd.DataFrame:
+        penalty = np.full(self.N_PARAMS, self.ridge)
+        penalty[0] = 0.0
+        # A tiny jitter keeps the intercept solvable with no history at all
+        beta = np.linalg.solve(self._xtx + np.diag(penalty + 1e-9), self._xty)
+        labels = ["intercept", "trend"] + [f"m{m:02d}" for m in range(2, 13)]
+        return pd.DataFrame(beta, index=labels, columns=self.history.columns)
+
+    def predict(self, horizon: int, clip_at_zero: bool = False) -> pd.DataFrame:
+        """The next `horizon` months after the history, one column per series."""
+        last = self.history.index[-1] if len(self.history) else self.origin - 1
+        periods = pd.period_range(start=last + 1, periods=horizon, freq="M", name="month")
+        values = self._design(periods) @ self.coefficients().to_numpy()
+        if clip_at_zero:
+            values = np.maximum(values, 0.0)
+        return pd.DataFrame(values, index=periods, columns=self.history.columns)
@@ -0,0 +1,78 @@
+# core/frame_diff.py
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# 🔍 EDITED-FRAME DIFF
+# ============================================================
+@dataclass
+class FrameDiff:
+    """What an editor changed: new rows, changed cells per existing row, removed keys."""
+    inserts: list[dict] = field(default_factory=list)
+    updates: list[dict] = field(default_factory=list)  # {key: ..., changed column: new value, ...}
+    deletes: list = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.inserts or self.updates or self.deletes)
+
+
+def _plain(value):
+    """DB-bindable scalar: None for NaN/NaT, Python types for numpy/pandas scalars."""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _same(a: pd.Series, b: pd.Series) -> np.ndarray:
+    """Element-wise equality where two missing values count as equal."""
+    both_missing = a.isna().to_numpy() & b.isna().to_numpy()
+    try:
+        equal = (a == b).fillna(False).to_numpy(dtype=bool)
+    except TypeError:
+        equal = np.array([x == y for x, y in zip(a, b)], dtype=bool)
+    return both_missing | equal
+
+
+def diff_frames(original: pd.DataFrame, edited: pd.DataFrame, key: str = "id") -> FrameDiff:
+    """
+    Compares an edited copy with the frame it started from, matching rows by
+    `key`. Rows without a key are inserts, missing keys are deletes, and for
+    the rest only the cells that differ are reported.
+    """
+    diff = FrameDiff()
+    if key not in edited.columns:
+        return diff
+
+    new_rows = edited[edited[key].isna()]
+    diff.inserts = [
+        {c: _plain(v) for c, v in row.items() if c != key}
+        for row in new_rows.to_dict(orient="records")
+    ]
+
+    old = original.dropna(subset=[key]).drop_duplicates(subset=[key]).set_index(key)
+    cur = edited.dropna(subset=[key]).drop_duplicates(subset=[key]).set_index(key)
+    diff.deletes = [_plain(k) for k in old.index.difference(cur.index)]
+
+    common = old.index.intersection(cur.index)
+    columns = [c for c in cur.columns if c in old.columns]
+    if common.empty or not columns:
+        return diff
+    old, cur = old.loc[common, columns], cur.loc[common, columns]
+
+    changed = pd.DataFrame(
+        {c: ~_same(old[c], cur[c]) for c in columns}, index=common
+    )
+    for k, row_changed in changed[changed.any(axis=1)].iterrows():
+        cols = row_changed.index[row_changed.to_numpy()]
+        diff.updates.append({key: _plain(k), **{c: _plain(cur.at[k, c]) for c in cols}})
+    return diff
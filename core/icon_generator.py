@@ -15,7 +15,8 @@ def generate_and_save_icons():
     """Loops through categories and generates custom 3D icons."""
     
     # 1. Load your 41 imported categories
-    cat_df = load_data_db("categories")
+    # Admin tool: icons are shared by category name across all users
+    cat_df = load_data_db("categories", user_id="bypass")
     if cat_df.empty:
         st.warning("No categories found in database.")
         return
@@ -0,0 +1,171 @@
+# core/ledger.py
+from __future__ import annotations
+
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# 🧮 SIGN RULES (single source of truth)
+# ============================================================
+# Amount is taken AS IS for these types (Opening Balance may be negative for loans).
+POSITIVE_TYPES = ("income", "deposit", "refund", "opening balance")
+# Amount is always booked as an outflow for these types.
+NEGATIVE_TYPES = ("expense", "transfer", "withdrawal", "payment")
+
+_SIGN_BY_TYPE = {**{t: 1 for t in POSITIVE_TYPES}, **{t: -1 for t in NEGATIVE_TYPES}}
+
+
+def signed_amount(type_val, amount_val) -> float:
+    """Scalar version of the sign rules, for single records on the write path."""
+    try:
+        amt = float(amount_val or 0)
+    except (TypeError, ValueError):
+        amt = 0.0
+    if amt != amt:  # NaN
+        amt = 0.0
+    sign = _SIGN_BY_TYPE.get(str(type_val or "").strip().lower(), 0)
+    if sign > 0:
+        return amt
+    if sign < 0:
+        return -abs(amt)
+    return 0.0
+
+
+def _type_signs(types: pd.Series) -> np.ndarray:
+    """
+    Maps the type column to -1/0/+1 via categorical codes.
+    Only the (few) distinct labels are normalized; rows are resolved with one take().
+    """
+    codes, uniques = pd.factorize(types, use_na_sentinel=True)
+    labels = pd.Index(uniques).astype(str).str.strip().str.lower()
+    lookup = np.array([_SIGN_BY_TYPE.get(lbl, 0) for lbl in labels] + [0], dtype=np.int8)
+    # Sentinel -1 (missing type) picks the trailing 0
+    return lookup[codes]
+
+
+def signed_amounts(df: pd.DataFrame) -> pd.Series:
+    """Vectorized signed amount for every row of a transactions frame."""
+    if df is None or df.empty:
+        return pd.Series(dtype="float64", index=getattr(df, "index", None))
+
+    amounts = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0).to_numpy(dtype="float64")
+    if "type" not in df.columns:
+        return pd.Series(np.zeros(len(df)), index=df.index)
+
+    signs = _type_signs(df["type"])
+    out = np.where(signs < 0, -np.abs(amounts), np.where(signs > 0, amounts, 0.0))
+    return pd.Series(out, index=df.index, name="signed_amount")
+
+
+def signed_amount_sql(type_col: str = "type", amount_col: str = "amount") -> str:
+    """The same sign rules as a SQL CASE expression (SQLite + Postgres)."""
+    pos = ", ".join(f"'{t}'" for t in POSITIVE_TYPES)
+    neg = ", ".join(f"'{t}'" for t in NEGATIVE_TYPES)
+    norm = f"LOWER(TRIM({type_col}))"
+    amt = f"COALESCE({amount_col}, 0)"
+    return (
+        f"(CASE WHEN {norm} IN ({pos}) THEN {amt} "
+        f"WHEN {norm} IN ({neg}) THEN -ABS({amt}) ELSE 0 END)"
+    )
+
+
+# ============================================================
+# 🔁 INTERNAL TRANSFERS
+# ============================================================
+# A row is an internal transfer / adjustment when its (title-cased) type or its
+# category is one of `labels`, or its payee or description contains one of
+# `patterns` (case-insensitive substrings). Users may override both lists.
+DEFAULT_TRANSFER_RULES = {
+    "labels": ["Transfer", "Overføring", "Overforing", "Adjustment", "Balansejustering", "Balance Adjustment"],
+    "patterns": ["overføring", "transfer", "adjustment", "balansejustering"],
+}
+
+
+def normalize_transfer_rules(rules: dict | None) -> dict:
+    """`rules` with both keys present, labels stripped and patterns lower-cased; defaults when None."""
+    rules = DEFAULT_TRANSFER_RULES if rules is None else rules
+    labels = [str(x).strip() for x in rules.get("labels") or [] if str(x).strip()]
+    patterns = [str(x).strip().lower() for x in rules.get("patterns") or [] if str(x).strip()]
+    return {"labels": list(dict.fromkeys(labels)), "patterns": list(dict.fromkeys(patterns))}
+
+
+def is_internal_transfer(record: dict, rules: dict | None = None) -> bool:
+    """Classifies one transaction dict (write-time path)."""
+    rules = normalize_transfer_rules(rules)
+    labels = set(rules["labels"])
+    if str(record.get("type") or "").strip().title() in labels or record.get("category") in labels:
+        return True
+    text = f"{record.get('payee') or ''}\n{record.get('description') or ''}".lower()
+    return any(p in text for p in rules["patterns"])
+
+
+def internal_transfer_mask(df: pd.DataFrame, rules: dict | None = None) -> pd.Series:
+    """is_internal_transfer() for every row of a transactions frame."""
+    rules = normalize_transfer_rules(rules)
+    labels = rules["labels"]
+    mask = df["type"].astype("object").fillna("").astype(str).str.strip().str.title().isin(labels)
+    mask |= df["category"].astype("object").isin(labels)
+    if rules["patterns"]:
+        pattern = "|".join(re.escape(p) for p in rules["patterns"])
+        for col in ("payee", "description"):
+            if col in df.columns:
+                text = df[col].astype("object").fillna("").astype(str).str.lower()
+                mask |= text.str.contains(pattern, regex=True)
+    return mask.rename("is_internal_transfer")
+
+
+# ============================================================
+# 📒 PREPARED LEDGER
+# ============================================================
+# Low-cardinality text columns stored as pandas `category` (codes + one copy of each label).
+# Consumers that fill or rewrite these with new labels must convert to object first.
+CATEGORICAL_COLUMNS = ("type", "account", "category", "payee", "user_id")
+
+
+def prepare_ledger(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parses a raw transactions frame once: datetime64 `date`, float64 `amount`,
+    the derived `signed_amount`, and `category` dtype for the label columns.
+    Returns a new frame.
+    """
+    out = df.copy()
+    if "date" in out.columns:
+        out["date"] = pd.to_datetime(out["date"], errors="coerce")
+    if "amount" in out.columns:
+        out["amount"] = pd.to_numeric(out["amount"], errors="coerce").fillna(0.0).astype("float64")
+        out["signed_amount"] = signed_amounts(out) if not out.empty else pd.Series(dtype="float64")
+    for col in CATEGORICAL_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+    if "is_internal_transfer" in out.columns:
+        # Nullable: rows written before the flag existed stay <NA> until backfilled
+        out["is_internal_transfer"] = out["is_internal_transfer"].astype("boolean")
+    return out
+
+
+# ============================================================
+# 📊 BALANCES
+# ============================================================
+def balances_by_account(df: pd.DataFrame, as_of: date | None = None) -> dict[str, float]:
+    """
+    Sums signed amounts per account. With `as_of`, only rows dated on or before it count;
+    rows with an unparseable date are treated as dated today.
+    """
+    if df is None or df.empty:
+        return {}
+
+    signed = signed_amounts(df)
+    if as_of is not None:
+        dates = pd.to_datetime(df["date"], errors="coerce").dt.normalize()
+        keep = (dates.fillna(pd.Timestamp(date.today())) <= pd.Timestamp(as_of)).to_numpy()
+        signed = signed[keep]
+        accounts = df["account"][keep]
+    else:
+        accounts = df["account"]
+
+    if signed.empty:
+        return {}
+    return signed.groupby(accounts.to_numpy(), sort=False).sum().to_dict()
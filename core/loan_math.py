@@ -0,0 +1,477 @@
+# core/loan_math.py
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+MAX_MONTHS = 720  # 60 years cap
+
+SCHEDULE_COLUMNS = [
+    "Month", "Date", "Start Balance", "Interest", "Rate %", "Fee", "Principal",
+    "Extra / Adj", "Admin Fee", "Total Payment", "End Balance", "Status",
+]
+
+
+# ============================================================
+# 🧮 BASIC LOAN MATH
+# ============================================================
+def add_months(start_date, months):
+    return start_date + relativedelta(months=+months)
+
+
+def count_months(start_date, end_date):
+    diff = relativedelta(end_date, start_date)
+    return diff.years * 12 + diff.months
+
+
+def annuity_payment(principal, annual_rate, months):
+    if months <= 0: return principal
+    if annual_rate <= 0: return principal / months
+    r = (annual_rate / 100.0) / 12.0
+    numerator = r * principal
+    denominator = 1 - (1 + r)**(-months)
+    return numerator / denominator
+
+
+def first_payment_date(start_date: dt.date, payment_day: int) -> dt.date:
+    current = start_date
+    if current.day > payment_day:
+        current = add_months(current, 1)
+    return current.replace(day=payment_day)
+
+
+def payment_dates(first: dt.date, n_months: int) -> np.ndarray:
+    """
+    `first`, then one month added at a time (datetime64[D]). Like repeated
+    relativedelta(months=1), a day clipped by a short month stays clipped.
+    """
+    months = np.datetime64(first, "M") + np.arange(n_months)
+    month_starts = months.astype("datetime64[D]")
+    days_in_month = ((months + 1).astype("datetime64[D]") - month_starts).astype(np.int64)
+    days = np.minimum.accumulate(np.concatenate(([first.day], days_in_month[1:])))
+    return month_starts + (days - 1)
+
+
+# ============================================================
+# 📅 PER-MONTH INPUTS
+# ============================================================
+def _monthly_terms(terms_history_df, dates: np.ndarray, rate: float, fee: float) -> tuple[np.ndarray, np.ndarray]:
+    """Rate and fee in force on each payment date (the latest change on or before it)."""
+    rates = np.full(len(dates), rate)
+    fees = np.full(len(dates), fee)
+    if terms_history_df is None or terms_history_df.empty:
+        return rates, fees
+
+    change_days = pd.to_datetime(terms_history_df["change_date"]).dt.normalize().to_numpy().astype("datetime64[D]")
+    order = np.argsort(change_days, kind="stable")
+    change_days = change_days[order]
+    chg_rates = terms_history_df["interest_rate"].astype(float).to_numpy()[order]
+    chg_fees = terms_history_df["admin_fee"].astype(float).to_numpy()[order]
+
+    idx = np.searchsorted(change_days, dates, side="right") - 1
+    active = idx >= 0
+    rates[active] = chg_rates[idx[active]]
+    fees[active] = chg_fees[idx[active]]
+    return rates, fees
+
+
+def _monthly_extras(extra_payments_df, first: dt.date, n_months: int) -> dict[int, float]:
+    """Extra payments summed per calendar month, keyed by month offset from `first`."""
+    if extra_payments_df is None or extra_payments_df.empty:
+        return {}
+    by_month: dict[tuple[int, int], float] = {}
+    for d, amount in zip(pd.to_datetime(extra_payments_df["pay_date"]), extra_payments_df["amount"]):
+        key = (d.year, d.month)
+        by_month[key] = by_month.get(key, 0.0) + float(amount)
+    base = first.year * 12 + first.month
+    return {
+        y * 12 + m - base: amount
+        for (y, m), amount in by_month.items()
+        if 0 <= y * 12 + m - base < n_months
+    }
+
+
+# ============================================================
+# 📉 SEGMENTS
+# ============================================================
+def _regular_segment(balance: float, monthly_rate: float, length: int, is_io: bool,
+                     loan_type: str, fixed_principal: float, annuity: float):
+    """
+    `length` months with constant terms and no extra payments, in closed form.
+    Returns (start, interest, principal, required) arrays, cut after the month
+    that pays the loan off or before the first month starting at <= 1.0.
+    """
+    if is_io:
+        start = np.full(length, balance)
+        interest = start * monthly_rate
+        return start, interest, np.zeros(length), interest
+
+    if loan_type == "Serial":
+        start = np.subtract.accumulate(np.concatenate(([balance], np.full(length - 1, fixed_principal))))
+        interest = start * monthly_rate
+        principal = np.full(length, fixed_principal)
+        required = principal + interest
+    else:
+        payment = annuity
+        if payment <= balance * monthly_rate:
+            # Payment never covers the interest: the balance is frozen
+            start = np.full(length, balance)
+        elif monthly_rate == 0:
+            start = np.subtract.accumulate(np.concatenate(([balance], np.full(length - 1, payment))))
+        else:
+            growth = (1.0 + monthly_rate) ** np.arange(length)
+            start = balance * growth - payment * (growth - 1.0) / monthly_rate
+        interest = start * monthly_rate
+        base = np.maximum(payment, interest)
+        principal = base - interest
+        required = base
+
+    clamp = principal > start
+    principal = np.where(clamp, start, principal)
+    required = np.where(clamp, interest + principal, required)
+
+    cut = length
+    below = np.flatnonzero(start <= 1.0)
+    if below.size:
+        cut = int(below[0])
+    paid_off = np.flatnonzero(clamp[:cut])
+    if paid_off.size:
+        cut = int(paid_off[0]) + 1
+    return start[:cut], interest[:cut], principal[:cut], required[:cut]
+
+
+def _single_month(balance: float, monthly_rate: float, is_io: bool, loan_type: str,
+                  fixed_principal: float, annuity: float, fee: float, extra: float):
+    """One month with an extra payment (the scalar rules, including the overpay clamp)."""
+    interest = balance * monthly_rate
+    if is_io:
+        principal, required = 0.0, interest
+    elif loan_type == "Serial":
+        principal = fixed_principal
+        required = principal + interest
+    else:
+        base = annuity
+        if base < interest: base = interest
+        principal = base - interest
+        required = base
+
+    if principal > balance:
+        principal = balance
+        required = interest + principal
+
+    real_principal = principal + extra
+    total = required + fee + extra
+    if real_principal > balance:
+        excess = real_principal - balance
+        real_principal = balance
+        total -= excess
+    return interest, principal, total, balance - real_principal
+
+
+# ============================================================
+# 🗓️ SCHEDULE
+# ============================================================
+def generate_schedule(
+    balance, rate, start_date, payment_day, mode,
+    loan_type="Annuity",
+    target_payment=None, target_date=None, admin_fee=0,
+    extra_payments_df=None, terms_history_df=None,
+    io_from=None, io_to=None
+) -> pd.DataFrame:
+    """
+    Month-by-month amortization schedule (at most MAX_MONTHS rows).
+
+    The timeline is split where the rate, fee or interest-only state changes,
+    where the payment is recalculated and around months with extra payments;
+    each regular segment is computed in closed form with NumPy.
+    """
+    current_balance = float(balance)
+    base_rate = float(rate)
+    base_fee = float(admin_fee)
+
+    def recalculate_payment(curr_bal, curr_rate, calc_date):
+        if mode == 'date' and target_date:
+            rem_months = max(1, count_months(calc_date, target_date))
+            if loan_type == "Serial":
+                return curr_bal / rem_months
+            elif loan_type == "Frame":
+                return 0.0
+            else:
+                return annuity_payment(curr_bal, curr_rate, rem_months)
+        else:
+            return float(target_payment)
+
+    first = first_payment_date(start_date, payment_day)
+    fixed_principal = annuity = 0.0
+    base_payment = recalculate_payment(current_balance, base_rate, start_date)
+    if loan_type == "Serial": fixed_principal = base_payment
+    elif loan_type == "Annuity": annuity = base_payment
+
+    if not current_balance > 1.0:
+        return pd.DataFrame()
+
+    n = MAX_MONTHS
+    dates = payment_dates(first, n)
+    rates, fees = _monthly_terms(terms_history_df, dates, base_rate, base_fee)
+    if loan_type == "Frame":
+        io = np.ones(n, dtype=bool)
+    elif io_from and io_to:
+        io = (dates >= np.datetime64(io_from, "D")) & (dates <= np.datetime64(io_to, "D"))
+    else:
+        io = np.zeros(n, dtype=bool)
+    extras = _monthly_extras(extra_payments_df, first, n)
+
+    recalc = np.zeros(n, dtype=bool)
+    if mode == 'date' and loan_type != "Frame":
+        recalc = np.abs(rates - np.concatenate(([base_rate], rates[:-1]))) > 0.001
+
+    boundary = recalc.copy()
+    boundary[0] = True
+    boundary[1:] |= (rates[1:] != rates[:-1]) | (fees[1:] != fees[:-1]) | (io[1:] != io[:-1])
+    for k in extras:
+        boundary[k] = True
+        if k + 1 < n:
+            boundary[k + 1] = True
+    seg_starts = np.flatnonzero(boundary)
+    seg_ends = np.append(seg_starts[1:], n)
+
+    parts: list[dict] = []
+    for s, e in zip(seg_starts.tolist(), seg_ends.tolist()):
+        if not current_balance > 1.0:
+            break
+        if recalc[s]:
+            new_payment = recalculate_payment(current_balance, rates[s], dates[s].astype(object))
+            if loan_type == "Serial": fixed_principal = new_payment
+            elif loan_type == "Annuity": annuity = new_payment
+
+        monthly_rate = (rates[s] / 100.0) / 12.0
+        fee = fees[s]
+        if s in extras:
+            extra = extras[s]
+            interest, principal, total, end = _single_month(
+                current_balance, monthly_rate, bool(io[s]), loan_type, fixed_principal, annuity, fee, extra
+            )
+            status = "Interest Only" if io[s] else "Payment"
+            if loan_type == "Frame" and extra > 0: status = "Extra Payment"
+            parts.append({
+                "idx": np.array([s]), "start": np.array([current_balance]), "interest": np.array([interest]),
+                "principal": np.array([principal]), "extra": np.array([extra]), "total": np.array([total]),
+                "end": np.array([end]), "status": status,
+            })
+            current_balance = end
+            continue
+
+        start, interest, principal, required = _regular_segment(
+            current_balance, monthly_rate, e - s, bool(io[s]), loan_type, fixed_principal, annuity
+        )
+        end = start - principal
+        parts.append({
+            "idx": np.arange(s, s + len(start)), "start": start, "interest": interest,
+            "principal": principal, "extra": np.zeros(len(start)), "total": required + fee,
+            "end": end, "status": "Interest Only" if io[s] else "Payment",
+        })
+        if len(start) < e - s:
+            break
+        current_balance = float(end[-1])
+
+    if not parts:
+        return pd.DataFrame()
+
+    idx = np.concatenate([p["idx"] for p in parts])
+    fee_col = fees[idx]
+    return pd.DataFrame({
+        "Month": idx + 1,
+        "Date": dates[idx].astype(object),
+        "Start Balance": np.concatenate([p["start"] for p in parts]),
+        "Interest": np.concatenate([p["interest"] for p in parts]),
+        "Rate %": rates[idx],
+        "Fee": fee_col,
+        "Principal": np.concatenate([p["principal"] for p in parts]),
+        "Extra / Adj": np.concatenate([p["extra"] for p in parts]),
+        "Admin Fee": fee_col,
+        "Total Payment": np.concatenate([p["total"] for p in parts]),
+        "End Balance": np.maximum(np.concatenate([p["end"] for p in parts]), 0.0),
+        "Status": np.concatenate([np.full(len(p["idx"]), p["status"], dtype=object) for p in parts]),
+    }, columns=SCHEDULE_COLUMNS)
+
+
+# ============================================================
+# 🧪 WHAT-IF SWEEP
+# ============================================================
+@dataclass
+class SweepResult:
+    """Outcome per scenario; arrays are shaped (extra plans, rates, payments)."""
+    rates: np.ndarray
+    payments: np.ndarray
+    first_date: dt.date
+    months: np.ndarray          # payment rows until payoff (MAX_MONTHS when never)
+    total_interest: np.ndarray
+    paid_off: np.ndarray        # bool
+    balances: np.ndarray | None = None  # (..., MAX_MONTHS) end balances when requested
+
+    def payoff_dates(self) -> np.ndarray:
+        """datetime64[D] of the last payment, NaT where the loan is not paid off."""
+        dates = payment_dates(self.first_date, MAX_MONTHS)
+        out = dates[np.clip(self.months - 1, 0, MAX_MONTHS - 1)]
+        return np.where(self.paid_off & (self.months > 0), out, np.datetime64("NaT"))
+
+
+def _extra_matrix(extra_plans, first: dt.date) -> np.ndarray:
+    """One row of monthly extras per plan: None, a recurring monthly amount, or an extras frame."""
+    plans = [None] if extra_plans is None else list(extra_plans)
+    out = np.zeros((len(plans), MAX_MONTHS))
+    for i, plan in enumerate(plans):
+        if plan is None:
+            continue
+        if isinstance(plan, pd.DataFrame):
+            for k, amount in _monthly_extras(plan, first, MAX_MONTHS).items():
+                out[i, k] = amount
+        else:
+            out[i, :] = float(plan)
+    return out
+
+
+def sweep_schedules(
+    balance, start_date, payment_day, rates, payments,
+    extra_plans=None, loan_type="Annuity", keep_balances=False
+) -> SweepResult:
+    """
+    Payoff month and total interest for every (extra plan, rate, payment)
+    combination in one batch, stepping all scenarios a month at a time.
+    Same rules as generate_schedule() in payment mode without terms changes
+    or an interest-only window; `payments` is the fixed principal for Serial loans.
+    """
+    first = first_payment_date(start_date, payment_day)
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    payments = np.atleast_1d(np.asarray(payments, dtype=float))
+    extras = _extra_matrix(extra_plans, first)
+    shape = (len(extras), len(rates), len(payments))
+
+    monthly_rate = (rates / 100.0 / 12.0)[None, :, None]
+    payment = payments[None, None, :]
+    bal = np.full(shape, float(balance))
+    months = np.zeros(shape, dtype=np.int64)
+    total_interest = np.zeros(shape)
+    done = np.zeros(shape, dtype=bool)
+    balances = np.zeros(shape + (MAX_MONTHS,)) if keep_balances else None
+
+    for k in range(MAX_MONTHS):
+        active = ~done & (bal > 1.0)
+        if not active.any():
+            if keep_balances:
+                balances[..., k:] = np.maximum(bal, 0.0)[..., None]
+            break
+        interest = bal * monthly_rate
+        if loan_type == "Serial":
+            principal = np.broadcast_to(payment, shape)
+        elif loan_type == "Frame":
+            principal = np.zeros(shape)
+        else:
+            principal = np.maximum(payment, interest) - interest
+        clamped = principal > bal
+        principal = np.minimum(principal, bal)
+        paid = np.minimum(principal + extras[:, k][:, None, None], bal)
+
+        bal = np.where(active, bal - paid, bal)
+        total_interest += np.where(active, interest, 0.0)
+        months += active
+        done |= active & clamped
+        if keep_balances:
+            balances[..., k] = np.maximum(bal, 0.0)
+
+    return SweepResult(
+        rates=rates, payments=payments, first_date=first, months=months,
+        total_interest=total_interest, paid_off=bal <= 1.0, balances=balances,
+    )
+
+
+# ============================================================
+# 🗃️ SCHEDULE CACHE
+# ============================================================
+def _day(value) -> str | None:
+    if value is None or (not isinstance(value, (str, dt.date)) and pd.isna(value)):
+        return None
+    return pd.Timestamp(value).date().isoformat()
+
+
+def _rows(df, columns: list[str]) -> tuple:
+    if df is None or df.empty:
+        return ()
+    return tuple(
+        tuple(_day(v) if c.endswith("_date") else float(v) for c, v in zip(columns, row))
+        for row in df[columns].itertuples(index=False, name=None)
+    )
+
+
+def schedule_fingerprint(
+    balance, rate, start_date, payment_day, mode,
+    loan_type="Annuity",
+    target_payment=None, target_date=None, admin_fee=0,
+    extra_payments_df=None, terms_history_df=None,
+    io_from=None, io_to=None
+) -> str:
+    """Hash of every generate_schedule() input; equal fingerprints give equal schedules."""
+    key = (
+        float(balance), float(rate), _day(start_date), int(payment_day), str(mode), str(loan_type),
+        None if target_payment is None else float(target_payment), _day(target_date), float(admin_fee),
+        _day(io_from), _day(io_to),
+        _rows(extra_payments_df, ["pay_date", "amount"]),
+        # Row order matters for same-day changes (the latest row wins)
+        _rows(terms_history_df, ["change_date", "interest_rate", "admin_fee"]),
+    )
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+class ScheduleCache:
+    """
+    LRU of generated schedules keyed by schedule_fingerprint(). Entries are
+    tagged with an owner (e.g. (user_id, loan_id)) so that writes to a loan's
+    extras or terms can drop its schedules explicitly.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._entries: OrderedDict[str, tuple[object, pd.DataFrame]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, owner=None, **kwargs) -> pd.DataFrame:
+        """generate_schedule(**kwargs), served from the cache when the inputs are unchanged."""
+        key = schedule_fingerprint(**kwargs)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hit[1].copy()
+            self.misses += 1
+
+        df = generate_schedule(**kwargs)
+        with self._lock:
+            self._entries[key] = (owner, df)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return df.copy()
+
+    def invalidate(self, owner) -> int:
+        """Drops every schedule stored for `owner`; returns how many were removed."""
+        with self._lock:
+            stale = [k for k, (o, _) in self._entries.items() if o == owner]
+            for k in stale:
+                del self._entries[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -185,7 +185,7 @@ def ensure_user_bootstrap(user_id: str, lang: str) -> None:
 def should_show_opening_balance(user_id: str) -> bool:
     if st.session_state.get("opening_balance_done"):
         return False
-    tx = load_data_db("transactions", user_id=user_id)
+    tx = load_data_db("transactions", user_id=user_id, columns=["id"], limit=1)
     return (tx is None) or tx.empty
 
 
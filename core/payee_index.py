@@ -0,0 +1,142 @@
+# core/payee_index.py
+from __future__ import annotations
+
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+_WORD_START_RE = re.compile(r"(?<=[\s\-/&.,(])\w")
+
+
+def _keys_of(name: str) -> list[str]:
+    """The lower-cased name and its suffix from each later word on."""
+    key = name.lower()
+    return [key] + [key[m.start():] for m in _WORD_START_RE.finditer(key)]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    names: list[str]  # slot -> name, append-only (shared by later snapshots)
+    keys: list[str]  # sorted
+    key_slots: np.ndarray  # slot of each key
+    score: np.ndarray  # -inf for payees no longer in the table
+    alive: np.ndarray
+
+
+# ============================================================
+# 🔎 PAYEE PREFIX INDEX
+# ============================================================
+class PayeeIndex:
+    """
+    Payee suggestions for one user. Every payee is keyed by its lower-cased name
+    and by each later word ("coop extra" is also found under "extra"); the keys
+    are kept sorted so a prefix is a bisect range. Within a range, the most used
+    payees come first, ties going to the most recently used.
+
+    refresh() applies new usage counts: scores are recomputed, keys are only
+    inserted for payees the index has not seen. The index is shared between
+    sessions, so readers use one immutable _Snapshot that refresh() replaces
+    with a single assignment.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._lock = threading.Lock()  # serializes refresh()
+        self._slots: dict[str, int] = {}
+        self._snap = _Snapshot([], [], np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=bool))
+
+    @classmethod
+    def build(cls, payees: pd.DataFrame, version=None) -> "PayeeIndex":
+        return cls().refresh(payees, version)
+
+    @property
+    def names(self) -> list[str]:
+        """All current payees, best first."""
+        snap = self._snap
+        slots = np.flatnonzero(snap.alive)
+        return [snap.names[s] for s in slots[np.argsort(-snap.score[slots], kind="stable")]]
+
+    def __len__(self) -> int:
+        return int(self._snap.alive.sum())
+
+    def refresh(self, payees: pd.DataFrame, version=None) -> "PayeeIndex":
+        """`payees`: name, use_count, last_used (as returned by get_payee_usage())."""
+        df = payees.dropna(subset=["name"])
+        names = df["name"].astype(str).str.strip()
+        keep = (names != "").to_numpy() & ~names.duplicated().to_numpy()
+        names = names[keep].tolist()
+        counts = pd.to_numeric(df["use_count"], errors="coerce").fillna(0).to_numpy(dtype=float)[keep]
+        days = pd.to_datetime(df["last_used"], errors="coerce").to_numpy(dtype="datetime64[D]")[keep]
+        # use_count ranks first; the day number (< 10^6 until year 4707) breaks ties
+        recency = np.where(np.isnat(days), 0, days.astype(np.int64) + 1) / 1e6
+        score = counts + recency
+
+        with self._lock:
+            snap = self._snap
+            new = [n for n in names if n not in self._slots]
+            keys, key_slots = self._add(snap, new) if new else (snap.keys, snap.key_slots)
+            slots = np.fromiter((self._slots[n] for n in names), dtype=np.int64, count=len(names))
+            n_slots = len(snap.names)
+            scores = np.full(n_slots, -np.inf)
+            scores[slots] = score
+            alive = np.zeros(n_slots, dtype=bool)
+            alive[slots] = True
+            self._snap = _Snapshot(snap.names, keys, key_slots, scores, alive)
+            self.version = version
+        return self
+
+    def _add(self, snap: _Snapshot, names: list[str]) -> tuple[list[str], np.ndarray]:
+        """Registers new payees; returns new (keys, key_slots), leaving `snap`'s untouched."""
+        first = len(snap.names)
+        snap.names.extend(names)  # append-only: slots of older snapshots stay valid
+        self._slots.update((n, first + i) for i, n in enumerate(names))
+        entries = [(k, first + i) for i, n in enumerate(names) for k in _keys_of(n)]
+        if len(entries) > len(snap.keys) // 8:
+            # Bulk load (or a large batch): one sort beats many list insertions
+            entries.extend(zip(snap.keys, snap.key_slots.tolist()))
+            entries.sort()
+            keys = [k for k, _ in entries]
+            return keys, np.fromiter((s for _, s in entries), dtype=np.int64, count=len(entries))
+        keys, key_slots = list(snap.keys), snap.key_slots
+        for key, slot in entries:
+            pos = bisect_left(keys, key)
+            keys.insert(pos, key)
+            key_slots = np.insert(key_slots, pos, slot)
+        return keys, key_slots
+
+    def suggest(self, prefix: str, limit: int = 4) -> list[str]:
+        """Up to `limit` payees with a word starting with `prefix`, best first; an exact match is left out."""
+        query = (prefix or "").strip().lower()
+        if not query:
+            return self.names[:limit]
+        snap = self._snap
+        lo = bisect_left(snap.keys, query)
+        hi = bisect_left(snap.keys, query + "\U0010ffff", lo)
+        if lo == hi:
+            return []
+
+        # A payee owns several keys when more than one of its words match, and the
+        # exact match is dropped, so rank a few spare keys before de-duplicating
+        slots = snap.key_slots[lo:hi]
+        spare = limit * 2 + 2
+        if len(slots) > spare:
+            top = slots[np.argpartition(-snap.score[slots], spare - 1)[:spare]]
+            out = self._ranked(snap, top, query, limit)
+            if len(out) == limit:
+                return out
+        return self._ranked(snap, slots, query, limit)
+
+    @staticmethod
+    def _ranked(snap: _Snapshot, slots: np.ndarray, query: str, limit: int) -> list[str]:
+        out: list[str] = []
+        for slot in slots[np.argsort(-snap.score[slots], kind="stable")]:
+            name = snap.names[slot]
+            if snap.score[slot] == -np.inf or len(out) == limit:
+                break
+            if name not in out and name.lower() != query:
+                out.append(name)
+        return out
@@ -0,0 +1,203 @@
+# core/repository.py
+from __future__ import annotations
+
+import pandas as pd
+import streamlit as st
+
+from core.db_operations import (
+    USER_SCOPED_TABLES, data_version, get_budget_actuals, get_monthly_rollup, get_payee_usage, load_data_db,
+)
+from core.forecast import SeasonalModel
+from core.ledger import CATEGORICAL_COLUMNS, prepare_ledger
+from core.payee_index import PayeeIndex
+
+
+# ============================================================
+# 🔐 SESSION USER
+# ============================================================
+def current_user_id() -> str:
+    """The logged-in username (used as user_id across tables), 'default' when not set."""
+    uid = st.session_state.get("username")
+    uid = str(uid).strip() if uid is not None else ""
+    return uid or "default"
+
+
+# ============================================================
+# 🗄️ VERSION-STAMPED CACHE
+# ============================================================
+# Keyed by (user_id, table, data_version, query). A committed write bumps only
+# the writer's version, so other users' entries stay valid and no TTL is needed;
+# superseded versions simply age out of the LRU.
+@st.cache_data(max_entries=512, show_spinner=False)
+def _cached_load(user_id: str, table_name: str, version: tuple[int, int], query: tuple) -> pd.DataFrame:
+    kwargs = dict(query)
+    if table_name in USER_SCOPED_TABLES:
+        kwargs["user_id"] = user_id
+    return load_data_db(table_name, **kwargs)
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _cached_rollup(user_id: str, version: tuple[int, int], query: tuple) -> pd.DataFrame:
+    return get_monthly_rollup(user_id, **dict(query))
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _cached_budget_actuals(user_id: str, versions: tuple, query: tuple) -> pd.DataFrame:
+    return get_budget_actuals(user_id, **dict(query))
+
+
+# One live index per user, shared rather than copied, and refreshed in place
+# when the payees version moves (see UserRepository.payee_index)
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _cached_payee_index(user_id: str) -> PayeeIndex:
+    return PayeeIndex()
+
+
+# ============================================================
+# 📦 USER-SCOPED READS
+# ============================================================
+class UserRepository:
+    """
+    Read access bound to one user: every per-user table is filtered by
+    `user_id` in SQL, so page cost follows this user's data, not all tenants.
+    """
+
+    def __init__(self, user_id: str):
+        user_id = str(user_id or "").strip()
+        if not user_id or user_id == "bypass":
+            raise ValueError("UserRepository needs a concrete user_id.")
+        self.user_id = user_id
+
+    def load(self, table_name: str, **kwargs) -> pd.DataFrame:
+        """load_data_db() with the bound user; accepts the same projection/filter arguments."""
+        if "user_id" in kwargs:
+            raise TypeError("user_id is bound by the repository; do not pass it.")
+        if table_name in USER_SCOPED_TABLES:
+            kwargs["user_id"] = self.user_id
+        return load_data_db(table_name, **kwargs)
+
+    def cached(self, table_name: str, **kwargs) -> pd.DataFrame:
+        """Like load(), served from the version-stamped cache."""
+        if "user_id" in kwargs:
+            raise TypeError("user_id is bound by the repository; do not pass it.")
+        owner = self.user_id if table_name in USER_SCOPED_TABLES else None
+        query = tuple(sorted(kwargs.items()))
+        return _cached_load(self.user_id, table_name, data_version(owner, table_name), query)
+
+    def transactions(self, **kwargs) -> pd.DataFrame:
+        return self.load("transactions", **kwargs)
+
+    def transactions_typed(self, **kwargs) -> pd.DataFrame:
+        """transactions() parsed by prepare_ledger(): datetime64 / float64 / category columns."""
+        df = self.transactions(**kwargs)
+        if df is None or df.empty:
+            df = pd.DataFrame(columns=kwargs.get("columns") or _LEDGER_COLUMNS)
+        return prepare_ledger(df)
+
+    def accounts(self, **kwargs) -> pd.DataFrame:
+        return self.load("accounts", **kwargs)
+
+    def categories(self, **kwargs) -> pd.DataFrame:
+        return self.load("categories", **kwargs)
+
+    def monthly_rollup(self, month_from: str | None = None, month_to: str | None = None,
+                       types: list[str] | None = None) -> pd.DataFrame:
+        """
+        Per (month, account, type, category) sums and counts from the
+        monthly_rollup table, cached until the user's transactions change.
+        """
+        query = (("month_from", month_from), ("month_to", month_to), ("types", tuple(types) if types else None))
+        version = data_version(self.user_id, "transactions")
+        return _cached_rollup(self.user_id, version, query)
+
+    def budget_actuals(self, month_from: str, month_to: str | None = None,
+                       categories: list[str] | None = None,
+                       exclude_categories: list[str] | None = None) -> pd.DataFrame:
+        """get_budget_actuals() for this user, cached until transactions or categories change."""
+        query = (
+            ("month_from", month_from), ("month_to", month_to),
+            ("categories", tuple(categories) if categories else None),
+            ("exclude_categories", tuple(exclude_categories) if exclude_categories else None),
+        )
+        versions = (data_version(self.user_id, "transactions"), data_version(self.user_id, "categories"))
+        return _cached_budget_actuals(self.user_id, versions, query)
+
+    def payee_index(self) -> PayeeIndex:
+        """Prefix index over the user's payees by usage, refreshed when the payees table changes."""
+        index = _cached_payee_index(self.user_id)
+        version = data_version(self.user_id, "payees")
+        if index.version != version:
+            index.refresh(get_payee_usage(self.user_id), version)
+        return index
+
+
+def get_repository(user_id: str | None = None) -> UserRepository:
+    """Repository for `user_id`, or for the session user when omitted."""
+    return UserRepository(user_id or current_user_id())
+
+
+# ============================================================
+# 📒 SHARED LEDGER FRAME
+# ============================================================
+# One parsed transactions frame per user, kept in the session and reused for as
+# long as the user's transactions version is unchanged. Every component that
+# needs the ledger reads it from here, so a rerun fetches it at most once.
+_LEDGER_KEY = "_ledger_frames"
+_FETCHES_KEY = "_ledger_fetches"
+_LEDGER_COLUMNS = ["id", "date", "type", "account", "category", "payee", "amount", "description", "user_id"]
+
+
+def begin_run() -> None:
+    """Resets the per-run fetch counter; call once at the top of the script run."""
+    st.session_state[_FETCHES_KEY] = 0
+
+
+def ledger_fetch_count() -> int:
+    """DB fetches of the ledger since begin_run() (0 when served from the session)."""
+    return int(st.session_state.get(_FETCHES_KEY, 0))
+
+
+def get_ledger(user_id: str | None = None) -> pd.DataFrame:
+    """
+    The user's transactions, typed by prepare_ledger() (incl. `signed_amount`).
+    The cached frame is shared: callers get a shallow copy whose label columns
+    are deep copies, so assigning, filling or adding columns never reaches the
+    cache. Label columns are categorical; convert with astype("object") before
+    filling them with labels they do not contain yet.
+    """
+    uid = user_id or current_user_id()
+    frames = st.session_state.setdefault(_LEDGER_KEY, {})
+    version = data_version(uid, "transactions")
+    hit = frames.get(uid)
+    if hit is None or hit[0] != version:
+        frames[uid] = hit = (version, UserRepository(uid).transactions_typed())
+        st.session_state[_FETCHES_KEY] = fetches = ledger_fetch_count() + 1
+        if fetches > 1:
+            print(f"⚠️ Ledger for '{uid}' fetched {fetches} times in one run.")
+    out = hit[1].copy(deep=False)
+    for col in CATEGORICAL_COLUMNS:
+        if col in out.columns:
+            out[col] = out[col].copy(deep=True)
+    return out
+
+
+# ============================================================
+# 📈 SEASONAL MODELS
+# ============================================================
+_MODELS_KEY = "_seasonal_models"
+
+
+def get_seasonal_model(name: str, build_flows, user_id: str | None = None) -> SeasonalModel:
+    """
+    SeasonalModel `name` of the user, kept in the session with its monthly
+    aggregate. `build_flows()` runs only when the transactions version
+    changes; if it just appended months, the model is updated, not refitted.
+    """
+    uid = user_id or current_user_id()
+    models = st.session_state.setdefault(_MODELS_KEY, {})
+    version = data_version(uid, "transactions")
+    hit = models.get((uid, name))
+    if hit is None or hit[0] != version:
+        model = SeasonalModel.refresh(hit[1] if hit else None, build_flows())
+        models[(uid, name)] = hit = (version, model)
+    return hit[1]
@@ -122,6 +122,8 @@ def main() -> None:
     )
 
     # 6. Execute Unified Dashboard
+    from core.repository import begin_run
+    begin_run()
     from components.dashboard_unified import render_dashboard_unified
     render_dashboard_unified()
 
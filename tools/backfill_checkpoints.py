@@ -0,0 +1,42 @@
+# tools/backfill_checkpoints.py
+"""
+Builds monthly balance checkpoints for existing ledgers (historical backfill).
+
+Usage (from the project root):
+    python -m tools.backfill_checkpoints alice bob   # selected users
+    python -m tools.backfill_checkpoints --all       # every user with transactions
+"""
+from __future__ import annotations
+
+import sys
+
+from core.db_operations import backfill_checkpoints, execute_query_db
+
+
+def main(args: list[str]) -> int:
+    if not args:
+        print(__doc__)
+        return 1
+
+    if args == ["--all"]:
+        rows = execute_query_db(
+            "SELECT DISTINCT user_id FROM transactions WHERE user_id IS NOT NULL", fetch_result=True
+        )
+        users = [r["user_id"] for r in rows]
+    else:
+        users = args
+
+    failed = []
+    for uid in users:
+        try:
+            n_accounts = backfill_checkpoints(uid)
+            print(f"  {uid}: {n_accounts} account(s)")
+        except Exception as e:
+            print(f"❌ {uid}: {e}")
+            failed.append(uid)
+    print(f"✅ Backfilled checkpoints for {len(users) - len(failed)} user(s).")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,39 @@
+# tools/backfill_transfer_flags.py
+"""
+Sets transactions.is_internal_transfer on rows written before the flag existed,
+using each owner's transfer rules. Rows that already have a flag are left alone
+unless --recompute is given. Analytics classify unflagged rows on the fly, so the
+app works before this has run; it only gets faster afterwards.
+
+Usage (from the project root):
+    python -m tools.backfill_transfer_flags alice bob     # selected users
+    python -m tools.backfill_transfer_flags --all         # every user
+    python -m tools.backfill_transfer_flags --all --recompute
+"""
+from __future__ import annotations
+
+import sys
+
+from core.db_operations import reclassify_transfers
+
+
+def main(args: list[str]) -> int:
+    only_missing = "--recompute" not in args
+    users = [a for a in args if not a.startswith("--")]
+    if not users and "--all" not in args:
+        print(__doc__)
+        return 1
+
+    changed = 0
+    for user_id in users or [None]:
+        n = reclassify_transfers(user_id, only_missing=only_missing)
+        if n is None:
+            print(f"❌ Failed: {user_id or 'all users'}")
+            return 1
+        changed += n
+    print(f"✅ Flagged {changed} transaction(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,149 @@
+# tools/bench_editor_save.py
+"""
+Benchmark: saving the transaction editor the old way (save_data_db() for every
+row of the view, one DELETE per removed id) vs the diff-based batch
+(diff_frames() + apply_transaction_changes()). Counts SQL statements sent to
+the database (all, and writes to transactions; the rest maintain the
+materialized views) and checks that the batch leaves the rows as edited.
+
+Writes to the configured database under a scratch user and removes its rows
+afterwards.
+
+Usage (from the project root):
+    python -m tools.bench_editor_save          # 500-row view
+    python -m tools.bench_editor_save 2000     # custom view size
+"""
+from __future__ import annotations
+
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+from core.db_operations import (
+    add_transactions_batch, apply_transaction_changes, ensure_indexes, execute_query_db, get_engine,
+    load_transactions_page, save_data_db,
+)
+from core.frame_diff import diff_frames
+
+BENCH_USER = "__bench_editor_save__"
+_TX_WRITE = re.compile(r"^\s*(?:UPDATE|DELETE\s+FROM|INSERT\s+INTO)\s+transactions\b", re.IGNORECASE)
+
+
+class StatementCounter:
+    """All statements sent (an executemany counts once), and those writing transactions."""
+
+    def __init__(self, engine):
+        self.engine, self.count, self.tx_writes = engine, 0, 0
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.tx_writes += bool(_TX_WRITE.match(statement))
+
+    def __enter__(self):
+        self.count = self.tx_writes = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _seed(n_rows: int) -> None:
+    execute_query_db("DELETE FROM transactions WHERE user_id = :uid", {"uid": BENCH_USER})
+    rng = np.random.default_rng(3)
+    dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n_rows), unit="D")
+    add_transactions_batch([
+        {"user_id": BENCH_USER, "date": d.strftime("%Y-%m-%d"), "type": "Expense", "account": "Brukskonto",
+         "category": f"Category {i % 12}", "payee": f"Payee {i % 40}", "amount": float(a), "description": None}
+        for i, (d, a) in enumerate(zip(dates, np.round(rng.uniform(10, 2_000, n_rows), 2)))
+    ])
+
+
+def _view(n_rows: int) -> pd.DataFrame:
+    page, _ = load_transactions_page(BENCH_USER, limit=n_rows)
+    page["date"] = pd.to_datetime(page["date"], errors="coerce")
+    return page
+
+
+def _edits(view: pd.DataFrame, scenario: str) -> pd.DataFrame:
+    edited = view.copy()
+    edited.loc[0, "amount"] = edited.loc[0, "amount"] + 1.0
+    if scenario == "mixed":
+        edited.loc[1, "category"] = "Transfer"
+        edited = edited.drop(index=[2, 3, 4])
+        new = {c: None for c in edited.columns}
+        new.update(id=np.nan, date=pd.Timestamp("2025-06-01"), type="Expense", account="Brukskonto",
+                   category="Food", payee="New payee", amount=99.0)
+        edited = pd.concat([edited, pd.DataFrame([new])], ignore_index=True)
+    return edited
+
+
+def legacy_save(view: pd.DataFrame, edited: pd.DataFrame) -> None:
+    """
+    The editor's original save loop, kept verbatim apart from the Streamlit calls
+    and dates passed as ISO strings (sqlite3 cannot bind pandas Timestamps).
+    """
+    orig_ids = set(view.get("id", pd.Series(dtype=float)).dropna().unique())
+    new_ids = set(edited.get("id", pd.Series(dtype=float)).dropna().unique())
+    for d_id in orig_ids - new_ids:
+        execute_query_db(
+            "DELETE FROM transactions WHERE id = :id AND user_id = :uid",
+            {"id": int(d_id), "uid": BENCH_USER},
+        )
+    for rec in edited.to_dict(orient="records"):
+        for k, v in list(rec.items()):
+            if v is pd.NaT or pd.isna(v):
+                rec[k] = None
+        if rec.get("date") is not None:
+            rec["date"] = rec["date"].strftime("%Y-%m-%d")
+        rec["user_id"] = BENCH_USER
+        save_data_db("transactions", rec)
+
+
+def _check(edited: pd.DataFrame) -> bool:
+    now = _view(len(edited) + 10)
+    cols = ["category", "payee", "amount"]
+    a = edited.dropna(subset=["id"]).set_index("id")[cols].sort_index()
+    b = now.dropna(subset=["id"]).set_index("id").loc[lambda d: d.index.isin(a.index), cols].sort_index()
+    inserted = len(now) - len(b)
+    return a.index.equals(b.index) and a.astype(str).equals(b.astype(str)) and inserted == edited["id"].isna().sum()
+
+
+def run(n_rows: int) -> None:
+    if not ensure_indexes():
+        return
+    engine = get_engine()
+    print(f"{'scenario':>8} | {'path':>6} | {'statements':>10} | {'tx writes':>9} | {'time (ms)':>9}")
+    print("-" * 57)
+    try:
+        for scenario in ("one cell", "mixed"):
+            _seed(n_rows)
+            view = _view(n_rows)
+            edited = _edits(view, scenario)
+            with StatementCounter(engine) as old:
+                start = time.perf_counter()
+                legacy_save(view, edited)
+                t_old = time.perf_counter() - start
+
+            _seed(n_rows)
+            view = _view(n_rows)
+            edited = _edits(view, scenario)
+            with StatementCounter(engine) as new:
+                start = time.perf_counter()
+                changes = diff_frames(view, edited, key="id")
+                apply_transaction_changes(BENCH_USER, changes.inserts, changes.updates, changes.deletes)
+                t_new = time.perf_counter() - start
+
+            print(f"{scenario:>8} | {'old':>6} | {old.count:>10} | {old.tx_writes:>9} | {t_old * 1e3:>9.1f}")
+            print(f"{scenario:>8} | {'diff':>6} | {new.count:>10} | {new.tx_writes:>9} | {t_new * 1e3:>9.1f}"
+                  f"  ({'rows as edited' if _check(edited) else 'MISMATCH'})")
+    finally:
+        execute_query_db("DELETE FROM transactions WHERE user_id = :uid", {"uid": BENCH_USER})
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,65 @@
+# tools/bench_ledger.py
+"""
+Benchmark: per-row `apply(_get_signed_amount, axis=1)` vs the vectorized ledger engine.
+
+Usage (from the project root):
+    python -m tools.bench_ledger                 # 10k / 100k / 1M rows
+    python -m tools.bench_ledger 50000 200000    # custom sizes
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.ledger import signed_amounts
+
+TYPES = ["Expense", "Income", "expense", "Transfer", "Opening Balance", "refund", "Payment", None]
+
+
+def make_ledger(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2500, n_rows), unit="D"),
+        "type": rng.choice(np.array(TYPES, dtype=object), n_rows),
+        "account": rng.choice(["Brukskonto", "Sparekonto", "Norwegian Visa", "Huslån"], n_rows),
+        "amount": np.round(rng.uniform(-5000, 50000, n_rows), 2),
+    })
+
+
+def _legacy_signed_amount(row) -> float:
+    """Copy of the old per-row helper, kept here only as the benchmark baseline."""
+    try:
+        amt = float(row.get("amount", 0) or 0)
+    except Exception:
+        amt = 0.0
+    t = str(row.get("type", "")).strip().lower()
+    if t in ["income", "deposit", "refund", "opening balance"]:
+        return amt
+    if t in ["expense", "transfer", "withdrawal", "payment"]:
+        return -abs(amt)
+    return 0.0
+
+
+def _timed(fn, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+
+def run(sizes: list[int]) -> None:
+    print(f"{'rows':>10} | {'apply (s)':>10} | {'vectorized (s)':>14} | {'speedup':>8}")
+    print("-" * 52)
+    for n in sizes:
+        df = make_ledger(n)
+        t_old, old = _timed(lambda d: d.apply(_legacy_signed_amount, axis=1), df)
+        t_new, new = _timed(signed_amounts, df)
+        if not np.allclose(old.to_numpy(dtype=float), new.to_numpy(), equal_nan=True):
+            raise AssertionError(f"Results differ at {n} rows")
+        print(f"{n:>10,} | {t_old:>10.3f} | {t_new:>14.4f} | {t_old / max(t_new, 1e-9):>7.0f}x")
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,67 @@
+# tools/bench_ledger_memory.py
+"""
+Benchmark: memory of a raw transactions frame (as returned by get_dataframe_db)
+vs the typed frame from prepare_ledger() (datetime64 / float64 / category).
+
+Usage (from the project root):
+    python -m tools.bench_ledger_memory            # 1M rows
+    python -m tools.bench_ledger_memory 250000     # custom size
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.ledger import prepare_ledger
+
+TYPES = ["Expense", "Income", "Transfer", "Opening Balance", "Refund"]
+ACCOUNTS = ["Brukskonto", "Sparekonto", "Norwegian Visa", "SAS Mastercard", "Huslån"]
+CATEGORIES = [f"Category {i}" for i in range(60)]
+PAYEES = [f"Payee {i}" for i in range(2_000)]
+
+
+def make_raw_ledger(n_rows: int, seed: int = 7) -> pd.DataFrame:
+    """Object-dtype frame shaped like a DB read: ISO date strings, text labels."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2018-01-01") + pd.to_timedelta(rng.integers(0, 3000, n_rows), unit="D")
+    return pd.DataFrame({
+        "id": np.arange(1, n_rows + 1),
+        "date": dates.strftime("%Y-%m-%d").astype(object),
+        "type": rng.choice(np.array(TYPES, dtype=object), n_rows),
+        "account": rng.choice(np.array(ACCOUNTS, dtype=object), n_rows),
+        "category": rng.choice(np.array(CATEGORIES, dtype=object), n_rows),
+        "payee": rng.choice(np.array(PAYEES, dtype=object), n_rows),
+        "amount": np.round(rng.uniform(1, 20_000, n_rows), 2).astype(object),
+        "description": np.full(n_rows, None, dtype=object),
+        "user_id": np.full(n_rows, "default", dtype=object),
+    })
+
+
+def _mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def run(n_rows: int) -> None:
+    raw = make_raw_ledger(n_rows)
+    start = time.perf_counter()
+    typed = prepare_ledger(raw)
+    elapsed = time.perf_counter() - start
+
+    print(f"rows: {n_rows:,}  (prepare_ledger: {elapsed:.2f}s)")
+    print(f"{'column':>14} | {'raw (MB)':>9} | {'typed (MB)':>10} | dtype")
+    print("-" * 56)
+    raw_cols = raw.memory_usage(deep=True, index=False)
+    typed_cols = typed.memory_usage(deep=True, index=False)
+    for col in typed.columns:
+        before = raw_cols.get(col, 0) / 1024 ** 2
+        print(f"{col:>14} | {before:>9.1f} | {typed_cols[col] / 1024 ** 2:>10.1f} | {typed[col].dtype}")
+    raw_mb, typed_mb = _mb(raw), _mb(typed)
+    print("-" * 56)
+    print(f"{'total':>14} | {raw_mb:>9.1f} | {typed_mb:>10.1f} | {raw_mb / typed_mb:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,70 @@
+# tools/bench_loan_payments.py
+"""
+Benchmark: writing generated loan payments one add_record_db() call per row
+(the old dialog path) vs a single add_transactions_batch() call, plus a re-run
+to show that import keys make the batch idempotent.
+
+Writes to the configured database under a scratch user and removes its rows
+afterwards.
+
+Usage (from the project root):
+    python -m tools.bench_loan_payments          # 36 months
+    python -m tools.bench_loan_payments 12       # custom months
+"""
+from __future__ import annotations
+
+import datetime as dt
+import sys
+import time
+
+from components.loan_calculator import _loan_payment_rows
+from core.db_operations import add_record_db, add_transactions_batch, ensure_indexes, execute_query_db
+from core.loan_math import generate_schedule
+
+BENCH_USER = "__bench_loan_payments__"
+LOAN = {
+    "id": 999_999, "name": "Bench Loan", "balance": 2_500_000.0, "pay_from_account": "Brukskonto",
+}
+
+
+def _cleanup() -> None:
+    execute_query_db("DELETE FROM transactions WHERE user_id = :uid", {"uid": BENCH_USER})
+
+
+def run(months: int) -> None:
+    if not ensure_indexes():
+        return
+    sched = generate_schedule(
+        LOAN["balance"], 5.49, dt.date.today(), 20, "payment", target_payment=15_000.0, admin_fee=50.0
+    ).head(months)
+    rows = _loan_payment_rows(LOAN, sched, BENCH_USER, opening_date=dt.date.today())
+    print(f"{months} months -> {len(rows)} rows")
+
+    _cleanup()
+    try:
+        start = time.perf_counter()
+        for r in rows:
+            add_record_db("transactions", {k: v for k, v in r.items() if k != "import_key"})
+        t_rows = time.perf_counter() - start
+        _cleanup()
+
+        start = time.perf_counter()
+        inserted = add_transactions_batch(rows)
+        t_batch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        again = add_transactions_batch(rows)
+        t_again = time.perf_counter() - start
+    finally:
+        _cleanup()
+
+    print(f"{'path':>24} | {'time (ms)':>9} | rows written")
+    print("-" * 50)
+    print(f"{'add_record_db per row':>24} | {t_rows * 1e3:>9.1f} | {len(rows)}")
+    print(f"{'add_transactions_batch':>24} | {t_batch * 1e3:>9.1f} | {inserted}")
+    print(f"{'batch re-run':>24} | {t_again * 1e3:>9.1f} | {again}")
+    print(f"speedup: {t_rows / t_batch:.1f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 36)
@@ -0,0 +1,47 @@
+# tools/bench_monte_carlo.py
+"""
+Benchmark: Monte Carlo cash-flow simulation (core.forecast.simulate_cash_flow)
+on synthetic history — 24 months × 40 categories.
+
+Usage (from the project root):
+    python -m tools.bench_monte_carlo                  # 10k paths × 24 months
+    python -m tools.bench_monte_carlo 50000 36         # paths, horizon
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.forecast import simulate_cash_flow
+
+
+def make_flows(n_months: int = 24, n_categories: int = 40, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    mean = np.r_[rng.uniform(20_000, 45_000, 2), -rng.uniform(200, 3_000, n_categories - 2)]
+    noise = rng.normal(0, np.abs(mean) * 0.3, size=(n_months, n_categories))
+    return pd.DataFrame(
+        mean + noise,
+        index=pd.period_range(end="2025-12", periods=n_months, freq="M", name="month"),
+        columns=[f"Category {i}" for i in range(n_categories)],
+    )
+
+
+def run(n_paths: int, horizon: int) -> None:
+    flows = make_flows()
+    print(f"history: {flows.shape[0]} months × {flows.shape[1]} categories; {n_paths:,} paths × {horizon} months")
+    for method in ("bootstrap", "normal"):
+        start = time.perf_counter()
+        sim = simulate_cash_flow(flows, 10_000.0, horizon=horizon, n_paths=n_paths, method=method)
+        elapsed = time.perf_counter() - start
+        last = sim.iloc[-1]
+        print(f"{method:>10}: {elapsed * 1e3:7.1f} ms | final P10/P50/P90 "
+              f"{last['P10']:,.0f} / {last['P50']:,.0f} / {last['P90']:,.0f} | "
+              f"P(overdraft by end) {last['p_overdraft_by']:.1%}")
+
+
+if __name__ == "__main__":
+    cli = [int(a) for a in sys.argv[1:]]
+    run(cli[0] if cli else 10_000, cli[1] if len(cli) > 1 else 24)
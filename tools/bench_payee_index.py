@@ -0,0 +1,90 @@
+# tools/bench_payee_index.py
+"""
+Benchmark: payee suggestions from PayeeIndex (bisect on sorted keys, ranked by
+use count and recency) vs the original substring scan over the full payee list,
+for every prefix of a few typed names. Checks that each suggestion starts a
+word of the payee and that results come best-ranked first, and times building
+the index and refreshing it in place after a save.
+
+Runs in memory on synthetic payees; no database access.
+
+Usage (from the project root):
+    python -m tools.bench_payee_index            # 50k distinct payees
+    python -m tools.bench_payee_index 200000     # custom size
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.payee_index import PayeeIndex
+
+WORDS = ["Rema", "Kiwi", "Coop", "Extra", "Meny", "Bunnpris", "Joker", "Spar", "Circle", "Shell", "Esso", "Vy",
+         "Ruter", "Apotek", "Vinmonopolet", "Elkjøp", "Power", "Clas", "Ohlson", "Jernia", "Europris", "Normal"]
+TYPED = ["Rema 1", "Coop Extra", "kiwi", "Apotek 1", "zzz"]
+
+
+def synthetic_payees(n: int, seed: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    first, second = rng.choice(WORDS, n), rng.choice(WORDS, n)
+    names = pd.Series([f"{a} {b} {i}" for i, (a, b) in enumerate(zip(first, second))])
+    return pd.DataFrame({
+        "name": names,
+        "use_count": rng.zipf(1.6, n).clip(max=5_000),
+        "last_used": pd.Timestamp("2025-12-31") - pd.to_timedelta(rng.integers(0, 2_000, n), unit="D"),
+    })
+
+
+def legacy_suggest(all_payees: list[str], payee_val: str) -> list[str]:
+    """The dialog's original filter: substring test over every payee on each keystroke."""
+    matches = [p for p in all_payees if payee_val.lower() in p.lower() and p.lower() != payee_val.lower()]
+    return matches[:4]
+
+
+def _is_word_prefix(name: str, prefix: str) -> bool:
+    name, prefix = name.lower(), prefix.lower()
+    return name.startswith(prefix) or any(name[i + 1:].startswith(prefix) for i, c in enumerate(name) if not c.isalnum())
+
+
+def run(n: int) -> int:
+    payees = synthetic_payees(n)
+    start = time.perf_counter()
+    index = PayeeIndex.build(payees)
+    t_build = time.perf_counter() - start
+    all_payees = sorted(payees["name"])
+
+    # A save: one payee used again, one new payee
+    payees.loc[0, "use_count"] += 1
+    payees.loc[len(payees)] = ["Brand New Payee", 1, pd.Timestamp("2026-01-01")]
+    start = time.perf_counter()
+    index.refresh(payees)
+    t_refresh = time.perf_counter() - start
+    usage = dict(zip(payees["name"], zip(payees["use_count"], payees["last_used"])))
+    print(f"{n:,} payees, index built in {t_build * 1e3:.0f} ms, refreshed after a save in {t_refresh * 1e3:.0f} ms")
+
+    failures, worst_old, worst_new = 0, 0.0, 0.0
+    for typed in TYPED:
+        for end in range(1, len(typed) + 1):
+            prefix = typed[:end]
+            start = time.perf_counter()
+            legacy_suggest(all_payees, prefix)
+            worst_old = max(worst_old, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            got = index.suggest(prefix)
+            worst_new = max(worst_new, time.perf_counter() - start)
+
+            ranks = [usage[g] for g in got]
+            if not all(_is_word_prefix(g, prefix.strip()) for g in got) or ranks != sorted(ranks, reverse=True):
+                failures += 1
+                print(f"bad suggestions for {prefix!r}: {got}")
+
+    print(f"worst keystroke: substring scan {worst_old * 1e3:.2f} ms, index {worst_new * 1e3:.3f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
@@ -0,0 +1,112 @@
+# tools/bench_search.py
+"""
+Benchmark: transaction search through the index (pg_trgm on Postgres, FTS5
+trigram on SQLite) vs the LIKE scan it replaces. For each term, checks that
+both find the same rows (transactions_summary() count and totals) and times
+search_transactions() (ranked top 50) and the editor's first page.
+
+The rows are spread over several tenants; only the first one is searched, so
+the timings include whatever the index collects for the others.
+
+Writes random transactions to the configured database under scratch users
+and removes them afterwards.
+
+Usage (from the project root):
+    python -m tools.bench_search              # 200k rows over 20 tenants
+    python -m tools.bench_search 1000000 50   # custom ledger size and tenant count
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import core.db_operations as db
+from core.db_operations import (
+    add_transactions_batch, ensure_indexes, execute_query_db, load_transactions_page, search_transactions,
+    transactions_summary,
+)
+
+BENCH_USER = "__bench_search__"
+OTHER_USER = "__other_{}__"  # no trigram in common with BENCH_USER, like real usernames
+PAYEES = ["Rema 1000", "Kiwi", "Coop Extra", "Meny", "Ruter", "Vy", "Spotify", "Netflix", "Circle K", "Shell",
+          "Elkjøp", "Power", "IKEA", "Apotek 1", "Vinmonopolet", "Oslo Kommune", "Telenor", "Fjordkraft"]
+CATEGORIES = ["Groceries", "Transport", "Subscriptions", "Fuel", "Electronics", "Home", "Health", "Utilities"]
+TERMS = ["rema", "kiwi", "coop ex", "netflix", "ikea", "telenor", "1000", "groceries", "kiwi 42", "ref 1234", "xyzzy", "k"]
+
+
+def _users(n_tenants: int) -> list[str]:
+    return [BENCH_USER] + [OTHER_USER.format(i) for i in range(1, n_tenants)]
+
+
+def _cleanup(users: list[str]) -> None:
+    for uid in users:
+        execute_query_db("DELETE FROM transactions WHERE user_id = :uid", {"uid": uid})
+
+
+def _seed(n_rows: int, users: list[str]) -> None:
+    _cleanup(users)
+    rng = np.random.default_rng(11)
+    dates = (pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 6 * 365, n_rows), unit="D"))
+    payees = rng.choice(PAYEES, n_rows)
+    rows = [
+        {"user_id": users[i % len(users)], "date": d.strftime("%Y-%m-%d"), "type": "Expense",
+         "account": "Brukskonto", "category": c, "payee": f"{p} {i % 97}", "amount": float(a),
+         "description": f"ref {i}"}
+        for i, (d, p, c, a) in enumerate(zip(
+            dates, payees, rng.choice(CATEGORIES, n_rows), np.round(rng.uniform(10, 3_000, n_rows), 2)
+        ))
+    ]
+    for start in range(0, n_rows, 50_000):
+        add_transactions_batch(rows[start:start + 50_000])
+
+
+def _timed(fn, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def _measure(term: str) -> tuple[dict, float, float]:
+    summary = transactions_summary(BENCH_USER, term)
+    _, t_search = _timed(lambda: search_transactions(BENCH_USER, term, limit=50))
+    _, t_page = _timed(lambda: load_transactions_page(BENCH_USER, 50, search=term))
+    return summary, t_search, t_page
+
+
+def run(n_rows: int, n_tenants: int) -> int:
+    if not ensure_indexes():
+        return 1
+    backend = db._search_backend
+    users = _users(n_tenants)
+    failures = 0
+    try:
+        _seed(n_rows, users)
+        print(f"{n_rows:,} rows over {len(users)} tenants ({n_rows // len(users):,} searched), "
+              f"index backend: {backend}")
+        print(f"{'term':>10} | {'matches':>8} | {'search like':>11} | {'search idx':>10} | "
+              f"{'page like':>9} | {'page idx':>8}")
+        print("-" * 72)
+        for term in TERMS:
+            db._search_backend = "like"
+            old, s_old, p_old = _measure(term)
+            db._search_backend = backend
+            new, s_new, p_new = _measure(term)
+            same = old["count"] == new["count"] and np.isclose(old["expense"], new["expense"])
+            failures += not same
+            print(f"{term:>10} | {new['count']:>8,} | {s_old * 1e3:>9.1f}ms | {s_new * 1e3:>8.1f}ms | "
+                  f"{p_old * 1e3:>7.1f}ms | {p_new * 1e3:>6.1f}ms{'' if same else '  MISMATCH'}")
+    finally:
+        db._search_backend = backend
+        _cleanup(users)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(run(*args, *[200_000, 20][len(args):]))
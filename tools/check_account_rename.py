@@ -0,0 +1,76 @@
+# tools/check_account_rename.py
+"""
+Regression check for the default-account rename in translate_defaults_for_user():
+after renaming, get_account_balances(), get_balance_as_of() and
+get_monthly_rollup() must report the account's balance and history under the
+new name and nothing under the old one.
+
+Writes an account, categories and transactions under a scratch user and removes
+them afterwards.
+
+Usage (from the project root):
+    python -m tools.check_account_rename
+"""
+from __future__ import annotations
+
+import datetime
+import sys
+
+from core.db_operations import (
+    add_record_db, add_transactions_batch, execute_query_db, get_account_balances, get_balance_as_of,
+    get_monthly_rollup,
+)
+from core.default_translations import translate_defaults_for_user
+
+CHECK_USER = "__check_account_rename__"
+OLD, NEW = "Checking", "Brukskonto"  # the "en" and "no" default account names
+SCRATCH_TABLES = ("transactions", "accounts", "categories", "recurring", "payees",
+                  "account_balances", "balance_checkpoints", "monthly_rollup")
+
+
+def _cleanup() -> None:
+    for table in SCRATCH_TABLES:
+        execute_query_db(f"DELETE FROM {table} WHERE user_id = :uid", {"uid": CHECK_USER})
+
+
+def _seed() -> None:
+    add_record_db("accounts", {"name": OLD, "account_type": "Checking", "is_default": True, "user_id": CHECK_USER})
+    add_transactions_batch([
+        {"user_id": CHECK_USER, "date": d, "type": t, "account": OLD, "category": "Groceries",
+         "payee": "Kiwi", "amount": amt, "description": ""}
+        for d, t, amt in [("2025-01-05", "Income", 1000.0), ("2025-01-20", "Expense", 250.0),
+                          ("2025-02-03", "Expense", 100.0)]
+    ])
+
+
+def _snapshot(account: str) -> tuple[float | None, float | None, float]:
+    balance = get_account_balances(CHECK_USER).get(account)
+    as_of = get_balance_as_of(CHECK_USER, account, datetime.date(2025, 1, 31))
+    rollup = get_monthly_rollup(CHECK_USER)
+    return balance, as_of, float(rollup.loc[rollup["account"] == account, "signed_amount"].sum())
+
+
+def main() -> int:
+    _cleanup()
+    try:
+        _seed()
+        before = _snapshot(OLD)  # materializes balances, checkpoints and the rollup under the old name
+        translate_defaults_for_user(CHECK_USER, "no")
+        after, stale = _snapshot(NEW), _snapshot(OLD)
+    finally:
+        _cleanup()
+
+    problems = []
+    if after != before:
+        problems.append(f"{NEW!r} reports (balance, as-of, rollup) {after}, expected {before}")
+    if stale != (None, 0.0, 0.0):
+        problems.append(f"{OLD!r} still has a balance, checkpoints or rollup rows: {stale}")
+    for p in problems:
+        print(f"❌ {p}")
+    if not problems:
+        print(f"✅ Balance {after[0]:,.2f}, Jan balance {after[1]:,.2f} and rollup moved from {OLD!r} to {NEW!r}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# tools/check_budget_rules.py
+"""
+Equivalence check and benchmark for the vectorized budget rule expander
+(components.budget._expand_rules) and the scenario projection (project_paths)
+against the original per-rule / per-month loops.
+
+Usage (from the project root):
+    python -m tools.check_budget_rules              # 300 random rule sets
+    python -m tools.check_budget_rules 1000 42      # cases, seed
+"""
+from __future__ import annotations
+
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from components.budget import FREQUENCY_MONTHS, _expand_rules, calculate_monthly_budget_target, project_paths
+
+FREQUENCIES = list(FREQUENCY_MONTHS) + ["Weekly"]  # an unsupported one is never due
+CATEGORIES = [f"Category {i}" for i in range(40)] + ["Unknown"]
+CAT_TYPES = {f"Category {i}": "Income" for i in range(0, 40, 5)}
+VIEWS = ["Brukskonto", "Sparekonto", "Savings Extra", "Visa"]
+
+
+# ============================================================
+# REFERENCE: the original loop, kept verbatim except for the tie-break
+# ============================================================
+# The original sorted with the default (unstable) quicksort, so two due rules of one
+# category with the same start_date won in arbitrary order. The reference sorts
+# stably with `id` as the tie-break (lowest id wins), the order _expand_rules uses
+# for rules read in id order.
+def legacy_monthly_budget_target(month_date: date, rules_df: pd.DataFrame) -> pd.DataFrame:
+    if rules_df.empty:
+        return pd.DataFrame(columns=["category", "Target", "transfer_to_account"])
+
+    potential_targets = []
+    
+    for _, row in rules_df.iterrows():
+        if not bool(row["is_active"]): 
+            continue
+            
+        freq = row["frequency"]
+        try:
+            start_val = row["start_date"]
+            start_dt = pd.to_datetime(start_val).date() if isinstance(start_val, str) else start_val.date()
+        except: 
+            continue
+
+        amount = float(row["amount"])
+        cat = row["category"]
+        transfer_to = row.get("transfer_to_account")
+        
+        if month_date < start_dt.replace(day=1): 
+            continue
+
+        is_due = False
+        diff_months = (month_date.year - start_dt.year) * 12 + (month_date.month - start_dt.month)
+        
+        if freq == "Monthly": is_due = True
+        elif freq == "Quarterly": is_due = (diff_months % 3 == 0)
+        elif freq == "Yearly": is_due = (diff_months % 12 == 0)
+        elif freq == "Bi-Monthly": is_due = (diff_months % 2 == 0)
+        elif freq == "Semi-Annually": is_due = (diff_months % 6 == 0)
+
+        if is_due:
+            potential_targets.append({
+                "category": cat, 
+                "Target": amount, 
+                "start_date": start_dt,
+                "transfer_to_account": transfer_to,
+                "id": row["id"],
+            })
+    
+    if not potential_targets:
+        return pd.DataFrame(columns=["category", "Target", "transfer_to_account"])
+    
+    df_hits = pd.DataFrame(potential_targets).sort_values(
+        by=["start_date", "id"], ascending=[False, True], kind="stable"
+    )
+    df_final = df_hits.drop_duplicates(subset="category", keep="first").drop(columns="id")
+    
+    return df_final
+
+
+def legacy_projection(rules, cat_type_map, today, start_balance, months, selected_account_view, scenario_adjustments=None):
+    """The original get_projection_data loop, with its DB reads turned into parameters."""
+    adj_map = {}
+    if scenario_adjustments:
+        for item in scenario_adjustments:
+            adj_map[item['category']] = item['adjustment']
+    
+    projection = []
+    current_bal = start_balance
+    
+    for i in range(months):
+        future_date = today + relativedelta(months=i)
+        month_iso = future_date.strftime("%Y-%m")
+        
+        df_targets = legacy_monthly_budget_target(future_date, rules)
+        monthly_net_change = 0.0
+        
+        if not df_targets.empty:
+            for _, row in df_targets.iterrows():
+                cat = row["category"]
+                amt = row["Target"]
+                
+                if cat in adj_map:
+                    amt += adj_map[cat]
+
+                transfer_dest = row.get("transfer_to_account")
+                c_type = cat_type_map.get(cat, "Expense")
+                
+                if cat in ["Opening Balance", "Unknown", "Balance Adjustment"]:
+                    continue
+
+                if transfer_dest and pd.notna(transfer_dest) and transfer_dest != "None":
+                    if selected_account_view == transfer_dest:
+                        monthly_net_change += amt
+                    elif "Brukskonto" in selected_account_view or "Debit" in selected_account_view:
+                         monthly_net_change -= amt
+                else:
+                    is_savings_view = "Saving" in selected_account_view
+                    if not is_savings_view:
+                        if c_type == "Income":
+                            monthly_net_change += amt
+                        else:
+                            monthly_net_change -= amt
+        
+        if i > 0:
+            current_bal += monthly_net_change
+            
+        projection.append({"Month": month_iso, "Predicted Balance": current_bal})
+        
+    return pd.DataFrame(projection)
+
+
+# ============================================================
+# RANDOM RULES
+# ============================================================
+def random_rules(rng: np.random.Generator, n_rules: int) -> pd.DataFrame:
+    starts = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 1500, n_rules), unit="D")
+    return pd.DataFrame({
+        "id": np.arange(1, n_rules + 1),
+        "category": rng.choice(CATEGORIES[: max(2, n_rules // 3)], n_rules),
+        "amount": np.round(rng.uniform(100, 20_000, n_rules), 0),
+        "frequency": rng.choice(FREQUENCIES, n_rules),
+        # Timestamps like the planner's data editor; a few ISO strings like a raw DB read
+        "start_date": [s.strftime("%Y-%m-%d") if rng.random() < 0.2 else s for s in starts],
+        "is_active": rng.random(n_rules) < 0.85,
+        "transfer_to_account": rng.choice([None, "Sparekonto", "Savings Extra", "None"], n_rules),
+    })
+
+
+def _months(first: date, n: int) -> list[date]:
+    return [first + relativedelta(months=i) for i in range(n)]
+
+
+def compare(rules: pd.DataFrame, months: list[date]) -> str | None:
+    for m in months:
+        old = legacy_monthly_budget_target(m, rules)
+        new = calculate_monthly_budget_target(m, rules)
+        if len(old) != len(new):
+            return f"{m}: {len(old)} vs {len(new)} categories"
+        if old.empty:
+            continue
+        old = old.sort_values("category").reset_index(drop=True)
+        new = new.sort_values("category").reset_index(drop=True)
+        for col in ("category", "Target", "start_date", "transfer_to_account"):
+            if not old[col].astype(object).equals(new[col].astype(object)):
+                return f"{m}: column {col!r} differs"
+    return None
+
+
+def random_scenarios(rng: np.random.Generator, n: int) -> list[list]:
+    return [
+        [{"category": str(c), "adjustment": float(a)}
+         for c, a in zip(rng.choice(CATEGORIES, 3), np.round(rng.uniform(-2_000, 2_000, 3)))]
+        for _ in range(n)
+    ]
+
+
+def compare_projection(rules: pd.DataFrame, first: date, rng: np.random.Generator) -> str | None:
+    scenarios = [[]] + random_scenarios(rng, 3)
+    for view in VIEWS:
+        paths = project_paths(rules, _months(first, 18), 10_000.0, view, CAT_TYPES, scenarios)
+        for k, adj in enumerate(scenarios):
+            old = legacy_projection(rules, CAT_TYPES, first, 10_000.0, 18, view, adj)["Predicted Balance"]
+            if not np.allclose(old.to_numpy(dtype=float), paths[k]):
+                return f"view {view!r}, scenario {k} differs"
+    return None
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main(n_cases: int, seed: int) -> int:
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for i in range(n_cases):
+        rules = random_rules(rng, int(rng.integers(1, 60)))
+        problem = compare(rules, _months(date(2023, int(rng.integers(1, 13)), 1), 24))
+        if problem:
+            failures += 1
+            if failures <= 5:
+                print(f"❌ case {i}: {problem}")
+    print(f"{'✅' if not failures else '❌'} {n_cases - failures}/{n_cases} random rule sets match the loop")
+
+    proj_failures = 0
+    for i in range(max(1, n_cases // 10)):
+        rules = random_rules(rng, int(rng.integers(0, 50)))
+        problem = compare_projection(rules, date(2024, int(rng.integers(1, 13)), 1), rng)
+        if problem:
+            proj_failures += 1
+            if proj_failures <= 5:
+                print(f"❌ projection case {i}: {problem}")
+    n_proj = max(1, n_cases // 10)
+    print(f"{'✅' if not proj_failures else '❌'} {n_proj - proj_failures}/{n_proj} projections match the loop (4 views × 4 scenarios)")
+    failures += proj_failures
+
+    print(f"\n{'rules':>6} | {'months':>6} | {'loop (ms)':>9} | {'expand (ms)':>11} | {'speedup':>7}")
+    print("-" * 54)
+    for n_rules, n_months in ((20, 12), (200, 12), (200, 60)):
+        rules, months = random_rules(rng, n_rules), _months(date(2025, 1, 1), n_months)
+        start = time.perf_counter()
+        for m in months:
+            legacy_monthly_budget_target(m, rules)
+        t_loop = time.perf_counter() - start
+        start = time.perf_counter()
+        _expand_rules(rules, months)  # every month at once, as project_paths() does
+        t_expand = time.perf_counter() - start
+        print(f"{n_rules:>6} | {n_months:>6} | {t_loop * 1e3:>9.1f} | {t_expand * 1e3:>11.2f} | {t_loop / t_expand:>6.0f}x")
+
+    rules, cats = random_rules(rng, 100), CAT_TYPES
+    start = time.perf_counter()
+    legacy_projection(rules, cats, date(2025, 1, 1), 0.0, 12, "Brukskonto", random_scenarios(rng, 1)[0])
+    t_one = time.perf_counter() - start
+    start = time.perf_counter()
+    project_paths(rules, _months(date(2025, 1, 1), 60), 0.0, "Brukskonto", cats, random_scenarios(rng, 10))
+    t_ten = time.perf_counter() - start
+    print(f"\nprojection, 100 rules: loop 1 scenario × 12 months {t_one * 1e3:.1f} ms | "
+          f"matrix 10 scenarios × 60 months {t_ten * 1e3:.1f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    cli = [int(a) for a in sys.argv[1:]]
+    sys.exit(main(cli[0] if cli else 300, cli[1] if len(cli) > 1 else 2024))
@@ -0,0 +1,203 @@
+# tools/check_budget_vs_actual.py
+"""
+Regression check and benchmark for get_budget_vs_actual(): the SQL actuals
+(get_budget_actuals on the monthly rollup) and vectorized sign/status logic
+against the original pandas version (full ledger load, strftime month match,
+row-wise apply).
+
+Writes random transactions and categories to the configured database under a
+scratch user and removes them afterwards; budget rules are generated in memory.
+
+Usage (from the project root):
+    python -m tools.check_budget_vs_actual              # 20k rows, 40 rule sets
+    python -m tools.check_budget_vs_actual 100000 10    # rows, rule sets
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import components.budget as budget
+from components.budget import calculate_monthly_budget_target
+from core.db_operations import ensure_indexes, execute_query_db, get_connection, load_data_db, rebuild_monthly_rollup
+
+BENCH_USER = "__check_budget_vs_actual__"
+TYPES = ["Expense", "Expense", "Income", "Transfer", "Opening Balance"]
+CATEGORIES = [f"Category {i}" for i in range(30)] + ["Transfer", "Unknown", "Balance Adjustment", None]
+INCOME_CATEGORIES = [f"Category {i}" for i in range(0, 30, 6)]
+FREQUENCIES = ["Monthly", "Quarterly", "Yearly"]
+MONTHS = pd.period_range("2024-01", "2025-12", freq="M")
+
+
+# ============================================================
+# REFERENCE: the original function body, with its inputs passed in
+# ============================================================
+def legacy_budget_vs_actual(selected_month_iso: str, df_targets_sum: pd.DataFrame,
+                            df_tx: pd.DataFrame, cat_df: pd.DataFrame) -> pd.DataFrame:
+    if not df_tx.empty:
+        df_tx["date"] = pd.to_datetime(df_tx["date"], format='ISO8601', errors="coerce")
+
+        exclude_cats = ["Transfer", "Opening Balance", "Unknown", "Balance Adjustment"]
+
+        mask = (
+            (df_tx["date"].dt.strftime("%Y-%m") == selected_month_iso) &
+            (df_tx["type"].isin(["Expense", "Income"])) &
+            (~df_tx["category"].isin(exclude_cats))
+        )
+        actuals = df_tx[mask].groupby("category")["amount"].sum().reset_index()
+        actuals.rename(columns={"amount": "Actual"}, inplace=True)
+    else:
+        actuals = pd.DataFrame(columns=["category", "Actual"])
+
+    df_merged = pd.merge(df_targets_sum, actuals, on="category", how="outer").fillna(0).infer_objects()
+    if df_merged.empty:
+        return pd.DataFrame(columns=["category", "SignedTarget", "SignedActual", "Diff", "Status"])
+
+    cat_type_map = dict(zip(cat_df["name"], cat_df["type"])) if not cat_df.empty else {}
+
+    def apply_signed_logic(row):
+        c_type = cat_type_map.get(row["category"], "Expense")
+        raw_target = row["Target"]
+        raw_actual = row["Actual"]
+
+        if c_type == "Income":
+            return [raw_target, raw_actual]
+        else:
+            return [-abs(raw_target), -abs(raw_actual)]
+
+    df_merged[["SignedTarget", "SignedActual"]] = df_merged.apply(apply_signed_logic, axis=1, result_type="expand")
+
+    def get_status(row):
+        t = row["SignedTarget"]
+        a = row["SignedActual"]
+        if t == 0 and a == 0: return "Unbudgeted"
+        if a >= t: return "✅ Good"
+        else: return "⚠️ Attention"
+
+    df_merged["Diff"] = df_merged["SignedActual"] - df_merged["SignedTarget"]
+    df_merged["Status"] = df_merged.apply(get_status, axis=1)
+
+    return df_merged.sort_values(by="SignedTarget", ascending=False)
+
+
+# ============================================================
+# DATA
+# ============================================================
+def _cleanup() -> None:
+    execute_query_db("DELETE FROM transactions WHERE user_id = :uid", {"uid": BENCH_USER})
+    execute_query_db("DELETE FROM categories WHERE user_id = :uid", {"uid": BENCH_USER})
+
+
+def _seed(rng: np.random.Generator, n_rows: int) -> None:
+    days = rng.integers(0, len(MONTHS) * 31, n_rows)
+    dates = (MONTHS[0].start_time + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+    rows = [
+        {"d": d, "t": t, "a": "Brukskonto", "c": c, "amt": float(amt), "uid": BENCH_USER}
+        for d, t, c, amt in zip(
+            dates, rng.choice(TYPES, n_rows), rng.choice(np.array(CATEGORIES, dtype=object), n_rows),
+            np.round(rng.uniform(-200, 5_000, n_rows), 2),
+        )
+    ]
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO transactions (date, type, account, category, amount, user_id) "
+            "VALUES (:d, :t, :a, :c, :amt, :uid)",
+            rows,
+        )
+        conn.execute(
+            "INSERT INTO categories (name, type, user_id) VALUES (:n, :t, :uid)",
+            [{"n": c, "t": "Income" if c in INCOME_CATEGORIES else "Expense", "uid": BENCH_USER}
+             for c in CATEGORIES[:24] if c is not None],
+        )
+    rebuild_monthly_rollup(BENCH_USER)
+
+
+def random_rules(rng: np.random.Generator) -> pd.DataFrame:
+    n = int(rng.integers(0, 25))
+    budgeted = [f"Category {i}" for i in range(36)]  # some never occur in the ledger
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "category": rng.choice(budgeted, n),
+        "amount": np.round(rng.uniform(100, 10_000, n), 2),
+        "frequency": rng.choice(FREQUENCIES, n),
+        "start_date": [str(MONTHS[int(i)].start_time.date()) for i in rng.integers(0, len(MONTHS), n)],
+        "is_active": rng.random(n) > 0.1,
+        "transfer_to_account": None,
+    })
+
+
+# ============================================================
+# CHECK
+# ============================================================
+def _normalized(df: pd.DataFrame) -> pd.DataFrame:
+    cols = ["category", "Target", "Actual", "SignedTarget", "SignedActual", "Diff", "Status"]
+    df = df.reindex(columns=cols)
+    return df.sort_values(["SignedTarget", "category"], ascending=[False, True]).reset_index(drop=True)
+
+
+def compare(old: pd.DataFrame, new: pd.DataFrame) -> str | None:
+    old, new = _normalized(old), _normalized(new)
+    if len(old) != len(new):
+        return f"rows {len(old)} vs {len(new)}"
+    if not (old["category"].to_numpy() == new["category"].to_numpy()).all():
+        return "categories differ"
+    for col in ("Target", "Actual", "SignedTarget", "SignedActual", "Diff"):
+        if not np.allclose(old[col].astype(float), new[col].astype(float), atol=0.005):
+            return f"{col} differs"
+    if not (old["Status"].to_numpy() == new["Status"].to_numpy()).all():
+        return "Status differs"
+    return None
+
+
+def main(n_rows: int, n_cases: int, seed: int = 2024) -> int:
+    if not ensure_indexes():
+        return 1
+    rng = np.random.default_rng(seed)
+    st.session_state["username"] = BENCH_USER
+    _cleanup()
+    failures = 0
+    t_old = t_new = 0.0
+    try:
+        _seed(rng, n_rows)
+        for i in range(n_cases):
+            rules = random_rules(rng)
+            budget.get_active_budget_rules = lambda rules=rules: rules
+            month = MONTHS[int(rng.integers(0, len(MONTHS)))].strftime("%Y-%m")
+
+            start = time.perf_counter()
+            targets = calculate_monthly_budget_target(pd.Period(month).start_time.date(), rules)
+            targets_sum = (
+                targets.groupby("category", as_index=False)["Target"].sum() if not targets.empty
+                else pd.DataFrame(columns=["category", "Target"])
+            )
+            old = legacy_budget_vs_actual(
+                month, targets_sum, load_data_db("transactions", user_id=BENCH_USER),
+                load_data_db("categories", user_id=BENCH_USER),
+            )
+            t_old += time.perf_counter() - start
+
+            st.cache_data.clear()
+            start = time.perf_counter()
+            new = budget.get_budget_vs_actual(month)
+            t_new += time.perf_counter() - start
+
+            problem = compare(old, new)
+            if problem:
+                failures += 1
+                print(f"case {i} ({month}): {problem}")
+    finally:
+        _cleanup()
+
+    print(f"{n_cases - failures}/{n_cases} months identical ({n_rows:,} ledger rows)")
+    print(f"original: {t_old / n_cases * 1e3:.1f} ms/call  sql: {t_new / n_cases * 1e3:.1f} ms/call"
+          f"  ({t_old / t_new:.1f}x)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    cli = [int(a) for a in sys.argv[1:]]
+    sys.exit(main(cli[0] if cli else 20_000, cli[1] if len(cli) > 1 else 40))
@@ -0,0 +1,70 @@
+# tools/check_indexes.py
+"""
+Runs EXPLAIN on the hot per-user queries and checks that each one uses its index.
+
+Usage (from the project root):
+    python -m tools.check_indexes           # check only
+    python -m tools.check_indexes --apply   # create missing indexes first
+"""
+from __future__ import annotations
+
+import sys
+
+from core.db_operations import IS_POSTGRES, ensure_indexes, get_connection
+
+# (expected index, query) — parameters are bound with placeholder values
+CHECKS: list[tuple[str, str]] = [
+    (
+        "ix_transactions_user_date",
+        "SELECT * FROM transactions WHERE user_id = :uid AND date >= :d0 AND date < :d1",
+    ),
+    (
+        "ix_transactions_user_account_date",
+        "SELECT type, amount FROM transactions WHERE user_id = :uid AND account = :acc AND date >= :d0 AND date < :d1",
+    ),
+    (
+        "ix_transactions_user_category",
+        "SELECT amount FROM transactions WHERE user_id = :uid AND category = :cat",
+    ),
+    (
+        "ux_categories_user_name",
+        "SELECT id FROM categories WHERE name = :name AND user_id = :uid",
+    ),
+    (
+        "ux_payees_user_name",
+        "SELECT id FROM payees WHERE name = :name AND user_id = :uid",
+    ),
+]
+
+PARAMS = {"uid": "default", "acc": "Brukskonto", "cat": "Mat", "name": "Mat", "d0": "2025-01-01", "d1": "2025-02-01"}
+
+
+def _plan(conn, query: str) -> str:
+    if IS_POSTGRES:
+        # Tiny tables would otherwise always be seq-scanned; SET LOCAL ends with the transaction
+        conn.execute("SET LOCAL enable_seqscan = off")
+        rows = conn.execute(f"EXPLAIN {query}", PARAMS).fetchall()
+        return "\n".join(str(r[0]) for r in rows)
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", PARAMS).fetchall()
+    return "\n".join(str(r[-1]) for r in rows)
+
+
+def main(args: list[str]) -> int:
+    if "--apply" in args and not ensure_indexes():
+        return 1
+
+    failed = 0
+    with get_connection() as conn:
+        for index_name, query in CHECKS:
+            plan = _plan(conn, query)
+            ok = index_name in plan
+            failed += not ok
+            print(f"{'✅' if ok else '❌'} {index_name}")
+            if not ok:
+                print("    " + plan.replace("\n", "\n    "))
+    print(f"{len(CHECKS) - failed}/{len(CHECKS)} queries use their index.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
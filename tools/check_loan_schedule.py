@@ -0,0 +1,344 @@
+# tools/check_loan_schedule.py
+"""
+Property-based equivalence check and benchmark for the vectorized loan schedule
+(core.loan_math.generate_schedule) against the original month-by-month loop,
+and for the what-if sweep (sweep_schedules) against single schedules.
+
+Usage (from the project root):
+    python -m tools.check_loan_schedule              # 500 random loans + benchmark
+    python -m tools.check_loan_schedule 5000 123     # cases, seed
+"""
+from __future__ import annotations
+
+import datetime as dt
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.loan_math import add_months, annuity_payment, count_months, generate_schedule, sweep_schedules
+
+# Closed-form segments differ from the loop only by float rounding; half a cent
+# is far below what the schedule shows (2 decimals)
+MONEY_ATOL = 0.005
+FLOAT_COLUMNS = ["Start Balance", "Interest", "Rate %", "Fee", "Principal", "Extra / Adj",
+                 "Admin Fee", "Total Payment", "End Balance"]
+EXACT_COLUMNS = ["Month", "Date", "Status"]
+
+
+# ============================================================
+# REFERENCE: the original loop, kept verbatim
+# ============================================================
+def legacy_generate_schedule(
+    balance, rate, start_date, payment_day, mode, 
+    loan_type="Annuity", 
+    target_payment=None, target_date=None, admin_fee=0, 
+    extra_payments_df=None, terms_history_df=None,
+    io_from=None, io_to=None
+):
+    schedule = []
+    current_balance = float(balance)
+    
+    current_rate = float(rate)
+    current_fee = float(admin_fee)
+    
+    # Process extras
+    extras = {}
+    if extra_payments_df is not None and not extra_payments_df.empty:
+        if not pd.api.types.is_datetime64_any_dtype(extra_payments_df['pay_date']):
+            extra_payments_df['pay_date'] = pd.to_datetime(extra_payments_df['pay_date'])
+        for _, row in extra_payments_df.iterrows():
+            d = row['pay_date'].date()
+            key = (d.year, d.month)
+            extras[key] = extras.get(key, 0.0) + float(row['amount'])
+
+    # Process terms history
+    terms_changes = []
+    if terms_history_df is not None and not terms_history_df.empty:
+        if not pd.api.types.is_datetime64_any_dtype(terms_history_df['change_date']):
+            terms_history_df['change_date'] = pd.to_datetime(terms_history_df['change_date'])
+        for _, row in terms_history_df.iterrows():
+            terms_changes.append({
+                'date': row['change_date'].date(),
+                'rate': float(row['interest_rate']),
+                'fee': float(row['admin_fee'])
+            })
+        terms_changes.sort(key=lambda x: x['date'])
+
+    current_date = start_date
+    if current_date.day > payment_day:
+         current_date = add_months(current_date, 1)
+    current_date = current_date.replace(day=payment_day)
+
+    max_months = 720 # 60 years cap
+    
+    fixed_principal_amount = 0.0
+    annuity_payment_amount = 0.0
+    
+    def recalculate_payment(curr_bal, curr_rate, calc_date):
+        if mode == 'date' and target_date:
+            rem_months = max(1, count_months(calc_date, target_date))
+            if loan_type == "Serial":
+                return curr_bal / rem_months
+            elif loan_type == "Frame":
+                return 0.0
+            else:
+                return annuity_payment(curr_bal, curr_rate, rem_months)
+        else:
+             return float(target_payment)
+
+    base_payment_val = recalculate_payment(current_balance, current_rate, start_date)
+    if loan_type == "Serial": fixed_principal_amount = base_payment_val
+    elif loan_type == "Annuity": annuity_payment_amount = base_payment_val
+    elif loan_type == "Frame": fixed_principal_amount = 0.0
+
+    month_idx = 1
+    
+    while current_balance > 1.0 and month_idx <= max_months:
+        
+        # 1. Update Terms
+        active_terms = None
+        for chg in terms_changes:
+            if chg['date'] <= current_date:
+                active_terms = chg
+            else:
+                break
+        
+        new_rate = active_terms['rate'] if active_terms else float(rate)
+        new_fee = active_terms['fee'] if active_terms else float(admin_fee)
+        
+        terms_changed = (abs(new_rate - current_rate) > 0.001)
+        
+        current_rate = new_rate
+        current_fee = new_fee
+        monthly_rate = (current_rate / 100.0) / 12.0
+        
+        # 2. Recalculate Payment
+        if terms_changed and mode == 'date' and loan_type != "Frame":
+            base_payment_val = recalculate_payment(current_balance, current_rate, current_date)
+            if loan_type == "Serial": fixed_principal_amount = base_payment_val
+            elif loan_type == "Annuity": annuity_payment_amount = base_payment_val
+
+        # 3. Compute Interest
+        interest = current_balance * monthly_rate
+        
+        # 4. Payment
+        is_io = False
+        if io_from and io_to and io_from <= current_date <= io_to: is_io = True
+        if loan_type == "Frame": is_io = True 
+
+        principal_payment = 0.0
+        required_payment = 0.0
+        
+        if is_io:
+            principal_payment = 0.0
+            required_payment = interest
+        else:
+            if loan_type == "Serial":
+                principal_payment = fixed_principal_amount
+                required_payment = principal_payment + interest
+            else:
+                base = annuity_payment_amount
+                if base < interest: base = interest 
+                principal_payment = base - interest
+                required_payment = base
+
+        if principal_payment > current_balance:
+            principal_payment = current_balance
+            required_payment = interest + principal_payment
+
+        extra_amt = extras.get((current_date.year, current_date.month), 0.0)
+        real_principal = principal_payment + extra_amt
+        total_deduction = required_payment + current_fee + extra_amt
+
+        if real_principal > current_balance:
+            excess = real_principal - current_balance
+            real_principal = current_balance
+            total_deduction -= excess 
+
+        end_balance = current_balance - real_principal
+        
+        status_label = "Payment"
+        if is_io: status_label = "Interest Only"
+        if loan_type == "Frame" and extra_amt > 0: status_label = "Extra Payment"
+
+        schedule.append({
+            "Month": month_idx, "Date": current_date,
+            "Start Balance": current_balance, "Interest": interest,
+            "Rate %": current_rate, "Fee": current_fee,
+            "Principal": principal_payment, "Extra / Adj": extra_amt,
+            "Admin Fee": current_fee, "Total Payment": total_deduction,
+            "End Balance": max(0, end_balance),
+            "Status": status_label
+        })
+        current_balance = end_balance
+        current_date = add_months(current_date, 1)
+        month_idx += 1
+
+    return pd.DataFrame(schedule)
+
+
+# ============================================================
+# RANDOM LOANS
+# ============================================================
+def random_loan(rng: np.random.Generator) -> dict:
+    start = dt.date(2020, 1, 1) + dt.timedelta(days=int(rng.integers(0, 3000)))
+    loan_type = str(rng.choice(["Annuity", "Serial", "Frame"], p=[0.6, 0.3, 0.1]))
+    mode = str(rng.choice(["date", "payment"]))
+    balance = float(np.round(rng.uniform(0, 5_000_000), 2))
+    rate = float(rng.choice([0.0, float(np.round(rng.uniform(0.5, 12), 2))], p=[0.1, 0.9]))
+    target_date = add_months(start, int(rng.integers(1, 600))) if mode == "date" else None
+    if loan_type == "Serial":
+        target_payment = float(np.round(balance / rng.integers(12, 700), 2))
+    else:
+        target_payment = float(np.round(rng.uniform(0.2, 3.0) * annuity_payment(balance, rate, 300), 2))
+
+    io_from = io_to = None
+    if loan_type != "Frame" and rng.random() < 0.3:
+        io_from = add_months(start, int(rng.integers(-6, 60)))
+        io_to = add_months(io_from, int(rng.integers(0, 36)))
+
+    extras = None
+    if rng.random() < 0.5:
+        k = int(rng.integers(1, 8))
+        extras = pd.DataFrame({
+            "pay_date": [add_months(start, int(m)) + dt.timedelta(days=int(d))
+                         for m, d in zip(rng.integers(-2, 200, k), rng.integers(0, 27, k))],
+            "amount": np.round(rng.uniform(-20_000, 300_000, k), 2),
+        })
+
+    terms = None
+    if rng.random() < 0.5:
+        k = int(rng.integers(1, 5))
+        terms = pd.DataFrame({
+            "change_date": [add_months(start, int(m)) for m in rng.integers(-3, 240, k)],
+            "interest_rate": np.round(rng.uniform(0, 10, k), 2),
+            "admin_fee": rng.choice([0.0, 50.0, 75.0], k),
+        })
+
+    return dict(
+        balance=balance, rate=rate, start_date=start, payment_day=int(rng.integers(1, 29)),
+        mode=mode, loan_type=loan_type, target_payment=target_payment, target_date=target_date,
+        admin_fee=float(rng.choice([0.0, 50.0])), extra_payments_df=extras, terms_history_df=terms,
+        io_from=io_from, io_to=io_to,
+    )
+
+
+def _copy_args(args: dict) -> dict:
+    """The legacy loop converts the frames in place; give each engine its own copy."""
+    return {k: (v.copy() if isinstance(v, pd.DataFrame) else v) for k, v in args.items()}
+
+
+def compare(args: dict) -> str | None:
+    old = legacy_generate_schedule(**_copy_args(args))
+    new = generate_schedule(**_copy_args(args))
+    if old.empty or new.empty:
+        return None if old.empty and new.empty else f"empty mismatch: {len(old)} vs {len(new)} rows"
+    if len(old) != len(new):
+        return f"row count {len(old)} vs {len(new)}"
+    for col in EXACT_COLUMNS:
+        if not (old[col].to_numpy() == new[col].to_numpy()).all():
+            return f"column {col!r} differs"
+    for col in FLOAT_COLUMNS:
+        a, b = old[col].to_numpy(dtype=float), new[col].to_numpy(dtype=float)
+        if not np.allclose(a, b, rtol=1e-9, atol=MONEY_ATOL):
+            worst = int(np.argmax(np.abs(a - b)))
+            return f"column {col!r} differs at row {worst}: {a[worst]!r} vs {b[worst]!r}"
+    return None
+
+
+def check_sweep(rng: np.random.Generator, grid: int = 8) -> int:
+    """Every sweep cell must match generate_schedule() in payment mode: rows, interest, payoff."""
+    failures = 0
+    start = dt.date(2024, 1, 1) + dt.timedelta(days=int(rng.integers(0, 700)))
+    extras = pd.DataFrame({"pay_date": [add_months(start, 14), add_months(start, 40)], "amount": [250_000.0, -8_000.0]})
+    plans = [None, 1_500.0, extras]
+    rates = np.round(np.linspace(0, 9, grid), 2)
+    payments = np.round(np.linspace(6_000, 30_000, grid), 2)
+    for loan_type in ("Annuity", "Serial", "Frame"):
+        res = sweep_schedules(2_000_000.0, start, 15, rates, payments, extra_plans=plans, loan_type=loan_type)
+        for e, plan in enumerate(plans):
+            if isinstance(plan, float):
+                plan = pd.DataFrame({"pay_date": [add_months(start, k) for k in range(720)], "amount": plan})
+            for i, rate in enumerate(rates):
+                for j, pay in enumerate(payments):
+                    df = generate_schedule(2_000_000.0, rate, start, 15, "payment", loan_type,
+                                           target_payment=pay, extra_payments_df=plan)
+                    ok = (len(df) == res.months[e, i, j]
+                          and np.isclose(df["Interest"].sum(), res.total_interest[e, i, j], rtol=1e-9, atol=MONEY_ATOL)
+                          and (df.iloc[-1]["End Balance"] <= 1.0) == res.paid_off[e, i, j])
+                    failures += not ok
+    total = 3 * len(plans) * grid * grid
+    print(f"{'✅' if not failures else '❌'} {total - failures}/{total} sweep cells match generate_schedule")
+    return failures
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def _bench(args: dict, repeat: int = 20) -> tuple[float, float]:
+    timings = []
+    for fn in (legacy_generate_schedule, generate_schedule):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(**_copy_args(args))
+        timings.append((time.perf_counter() - start) / repeat)
+    return timings[0], timings[1]
+
+
+def main(n_cases: int, seed: int) -> int:
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for i in range(n_cases):
+        args = random_loan(rng)
+        try:
+            problem = compare(args)
+        except Exception as e:  # both engines should raise (or not) alike
+            problem = f"raised {type(e).__name__}: {e}"
+        if problem:
+            failures += 1
+            if failures <= 5:
+                print(f"❌ case {i}: {problem}\n   {args}")
+    print(f"{'✅' if not failures else '❌'} {n_cases - failures}/{n_cases} random loans match the loop")
+    failures += check_sweep(rng)
+
+    base = dict(balance=3_000_000.0, rate=5.49, start_date=dt.date(2025, 1, 15), payment_day=20,
+                mode="payment", loan_type="Annuity", target_payment=15_000.0, admin_fee=50.0)
+    scenarios = {
+        "annuity, 30y": base,
+        "serial, target date": {**base, "loan_type": "Serial", "mode": "date", "target_date": dt.date(2055, 1, 1)},
+        "frame, 60y cap": {**base, "loan_type": "Frame"},
+        "annuity + 4 terms + 6 extras": {
+            **base,
+            "terms_history_df": pd.DataFrame({
+                "change_date": [dt.date(2026, 3, 1), dt.date(2028, 6, 1), dt.date(2031, 1, 1), dt.date(2035, 1, 1)],
+                "interest_rate": [4.9, 5.9, 4.2, 3.9], "admin_fee": [50.0, 60.0, 60.0, 75.0],
+            }),
+            "extra_payments_df": pd.DataFrame({
+                "pay_date": [dt.date(2026 + i, 6, 1) for i in range(6)], "amount": [50_000.0] * 6,
+            }),
+        },
+    }
+    print(f"\n{'scenario':>30} | {'loop (ms)':>9} | {'vectorized (ms)':>15} | {'speedup':>7}")
+    print("-" * 72)
+    for name, args in scenarios.items():
+        t_old, t_new = _bench(args)
+        print(f"{name:>30} | {t_old * 1e3:>9.2f} | {t_new * 1e3:>15.2f} | {t_old / t_new:>6.1f}x")
+
+    rates, payments = np.linspace(2, 8, 50), np.linspace(10_000, 40_000, 50)
+    start = time.perf_counter()
+    sweep_schedules(3_000_000.0, dt.date(2025, 1, 15), 20, rates, payments)
+    t_sweep = time.perf_counter() - start
+    start = time.perf_counter()
+    for rate in rates[:5]:
+        for pay in payments:
+            generate_schedule(3_000_000.0, rate, dt.date(2025, 1, 15), 20, "payment", target_payment=pay)
+    t_single = (time.perf_counter() - start) * 10
+    print(f"\n50×50 sweep: {t_sweep * 1e3:.1f} ms (2,500 × generate_schedule ≈ {t_single * 1e3:,.0f} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    cli = [int(a) for a in sys.argv[1:]]
+    sys.exit(main(cli[0] if cli else 500, cli[1] if len(cli) > 1 else 2024))
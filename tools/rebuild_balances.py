@@ -0,0 +1,37 @@
+# tools/rebuild_balances.py
+"""
+Rebuilds the materialized `account_balances` rows from the transactions ledger.
+
+Usage (from the project root):
+    python -m tools.rebuild_balances alice bob   # selected users
+    python -m tools.rebuild_balances --all       # every user with transactions
+"""
+from __future__ import annotations
+
+import sys
+
+from core.db_operations import execute_query_db, rebuild_balances
+
+
+def main(args: list[str]) -> int:
+    if not args:
+        print(__doc__)
+        return 1
+
+    if args == ["--all"]:
+        rows = execute_query_db(
+            "SELECT DISTINCT user_id FROM transactions WHERE user_id IS NOT NULL", fetch_result=True
+        )
+        users = [r["user_id"] for r in rows]
+    else:
+        users = args
+
+    failed = [u for u in users if not rebuild_balances(u)]
+    print(f"✅ Rebuilt balances for {len(users) - len(failed)} user(s).")
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
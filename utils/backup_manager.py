@@ -35,7 +35,8 @@ def create_automatic_backup(trigger_name: str) -> str:
         with pd.ExcelWriter(filepath, engine="openpyxl") as writer:
             data_found = False
             for table in TABLES:
-                df = load_data_db(table)
+                # Full-database backup, deliberately across all users
+                df = load_data_db(table, user_id="bypass")
                 # Save even if empty, to preserve structure, but prefer data
                 if df is not None:
                     df.to_excel(writer, sheet_name=table, index=False)